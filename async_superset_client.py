@@ -0,0 +1,783 @@
+#!/usr/bin/env python3
+"""
+Async Superset API client
+
+Same operations as SupersetClient in create_superset_dashboard.py, built on
+httpx so hundreds of objects can be provisioned or audited concurrently
+from a single process. Connections are pooled and kept alive, HTTP/2 can be
+enabled, and a semaphore bounds the number of requests in flight.
+
+Prerequisites:
+- pip install "httpx[http2]" python-dotenv
+
+Usage:
+python async_superset_client.py            # audit dashboards and their charts
+python async_superset_client.py apply      # apply log_events_dashboard.json
+
+    async with AsyncSupersetClient(url, user, password, concurrency=50) as client:
+        await client.authenticate()
+        charts = await client.create_charts(dataset_id, specs)
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from create_superset_dashboard import (
+    DEFAULT_SPEC_PATH,
+    IDEMPOTENT_METHODS,
+    LOOKUP_CACHE_TTL,
+    MAX_RETRIES,
+    RATE_LIMIT,
+    REQUEST_TIMEOUT,
+    RETRYABLE_STATUSES,
+    SUPERSET_PASSWORD,
+    SUPERSET_URL,
+    SUPERSET_USERNAME,
+    TOKEN_CACHE_PATH,
+    TokenBucket,
+    TokenManager,
+    _as_dict,
+    apply_result,
+    backoff_delay,
+    build_chart_specs,
+    build_dashboard_layout,
+    changed_columns,
+    dashboard_payload,
+    load_spec,
+    parse_retry_after,
+    plan_charts,
+    rison_dumps,
+    rollup_steps,
+    spec_fingerprint,
+)
+
+MAX_CONNECTIONS = int(os.getenv("SUPERSET_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("SUPERSET_MAX_KEEPALIVE", "20"))
+CONCURRENCY = int(os.getenv("SUPERSET_CONCURRENCY", "20"))
+
+
+class AsyncSupersetClient:
+    """Async client for Superset API operations"""
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        concurrency: int = CONCURRENCY,
+        timeout: float = REQUEST_TIMEOUT,
+        token_cache: Optional[str] = TOKEN_CACHE_PATH,
+        max_retries: int = MAX_RETRIES,
+        rate_limit: Optional[float] = RATE_LIMIT,
+    ):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.token = None
+        self.headers = {}
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            verify=False,  # For Railway SSL issues
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cache_ttl = LOOKUP_CACHE_TTL
+        self._lookup_cache: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+        self.tokens = TokenManager(token_cache, f"{username}@{base_url}")
+        self._auth_lock = asyncio.Lock()
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(rate_limit)
+
+    async def __aenter__(self) -> "AsyncSupersetClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        await self.client.aclose()
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request through the rate limiter, retrying transient failures
+
+        Follows the same retry rules as SupersetClient._send: 429/503 are
+        retried for every method, 502/504 and transport errors only for
+        idempotent ones.
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                status = response.status_code
+                retryable = status in (429, 503) or (
+                    idempotent and status in RETRYABLE_STATUSES
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                if status == 429:
+                    self.rate_limiter.pause(delay)
+
+            attempt += 1
+            print(f"  ↻ {method} {path} retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send one authenticated request
+
+        The access token is refreshed shortly before it expires, and a
+        request rejected with 401 is retried once with a renewed token.
+        Like SupersetClient._request, HTTP errors are returned, not raised.
+        """
+        extra_headers = kwargs.pop("headers", {})
+        if self.token and self.tokens.needs_refresh():
+            await self._renew_token(self.token)
+
+        for attempt in range(2):
+            token = self.token
+            response = await self._send(
+                method, path, headers={**self.headers, **extra_headers}, **kwargs
+            )
+            if (
+                response.status_code != 401
+                or attempt
+                or not await self._renew_token(token)
+            ):
+                break
+        return response
+
+    def _set_token(self, token: str) -> None:
+        self.token = token
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+
+    async def _renew_token(self, stale_token: Optional[str]) -> bool:
+        """Refresh, or log in again, unless another task already did"""
+        async with self._auth_lock:
+            if self.token != stale_token:
+                return True
+            return await self.refresh_access_token() or await self.login()
+
+    async def authenticate(self) -> bool:
+        """Authenticate and obtain JWT token
+
+        Reuses a cached access token, or refreshes it with the cached
+        refresh token, before falling back to a full login.
+        """
+        # The cache file is read and written (under flock) in a thread, off the loop
+        if await asyncio.to_thread(self.tokens.load):
+            if not self.tokens.needs_refresh():
+                self._set_token(self.tokens.access_token)
+                print("✓ Reusing cached access token")
+                return True
+            if await self.refresh_access_token():
+                return True
+
+        return await self.login()
+
+    async def login(self) -> bool:
+        """Log in with username and password"""
+        try:
+            response = await self._send(
+                "POST",
+                "/api/v1/security/login",
+                json={
+                    "username": self.username,
+                    "password": self.password,
+                    "provider": "db",  # Required by Flask-AppBuilder
+                    "refresh": True,
+                },
+            )
+            response.raise_for_status()
+
+            data = response.json()
+            token = data.get("access_token")
+            if not token:
+                print(f"✗ No access token in response: {data}")
+                return False
+
+            await asyncio.to_thread(self.tokens.update, token, data.get("refresh_token"))
+            self._set_token(token)
+
+            print("✓ Authentication successful")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Authentication failed: {e}")
+            return False
+
+    async def refresh_access_token(self) -> bool:
+        """Exchange the refresh token for a new access token"""
+        refresh_token = self.tokens.refresh_token
+        if not refresh_token or TokenManager.is_expired(refresh_token):
+            return False
+        try:
+            response = await self._send(
+                "POST",
+                "/api/v1/security/refresh",
+                headers={"Authorization": f"Bearer {refresh_token}"},
+            )
+            response.raise_for_status()
+
+            token = response.json().get("access_token")
+            if not token:
+                return False
+
+            await asyncio.to_thread(self.tokens.update, token)
+            self._set_token(token)
+            print("✓ Access token refreshed")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Token refresh failed: {e}")
+            return False
+
+    async def iter_resources(
+        self,
+        resource: str,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        columns: Optional[List[str]] = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield objects of a resource, fetching pages lazily"""
+        page = 0
+        seen = 0
+        while True:
+            query: Dict[str, Any] = {"page": page, "page_size": page_size}
+            if filters:
+                query["filters"] = filters
+            if columns:
+                query["columns"] = columns
+
+            response = await self._request(
+                "GET", f"/api/v1/{resource}", params={"q": rison_dumps(query)}
+            )
+            response.raise_for_status()
+
+            data = response.json()
+            rows = data.get("result", [])
+            for row in rows:
+                yield row
+
+            seen += len(rows)
+            # Superset caps page_size, so a short page need not be the last
+            if not rows or seen >= data.get("count", float("inf")):
+                return
+            page += 1
+
+    async def find_resource(
+        self,
+        resource: str,
+        filters: List[Dict[str, Any]],
+        columns: Optional[List[str]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Get the first object matching filters, cached for ``cache_ttl``"""
+        key = (resource, rison_dumps(filters), rison_dumps(columns or []))
+        now = time.monotonic()
+        cached = self._lookup_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        rows = self.iter_resources(resource, filters, columns, page_size=1)
+        async with aclosing(rows):
+            async for found in rows:
+                self._lookup_cache[key] = (now + self.cache_ttl, found)
+                return found
+        return None
+
+    def invalidate_lookups(self, resource: Optional[str] = None) -> None:
+        """Drop cached lookups, for one resource or all of them"""
+        if resource is None:
+            self._lookup_cache.clear()
+        else:
+            for key in [k for k in self._lookup_cache if k[0] == resource]:
+                del self._lookup_cache[key]
+
+    async def get_database_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get database ID by name"""
+        try:
+            db = await self.find_resource(
+                "databases",
+                [{"col": "database_name", "opr": "eq", "value": name}],
+                columns=["id", "database_name"],
+            )
+            if db:
+                print(f"✓ Found database: {name} (ID: {db.get('id')})")
+                return db
+
+            print(f"✗ Database '{name}' not found")
+            return None
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to get databases: {e}")
+            return None
+
+    async def get_dataset(
+        self, database_id: int, schema: str, table_name: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get existing dataset for a table, if any"""
+        try:
+            return await self.find_resource(
+                "datasets",
+                [
+                    {"col": "table_name", "opr": "eq", "value": table_name},
+                    {"col": "schema", "opr": "eq", "value": schema},
+                    {"col": "database", "opr": "rel_o_m", "value": database_id},
+                ],
+                columns=["id", "table_name", "schema"],
+            )
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to get datasets: {e}")
+            return None
+
+    async def get_dashboard_by_title(self, title: str) -> Optional[Dict[str, Any]]:
+        """Get existing dashboard by title, if any"""
+        try:
+            return await self.find_resource(
+                "dashboards",
+                [{"col": "dashboard_title", "opr": "eq", "value": title}],
+                columns=["id", "dashboard_title", "json_metadata", "published"],
+            )
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to get dashboards: {e}")
+            return None
+
+    async def get_dashboard_charts(
+        self, dashboard_id: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Get charts currently placed on a dashboard"""
+        try:
+            response = await self._request(
+                "GET", f"/api/v1/dashboards/{dashboard_id}/charts"
+            )
+            response.raise_for_status()
+            return response.json().get("result", [])
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to get charts of dashboard {dashboard_id}: {e}")
+            return None
+
+    async def get_dataset_columns(
+        self, dataset_id: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Get current column configuration of a dataset"""
+        try:
+            response = await self._request("GET", f"/api/v1/datasets/{dataset_id}")
+            response.raise_for_status()
+            return response.json().get("result", {}).get("columns", [])
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to get dataset {dataset_id}: {e}")
+            return None
+
+    async def execute_sql(
+        self, database_id: int, sql: str, schema: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Run SQL synchronously through SQL Lab"""
+        try:
+            response = await self._request(
+                "POST",
+                "/api/v1/sqllab/execute/",
+                json={
+                    "database_id": database_id,
+                    "sql": sql,
+                    "schema": schema,
+                    "runAsync": False,
+                },
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to execute SQL on database {database_id}: {e}")
+            return None
+
+    async def create_dataset(
+        self, database_id: int, schema: str, table_name: str, sql: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Create dataset from table, or a virtual dataset when ``sql`` is given"""
+        payload = {
+            "database_id": database_id,
+            "schema": schema,
+            "table_name": table_name,
+        }
+        if sql:
+            payload["sql"] = sql
+        try:
+            response = await self._request("POST", "/api/v1/datasets", json=payload)
+            response.raise_for_status()
+            self.invalidate_lookups("datasets")
+
+            dataset = response.json()
+            print(f"✓ Dataset created: {table_name} (ID: {dataset.get('id')})")
+            return dataset
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to create dataset: {e}")
+            return None
+
+    async def configure_columns(self, dataset_id: int, columns: list) -> bool:
+        """Configure column properties"""
+        try:
+            response = await self._request(
+                "PUT", f"/api/v1/datasets/{dataset_id}", json={"columns": columns}
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("datasets")
+
+            print(f"✓ Columns configured for dataset {dataset_id}")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to configure columns: {e}")
+            return False
+
+    async def create_chart(
+        self,
+        dataset_id: int,
+        chart_title: str,
+        visualization_type: str,
+        query_context: dict,
+    ) -> Optional[Dict[str, Any]]:
+        """Create chart"""
+        try:
+            response = await self._request(
+                "POST",
+                "/api/v1/charts",
+                json={
+                    "dataset_id": dataset_id,
+                    "chart_title": chart_title,
+                    "visualization_type": visualization_type,
+                    "query_context": query_context,
+                },
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("charts")
+
+            chart = response.json()
+            print(f"✓ Chart created: {chart_title} (ID: {chart.get('id')})")
+            return chart
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to create chart: {e}")
+            return None
+
+    async def create_charts(
+        self, dataset_id: int, specs: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Create multiple charts concurrently, results in input order"""
+        results = await asyncio.gather(
+            *(
+                self.create_chart(
+                    dataset_id=spec.get("dataset_id", dataset_id),
+                    chart_title=spec["chart_title"],
+                    visualization_type=spec["visualization_type"],
+                    query_context=spec["query_context"],
+                )
+                for spec in specs
+            )
+        )
+
+        failed = [
+            spec["chart_title"]
+            for spec, result in zip(specs, results)
+            if result is None
+        ]
+        if failed:
+            print(f"✗ {len(failed)}/{len(specs)} charts failed: {failed}")
+        return list(results)
+
+    async def update_chart(self, chart_id: int, payload: Dict[str, Any]) -> bool:
+        """Update chart properties"""
+        try:
+            response = await self._request("PUT", f"/api/v1/charts/{chart_id}", json=payload)
+            response.raise_for_status()
+            self.invalidate_lookups("charts")
+
+            print(f"✓ Chart {chart_id} updated")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to update chart {chart_id}: {e}")
+            return False
+
+    async def delete_chart(self, chart_id: int) -> bool:
+        """Delete chart"""
+        try:
+            response = await self._request("DELETE", f"/api/v1/charts/{chart_id}")
+            response.raise_for_status()
+            self.invalidate_lookups("charts")
+
+            print(f"✓ Chart {chart_id} deleted")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to delete chart {chart_id}: {e}")
+            return False
+
+    async def create_dashboard(
+        self, title: str, description: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """Create dashboard"""
+        try:
+            response = await self._request(
+                "POST",
+                "/api/v1/dashboards",
+                json={
+                    "dashboard_title": title,
+                    "description": description,
+                    "dashboard_layout_version": "GRID_LAYOUT_v1",
+                },
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("dashboards")
+
+            dashboard = response.json()
+            print(f"✓ Dashboard created: {title} (ID: {dashboard.get('id')})")
+            return dashboard
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to create dashboard: {e}")
+            return None
+
+    async def update_dashboard(
+        self, dashboard_id: int, payload: Dict[str, Any]
+    ) -> bool:
+        """Update dashboard properties"""
+        try:
+            response = await self._request(
+                "PUT", f"/api/v1/dashboards/{dashboard_id}", json=payload
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("dashboards")
+
+            print(f"✓ Dashboard {dashboard_id} updated")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to update dashboard {dashboard_id}: {e}")
+            return False
+
+    async def add_charts_to_dashboard(
+        self,
+        dashboard_id: int,
+        chart_configs: list,
+        json_metadata: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Add multiple charts to dashboard with positions"""
+        payload = {"dashboard_layout": build_dashboard_layout(chart_configs)}
+        if json_metadata is not None:
+            payload["json_metadata"] = json.dumps(json_metadata)
+        try:
+            response = await self._request(
+                "PUT", f"/api/v1/dashboards/{dashboard_id}", json=payload
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("dashboards")
+
+            print(f"✓ Charts added to dashboard {dashboard_id}")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to add charts to dashboard: {e}")
+            return False
+
+    async def publish_dashboard(self, dashboard_id: int) -> bool:
+        """Publish dashboard"""
+        try:
+            response = await self._request(
+                "PUT", f"/api/v1/dashboards/{dashboard_id}", json={"published": True}
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("dashboards")
+
+            print(f"✓ Dashboard {dashboard_id} published")
+            return True
+        except httpx.HTTPError as e:
+            print(f"✗ Failed to publish dashboard: {e}")
+            return False
+
+
+async def ensure_rollups(
+    client: AsyncSupersetClient, spec: Dict[str, Any], database_id: int
+) -> Optional[Dict[str, int]]:
+    """Async counterpart of create_superset_dashboard.ensure_rollups"""
+    schema = spec["dataset"]["schema"]
+    dataset_ids = {}
+    for step in rollup_steps(spec):
+        table_name = step["table_name"]
+        dataset = await client.get_dataset(database_id, schema, table_name)
+        if dataset:
+            dataset_ids[table_name] = dataset.get("id")
+            continue
+
+        if step["setup_sql"] and await client.execute_sql(
+            database_id, step["setup_sql"], schema
+        ) is None:
+            print(f"✗ Failed to create rollup {table_name}")
+            return None
+
+        dataset = await client.create_dataset(database_id, schema, table_name, sql=step["sql"])
+        if not dataset:
+            return None
+        if step["columns"]:
+            await client.configure_columns(dataset.get("id"), step["columns"])
+        dataset_ids[table_name] = dataset.get("id")
+    return dataset_ids
+
+
+async def apply_spec(
+    client: AsyncSupersetClient, spec: Dict[str, Any], force: bool = False
+) -> Dict[str, Any]:
+    """Async counterpart of create_superset_dashboard.apply_spec
+
+    Plans the same calls with the same shared functions, then sends the
+    chart creates, updates and deletes concurrently. It records the same
+    fingerprint, so either client can pick up a dashboard the other
+    provisioned, and returns the same apply_result.
+    """
+    fingerprint = spec_fingerprint(spec)
+    title = spec["dashboard"]["title"]
+    errors: List[str] = []
+
+    dashboard = await client.get_dashboard_by_title(title)
+    metadata = _as_dict(dashboard.get("json_metadata")) if dashboard else {}
+    if dashboard and not force and metadata.get("spec_fingerprint") == fingerprint:
+        print(f"✓ Dashboard '{title}' is up to date (ID: {dashboard.get('id')})")
+        return apply_result(dashboard.get("id"), errors)
+
+    database = await client.get_database_by_name(spec["database"])
+    if not database:
+        return apply_result(None, [f"database {spec['database']!r} not found"])
+    database_id = database.get("id")
+
+    schema = spec["dataset"]["schema"]
+    table_name = spec["dataset"]["table_name"]
+    dataset = await client.get_dataset(database_id, schema, table_name)
+    if not dataset:
+        dataset = await client.create_dataset(database_id, schema, table_name)
+        if not dataset:
+            return apply_result(None, [f"dataset {table_name!r} not created"])
+    dataset_id = dataset.get("id")
+
+    desired_columns = spec["dataset"].get("columns", [])
+    if changed_columns(desired_columns, await client.get_dataset_columns(dataset_id) or []):
+        if not await client.configure_columns(dataset_id, desired_columns):
+            errors.append(f"columns of dataset {dataset_id} not configured")
+
+    rollup_ids = await ensure_rollups(client, spec, database_id)
+    if rollup_ids is None:
+        return apply_result(None, ["rollups not created"])
+
+    chart_specs = build_chart_specs(spec, dataset_id, rollup_ids)
+    existing = []
+    if dashboard:
+        existing = await client.get_dashboard_charts(dashboard.get("id")) or []
+    plan = plan_charts(chart_specs, existing)
+    chart_ids = plan["chart_ids"]
+
+    # Updates and deletes, each with the error recorded if it fails
+    steps = [
+        (client.update_chart(chart_id, payload), f"chart {chart_id} not updated")
+        for chart_id, payload in plan["update"]
+    ] + [
+        (client.delete_chart(chart_id), f"chart {chart_id} not deleted")
+        for chart_id in plan["delete"]
+    ]
+    created, *results = await asyncio.gather(
+        client.create_charts(dataset_id, plan["create"]),
+        *(step for step, _ in steps),
+    )
+    for chart_spec, chart in zip(plan["create"], created):
+        if chart:
+            chart_ids[chart_spec["chart_title"]] = chart.get("id")
+        else:
+            errors.append(f"chart {chart_spec['chart_title']!r} not created")
+    errors += [error for (_, error), ok in zip(steps, results) if not ok]
+
+    if not dashboard:
+        dashboard = await client.create_dashboard(
+            title=title, description=spec["dashboard"].get("description", "")
+        )
+        if not dashboard:
+            return apply_result(None, errors + ["dashboard not created"])
+    dashboard_id = dashboard.get("id")
+
+    payload = dashboard_payload(
+        spec, chart_specs, chart_ids, dataset_id, rollup_ids, metadata,
+        None if errors else fingerprint,
+    )
+    if not await client.update_dashboard(dashboard_id, payload):
+        return apply_result(None, errors + [f"dashboard {dashboard_id} not saved"])
+    if errors:
+        print("✗ Some steps failed; the next apply will retry them")
+    return apply_result(dashboard_id, errors)
+
+
+async def apply(spec_path: str = DEFAULT_SPEC_PATH) -> None:
+    """Apply a dashboard spec with the async client"""
+    spec = load_spec(spec_path)
+    async with AsyncSupersetClient(SUPERSET_URL, SUPERSET_USERNAME, SUPERSET_PASSWORD) as client:
+        if not await client.authenticate():
+            print("Failed to authenticate. Exiting.")
+            return
+        dashboard_id = (await apply_spec(client, spec))["dashboard_id"]
+        if dashboard_id is not None:
+            print(f"✓ Dashboard ready: {SUPERSET_URL}/dashboard/{dashboard_id}")
+
+
+async def audit() -> None:
+    """List every dashboard with its charts, fetched concurrently"""
+    async with AsyncSupersetClient(
+        SUPERSET_URL,
+        SUPERSET_USERNAME,
+        SUPERSET_PASSWORD,
+        http2=os.getenv("SUPERSET_HTTP2", "").lower() in ("1", "true", "yes", "on"),
+    ) as client:
+        if not await client.authenticate():
+            print("Failed to authenticate. Exiting.")
+            return
+
+        dashboards = [
+            d
+            async for d in client.iter_resources(
+                "dashboards", columns=["id", "dashboard_title", "published"]
+            )
+        ]
+        charts = await asyncio.gather(
+            *(client.get_dashboard_charts(d.get("id")) for d in dashboards)
+        )
+
+        print(f"\nDashboards: {len(dashboards)}")
+        for dashboard, dashboard_charts in zip(dashboards, charts):
+            status = "published" if dashboard.get("published") else "draft"
+            count = len(dashboard_charts) if dashboard_charts is not None else "?"
+            print(
+                f"  {dashboard.get('dashboard_title')} "
+                f"(ID: {dashboard.get('id')}, {status}): {count} charts"
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["apply"]:
+        asyncio.run(apply(*sys.argv[2:3]))
+    else:
+        asyncio.run(audit())
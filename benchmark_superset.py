@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Load-test a Superset deployment
+
+Replays a weighted mix of login, dashboard open, chart data and SQL Lab
+requests from concurrent virtual users for a fixed duration, then reports
+p50/p95/p99 latency, throughput and error rate per endpoint. Requests are
+sent once, without the client's retries, so failures show up as errors
+instead of as latency.
+
+Prerequisites:
+- pip install requests python-dotenv
+
+Usage:
+python benchmark_superset.py --concurrency 16 --duration 60
+python benchmark_superset.py --mix "chart_data=10,dashboard=3" --force
+python benchmark_superset.py --database-id 1 --sql "SELECT COUNT(*) FROM peter_log_event"
+python benchmark_superset.py --output results/after.json --compare results/before.json
+
+Run it against the local stand-in with `docker compose up` and
+SUPERSET_URL=http://localhost:8088 (see docker-compose.yml).
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from create_superset_dashboard import (
+    SUPERSET_PASSWORD,
+    SUPERSET_URL,
+    SUPERSET_USERNAME,
+    SupersetClient,
+)
+from warm_superset_cache import list_published_dashboards
+
+DEFAULT_MIX = "login=1,dashboard=4,chart_data=10,sql_lab=1"
+DEFAULT_SQL = "SELECT 1"
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LatencyRecorder:
+    """Thread-safe latency and error samples, grouped by endpoint"""
+
+    def __init__(self):
+        self._samples: Dict[str, List[float]] = {}
+        self._errors: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._samples.setdefault(endpoint, []).append(seconds * 1000.0)
+            errors = self._errors.setdefault(endpoint, {})
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint stats; latencies in milliseconds, throughput per second"""
+        with self._lock:
+            endpoints = {name: sorted(values) for name, values in self._samples.items()}
+            errors = {name: dict(counts) for name, counts in self._errors.items()}
+
+        result = {}
+        for name, values in sorted(endpoints.items()):
+            failed = sum(errors.get(name, {}).values())
+            result[name] = {
+                "requests": len(values),
+                "errors": failed,
+                "error_rate": round(failed / len(values), 4),
+                "error_kinds": errors.get(name, {}),
+                "throughput": round(len(values) / elapsed, 2) if elapsed else None,
+                "p50_ms": round(percentile(values, 50), 1),
+                "p95_ms": round(percentile(values, 95), 1),
+                "p99_ms": round(percentile(values, 99), 1),
+                "max_ms": round(values[-1], 1),
+            }
+        return result
+
+
+class LoadScenario:
+    """The operations a virtual user picks from, sent through one client
+
+    Each operation is timed as a single HTTP round trip. ``dashboard`` opens
+    a dashboard the way the frontend does: its metadata, charts and
+    datasets, recorded as three endpoints.
+    """
+
+    def __init__(
+        self,
+        client: SupersetClient,
+        recorder: LatencyRecorder,
+        dashboard_ids: List[int],
+        chart_ids: List[int],
+        database_id: Optional[int] = None,
+        sql: str = DEFAULT_SQL,
+        force: bool = False,
+    ):
+        self.client = client
+        self.recorder = recorder
+        self.dashboard_ids = dashboard_ids
+        self.chart_ids = chart_ids
+        self.database_id = database_id
+        self.sql = sql
+        self.force = force
+        self._login_lock = threading.Lock()
+
+    def operations(self) -> Dict[str, Callable[[], None]]:
+        """Operations runnable against this deployment, by name"""
+        ops = {"login": self.login}
+        if self.dashboard_ids:
+            ops["dashboard"] = self.open_dashboard
+        if self.chart_ids:
+            ops["chart_data"] = self.chart_data
+        if self.database_id is not None:
+            ops["sql_lab"] = self.sql_lab
+        return ops
+
+    def _timed(self, endpoint: str, method: str, path: str, auth: bool = True, **kwargs) -> None:
+        if auth and self.client.tokens.needs_refresh():
+            # Long runs outlive the access token; renew once for all users
+            with self._login_lock:
+                if self.client.tokens.needs_refresh():
+                    self.client.login()
+
+        headers = self.client.headers if auth else {"Content-Type": "application/json"}
+        started = time.perf_counter()
+        error = None
+        try:
+            response = self.client.session.request(
+                method,
+                f"{self.client.base_url}{path}",
+                headers=headers,
+                timeout=self.client.timeout,
+                verify=False,
+                **kwargs,
+            )
+            # Read the body so the timing covers the full response
+            response.content
+            if response.status_code >= 400:
+                error = str(response.status_code)
+        except requests.exceptions.Timeout:
+            error = "timeout"
+        except requests.exceptions.RequestException as e:
+            error = type(e).__name__
+        self.recorder.record(endpoint, time.perf_counter() - started, error)
+
+    def login(self) -> None:
+        self._timed(
+            "login",
+            "POST",
+            "/api/v1/security/login",
+            auth=False,
+            json={
+                "username": self.client.username,
+                "password": self.client.password,
+                "provider": "db",
+            },
+            allow_redirects=False,
+        )
+
+    def open_dashboard(self) -> None:
+        dashboard_id = random.choice(self.dashboard_ids)
+        self._timed("dashboard", "GET", f"/api/v1/dashboards/{dashboard_id}")
+        self._timed("dashboard_charts", "GET", f"/api/v1/dashboards/{dashboard_id}/charts")
+        self._timed("dashboard_datasets", "GET", f"/api/v1/dashboards/{dashboard_id}/datasets")
+
+    def chart_data(self) -> None:
+        chart_id = random.choice(self.chart_ids)
+        self._timed(
+            "chart_data",
+            "GET",
+            f"/api/v1/charts/{chart_id}/data",
+            params={"format": "json", "force": "true" if self.force else "false"},
+        )
+
+    def sql_lab(self) -> None:
+        self._timed(
+            "sql_lab",
+            "POST",
+            "/api/v1/sqllab/execute/",
+            json={"database_id": self.database_id, "sql": self.sql, "runAsync": False},
+        )
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse ``name=weight,...`` into operation weights"""
+    mix = {}
+    for item in value.split(","):
+        name, sep, weight = item.strip().partition("=")
+        if not sep:
+            raise ValueError(f"Invalid mix entry {item!r}, expected name=weight")
+        mix[name] = float(weight)
+    return mix
+
+
+def run_load(
+    scenario: LoadScenario,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float,
+) -> float:
+    """Run weighted operations from ``concurrency`` users; returns elapsed seconds"""
+    ops = scenario.operations()
+    unknown = sorted(set(mix) - set(ops))
+    if unknown:
+        print(f"  Skipping operations with no targets on this deployment: {unknown}")
+    names = [name for name in mix if name in ops and mix[name] > 0]
+    if not names:
+        raise ValueError("No runnable operations in the mix")
+    weights = [mix[name] for name in names]
+
+    started = time.monotonic()
+    deadline = started + duration
+
+    def _user() -> None:
+        while time.monotonic() < deadline:
+            ops[random.choices(names, weights)[0]]()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(_user) for _ in range(concurrency)]:
+            future.result()
+    return time.monotonic() - started
+
+
+def discover_targets(
+    client: SupersetClient, dashboard_ids: Optional[List[int]] = None
+) -> Dict[str, List[int]]:
+    """Dashboards to open and charts to query; defaults to all published ones"""
+    if dashboard_ids is None:
+        dashboard_ids = [d.get("id") for d in list_published_dashboards(client)]
+    chart_ids: List[int] = []
+    for dashboard_id in dashboard_ids:
+        for chart in client.get_dashboard_charts(dashboard_id) or []:
+            if chart.get("id") not in chart_ids:
+                chart_ids.append(chart.get("id"))
+    return {"dashboards": dashboard_ids, "charts": chart_ids}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(
+    endpoints: Dict[str, Dict[str, Any]],
+    baseline: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> None:
+    """Print the per-endpoint table, with p95 change against a baseline run"""
+    header = f"{'endpoint':<20}{'reqs':>8}{'req/s':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+    if baseline:
+        header += f"{'p95 Δ':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in endpoints.items():
+        line = (
+            f"{name:<20}{stats['requests']:>8}{stats['throughput']:>9}"
+            f"{stats['error_rate'] * 100:>6.1f}%"
+            f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+        )
+        before = (baseline or {}).get(name)
+        if before and before.get("p95_ms"):
+            change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            line += f"{change:>+9.1f}%"
+        print(line)
+    print("(latencies in ms)")
+
+
+def main():
+    """Benchmark a Superset deployment"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--url", default=SUPERSET_URL, help="Superset base URL")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument(
+        "--mix", default=DEFAULT_MIX, help=f"Operation weights (default: {DEFAULT_MIX})"
+    )
+    parser.add_argument(
+        "--dashboards", type=int, nargs="+", help="Dashboard IDs (default: all published)"
+    )
+    parser.add_argument("--database-id", type=int, help="Database for SQL Lab queries")
+    parser.add_argument("--sql", default=DEFAULT_SQL, help="SQL Lab query")
+    parser.add_argument(
+        "--force", action="store_true", help="Bypass the chart data cache"
+    )
+    parser.add_argument("--label", help="Run label stored in the results (default: git commit)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Earlier results JSON to compare p95 against")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    client = SupersetClient(
+        args.url,
+        SUPERSET_USERNAME,
+        SUPERSET_PASSWORD,
+        pool_size=args.concurrency,
+        token_cache=None,
+        max_retries=0,
+        rate_limit=None,
+    )
+    if not client.authenticate():
+        print("Failed to authenticate. Exiting.")
+        return
+
+    targets = discover_targets(client, args.dashboards)
+    print(
+        f"Running {args.concurrency} users for {args.duration:g}s against {args.url} "
+        f"({len(targets['dashboards'])} dashboards, {len(targets['charts'])} charts)"
+    )
+
+    recorder = LatencyRecorder()
+    scenario = LoadScenario(
+        client,
+        recorder,
+        targets["dashboards"],
+        targets["charts"],
+        database_id=args.database_id,
+        sql=args.sql,
+        force=args.force,
+    )
+    started_at = datetime.now(timezone.utc).isoformat()
+    elapsed = run_load(scenario, mix, args.concurrency, args.duration)
+    endpoints = recorder.summary(elapsed)
+
+    total = sum(stats["requests"] for stats in endpoints.values())
+    errors = sum(stats["errors"] for stats in endpoints.values())
+    results = {
+        "label": args.label or _git_commit(),
+        "url": args.url,
+        "started_at": started_at,
+        "seconds": round(elapsed, 3),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": mix,
+            "force": args.force,
+        },
+        "totals": {
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else None,
+            "throughput": round(total / elapsed, 2) if elapsed else None,
+        },
+        "endpoints": endpoints,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("endpoints")
+
+    print()
+    print_report(endpoints, baseline)
+    print(
+        f"\nTotal: {total} requests, {results['totals']['throughput']} req/s, "
+        f"{errors} errors"
+    )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
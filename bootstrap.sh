@@ -36,10 +36,20 @@ else
 fi
 
 #
-# playwright is an optional package - run only if it is installed
-#
-if command -v playwright > /dev/null 2>&1; then
-  playwright install-deps
-  playwright install chromium
+# playwright is an optional package - run only if it is installed. The
+# Dockerfile installs it with pip --target, which puts no `playwright`
+# command on PATH, so it is run as a module of the image's Python
+#
+PLAYWRIGHT_MARKER="/app/.playwright-installed"
+if python -c "import playwright" > /dev/null 2>&1; then
+  if [ -f "${PLAYWRIGHT_MARKER}" ]; then
+    echo "Playwright and chromium already installed"
+  else
+    python -m playwright install-deps chromium
+    python -m playwright install chromium
+    touch "${PLAYWRIGHT_MARKER}"
+  fi
+else
+  echo "Playwright is not installed; thumbnails and reports cannot render"
 fi
 
@@ -0,0 +1,118 @@
+"""
+Celery tasks for the Superset Railway image
+
+Loaded by Superset's Celery worker through CeleryConfig in
+superset_config.py; the image copies this module onto the PYTHONPATH.
+"""
+
+import logging
+import os
+
+from celery.signals import worker_ready
+from superset.extensions import celery_app
+
+from create_superset_dashboard import (
+    DEFAULT_SPEC_PATH,
+    SupersetClient,
+    load_spec,
+    refresh_rollups,
+)
+from result_export import export_chart_csv
+from warm_superset_cache import WARMUP_WORKERS, warm_dashboards
+
+logger = logging.getLogger(__name__)
+
+# The web service this worker warms; on Railway point it at the web service's
+# private URL when workers run as a separate service
+WARMUP_URL = os.environ.get("SUPERSET_WARMUP_URL") or "http://localhost:%s" % os.environ.get(
+    "SUPERSET_PORT", "8088"
+)
+SUPERSET_HOME = os.environ.get("SUPERSET_HOME", "/app/superset_home")
+# Dashboard spec declaring the rollups the refresh task maintains
+DASHBOARD_SPEC = os.environ.get("SUPERSET_DASHBOARD_SPEC", DEFAULT_SPEC_PATH)
+# Identifies a deploy, so its workers schedule a single start-up warm-up
+DEPLOY_ID = os.environ.get("SUPERSET_DEPLOY_ID") or os.environ.get("RAILWAY_DEPLOYMENT_ID")
+WARMUP_CLAIM_KEY = "superset_warmup_on_start_%s"
+
+
+def _env_bool(name, default=False):
+    val = os.environ.get(name)
+    if val is None:
+        return default
+    return val.lower() in ("1", "true", "yes", "on")
+
+
+def _warmup_client():
+    return SupersetClient(
+        WARMUP_URL,
+        os.environ.get("SUPERSET_WARMUP_USER") or os.environ.get("SUPERSET_ADMIN_USER", "admin"),
+        os.environ.get("SUPERSET_WARMUP_PASSWORD") or os.environ.get("SUPERSET_ADMIN_PASSWORD", "admin"),
+        pool_size=WARMUP_WORKERS,
+        token_cache=os.path.join(SUPERSET_HOME, "warmup_tokens.json"),
+    )
+
+
+@celery_app.task(name="cache_warmup.warm_dashboards", ignore_result=True)
+def warm_dashboards_task(dashboard_ids=None, force=False):
+    """Warm the data cache for published dashboards"""
+    client = _warmup_client()
+    if not client.authenticate():
+        raise RuntimeError("Cache warm-up could not authenticate against %s" % WARMUP_URL)
+
+    summary = warm_dashboards(client, dashboard_ids=dashboard_ids, force=force)
+    logger.info("Cache warm-up finished: %s", summary)
+    return summary
+
+
+@celery_app.task(name="rollups.refresh", ignore_result=True)
+def refresh_rollups_task(spec_path=None):
+    """Recompute the recent buckets of every rollup in the dashboard spec"""
+    client = _warmup_client()
+    if not client.authenticate():
+        raise RuntimeError("Rollup refresh could not authenticate against %s" % WARMUP_URL)
+
+    summary = refresh_rollups(client, load_spec(spec_path or DASHBOARD_SPEC))
+    logger.info("Rollup refresh finished: %s", summary)
+    if summary["failed"]:
+        raise RuntimeError("Rollup refresh failed for %s" % summary["failed"])
+    return summary
+
+
+@celery_app.task(name="exports.chart_csv", ignore_result=True, soft_time_limit=3600)
+def export_chart_csv_task(job_id, chart_id, username):
+    """Async CSV export of a chart; the web API serves the result from Redis"""
+    export_chart_csv(job_id, chart_id, username)
+
+
+def _claim_start_warmup():
+    """True for the first worker to start in this deploy
+
+    Replicas, autoscaled and restarted workers all fire worker_ready; a
+    Redis SET NX on a key per deploy lets only one of them queue the
+    warm-up. Without a deploy ID, the key covers SUPERSET_WARMUP_CLAIM_TTL
+    seconds instead (default 1 hour).
+    """
+    from redis import Redis
+
+    ttl = int(os.environ.get("SUPERSET_WARMUP_CLAIM_TTL", "3600"))
+    key = WARMUP_CLAIM_KEY % (DEPLOY_ID or "latest")
+    try:
+        redis = Redis.from_url(celery_app.conf.broker_url)
+        # A deploy's claim outlives the deploy's start-up; a week is plenty
+        return bool(redis.set(key, "1", nx=True, ex=7 * 86400 if DEPLOY_ID else ttl))
+    except Exception:  # the broker is down or not Redis: warm up anyway
+        logger.warning("Could not claim the start-up warm-up", exc_info=True)
+        return True
+
+
+@worker_ready.connect
+def _warm_after_deploy(sender=None, **kwargs):
+    """Warm the cache once the first worker is up after a (re)deploy"""
+    if not _env_bool("SUPERSET_WARMUP_ON_START", True):
+        return
+    if not _claim_start_warmup():
+        logger.info("Start-up cache warm-up already scheduled for this deploy")
+        return
+    delay = int(os.environ.get("SUPERSET_WARMUP_START_DELAY", "30"))
+    warm_dashboards_task.apply_async(countdown=delay)
+    logger.info("Scheduled cache warm-up in %ss", delay)
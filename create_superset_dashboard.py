@@ -10,53 +10,341 @@ Prerequisites:
 - pip install requests python-dotenv
 
 Usage:
-python create_superset_dashboard.py
+python create_superset_dashboard.py                 # create everything from scratch
+python create_superset_dashboard.py apply           # only send the changes needed
+python create_superset_dashboard.py apply --spec my_dashboard.json
+python create_superset_dashboard.py refresh-rollups # recompute recent rollup buckets
+python create_superset_dashboard.py sync-columns    # refresh every dataset's columns
+python create_superset_dashboard.py fan-out --targets tenants.json  # one dashboard per tenant
+
+The database, dataset, columns, charts and layout are described in
+log_events_dashboard.json. Set SUPERSET_TOKEN_CACHE to a file path (for
+example ~/.cache/superset-railway/tokens.json) to cache access/refresh
+tokens there, readable only by you, so consecutive runs skip the login.
+
+Charts can read from rollups declared in the spec (pre-aggregated counts
+per time bucket, stored as a table, a materialized view or a virtual
+dataset) instead of the raw table. Stored rollups are created through SQL
+Lab, so the database needs "Allow DML"; the rollups.refresh Celery task
+keeps them up to date.
+
+Promote dashboards between instances as ZIP bundles (SUPERSET_URL selects
+the instance):
+python create_superset_dashboard.py export --ids 12 --bundle log_events.zip
+python create_superset_dashboard.py import --bundle log_events.zip --overwrite --replace "database_name=supabase staging:supabase prod"
 """
 
+import argparse
+import base64
+import hashlib
 import requests
 import json
 import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatch
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
 
 # Load environment variables
 load_dotenv(".env.local")
 
 # Configuration
-SUPERSET_URL = "https://superset-railway-image-production-6d86.up.railway.app"
+SUPERSET_URL = os.getenv(
+    "SUPERSET_URL", "https://superset-railway-image-production-6d86.up.railway.app"
+)
 SUPERSET_USERNAME = os.getenv("SUPERSET_USERNAME", "admin")
 SUPERSET_PASSWORD = os.getenv("SUPERSET_PASSWORD", "#Stayahead88")
-DATABASE_NAME = "supabase staging"
-SCHEMA = "public"
-TABLE_NAME = "peter_log_event"
+DEFAULT_SPEC_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "log_events_dashboard.json"
+)
+CHART_WORKERS = int(os.getenv("SUPERSET_CHART_WORKERS", "4"))
+LOOKUP_CACHE_TTL = float(os.getenv("SUPERSET_LOOKUP_CACHE_TTL", "300"))
+REQUEST_TIMEOUT = float(os.getenv("SUPERSET_REQUEST_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("SUPERSET_MAX_RETRIES", "4"))
+# Requests per second across all threads of a client; unset means unlimited
+RATE_LIMIT = float(os.getenv("SUPERSET_RATE_LIMIT", "0")) or None
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+BUNDLE_CHUNK_SIZE = 1024 * 1024
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+# Tokens are only written to disk when SUPERSET_TOKEN_CACHE names a file
+TOKEN_CACHE_PATH = os.getenv("SUPERSET_TOKEN_CACHE") or None
+
+# Characters that may appear unquoted in a Rison identifier
+_RISON_ID = re.compile(r"^[^-0-9 '!:(),*@$][^ '!:(),*@$]*$")
+
+
+def rison_dumps(value: Any) -> str:
+    """Encode a value as Rison, the format Superset expects in ``q``"""
+    if value is True:
+        return "!t"
+    if value is False:
+        return "!f"
+    if value is None:
+        return "!n"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        if _RISON_ID.match(value):
+            return value
+        escaped = value.replace("!", "!!").replace("'", "!'")
+        return f"'{escaped}'"
+    if isinstance(value, dict):
+        items = ",".join(
+            f"{rison_dumps(str(k))}:{rison_dumps(v)}" for k, v in sorted(value.items())
+        )
+        return f"({items})"
+    if isinstance(value, (list, tuple)):
+        return "!(" + ",".join(rison_dumps(v) for v in value) + ")"
+    raise TypeError(f"Cannot encode {type(value).__name__} as Rison")
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value: Optional[str], cap: float = 120.0) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (
+                parsedate_to_datetime(value) - datetime.now(timezone.utc)
+            ).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), cap)
+
+
+class TokenBucket:
+    """Thread-safe client-side rate limiter
+
+    Allows ``rate`` requests per second on average with bursts of up to
+    ``burst`` requests. A rate of ``None`` disables limiting.
+    """
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.rate is None:
+                return wait
+
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller, e.g. after the server answered 429"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# Serializes token cache writes across every TokenManager in the process;
+# an flock on "<cache>.lock" does the same across processes
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+
+class TokenManager:
+    """Holds JWT access/refresh tokens and optionally persists them
+
+    Tokens are cached per ``key`` (user and Superset URL) in a JSON file
+    readable only by the current user, so consecutive runs skip the login.
+    """
+
+    def __init__(self, cache_path: Optional[str], key: str, leeway: float = 60):
+        self.cache_path = os.path.expanduser(cache_path) if cache_path else None
+        self.key = key
+        self.leeway = leeway
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def expiry(token: str) -> Optional[float]:
+        """Read the ``exp`` claim of a JWT without verifying it"""
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            return float(claims["exp"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+
+    @classmethod
+    def is_expired(cls, token: str, leeway: float = 0) -> bool:
+        exp = cls.expiry(token)
+        return exp is not None and exp - leeway <= time.time()
+
+    def needs_refresh(self) -> bool:
+        """True when the access token is missing or about to expire"""
+        return not self.access_token or self.is_expired(
+            self.access_token, self.leeway
+        )
+
+    def update(self, access_token: str, refresh_token: Optional[str] = None) -> None:
+        with self._lock:
+            self.access_token = access_token
+            if refresh_token:
+                self.refresh_token = refresh_token
+            self._save()
+
+    def load(self) -> bool:
+        """Load tokens for this key from the cache file, if enabled"""
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                entry = json.load(f).get(self.key) or {}
+        except (OSError, ValueError):
+            return False
+
+        self.access_token = entry.get("access_token")
+        self.refresh_token = entry.get("refresh_token")
+        return bool(self.access_token or self.refresh_token)
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path) or "."
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # Other clients, in this process or another, may write the same
+            # file; hold both locks across the read-modify-write
+            with _TOKEN_CACHE_LOCK, open(f"{self.cache_path}.lock", "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    with open(self.cache_path, encoding="utf-8") as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    entries = {}
+                entries[self.key] = {
+                    "access_token": self.access_token,
+                    "refresh_token": self.refresh_token,
+                }
+
+                # Write to a private (0600) temp file, then swap it in atomically
+                with tempfile.NamedTemporaryFile(
+                    "w", dir=directory, prefix=".tokens-", suffix=".tmp",
+                    encoding="utf-8", delete=False,
+                ) as f:
+                    tmp_path = f.name
+                    json.dump(entries, f)
+                try:
+                    os.replace(tmp_path, self.cache_path)
+                except OSError:
+                    os.unlink(tmp_path)
+                    raise
+        except OSError as e:
+            print(f"✗ Failed to write token cache {self.cache_path}: {e}")
 
 
 class SupersetClient:
     """Client for Superset API operations"""
 
-    def __init__(self, base_url: str, username: str, password: str):
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        pool_size: int = 10,
+        token_cache: Optional[str] = TOKEN_CACHE_PATH,
+        timeout: float = REQUEST_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        rate_limit: Optional[float] = RATE_LIMIT,
+    ):
         self.base_url = base_url
         self.username = username
         self.password = password
         self.token = None
         self.headers = {}
         self.session = requests.Session()
+        # Size the connection pool so concurrent batch calls reuse connections
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # name -> object lookups, valid for one provisioning run
+        self.cache_ttl = LOOKUP_CACHE_TTL
+        self._lookup_cache: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+        self._lookup_lock = threading.Lock()
+        self.tokens = TokenManager(token_cache, f"{username}@{base_url}")
+        self._auth_lock = threading.Lock()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(rate_limit)
 
     def authenticate(self) -> bool:
-        """Authenticate and obtain JWT token"""
+        """Authenticate and obtain JWT token
+
+        Reuses a cached access token, or refreshes it with the cached
+        refresh token, before falling back to a full login.
+        """
+        # Disable SSL warnings for self-signed certs
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        if self.tokens.load():
+            if not self.tokens.needs_refresh():
+                self._set_token(self.tokens.access_token)
+                print("✓ Reusing cached access token")
+                return True
+            if self.refresh_access_token():
+                return True
+
+        return self.login()
+
+    def login(self) -> bool:
+        """Log in with username and password"""
         try:
-            # Disable SSL warnings for self-signed certs
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-            response = self.session.post(
+            response = self._send(
+                "POST",
                 f"{self.base_url}/api/v1/security/login",
                 json={
                     "username": self.username,
                     "password": self.password,
-                    "provider": "db"  # Required by Flask-AppBuilder
+                    "provider": "db",  # Required by Flask-AppBuilder
+                    "refresh": True,
                 },
-                verify=False,  # For Railway SSL issues
                 timeout=10,
                 allow_redirects=False,
             )
@@ -69,15 +357,13 @@ class SupersetClient:
             response.raise_for_status()
 
             data = response.json()
-            self.token = data.get("access_token")
-            if not self.token:
+            token = data.get("access_token")
+            if not token:
                 print(f"✗ No access token in response: {data}")
                 return False
 
-            self.headers = {
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json",
-            }
+            self.tokens.update(token, data.get("refresh_token"))
+            self._set_token(token)
 
             print("✓ Authentication successful")
             return True
@@ -88,47 +374,314 @@ class SupersetClient:
                 print(f"Response text: {e.response.text[:500]}")
             return False
 
-    def get_database_by_name(self, name: str) -> Optional[Dict[str, Any]]:
-        """Get database ID by name"""
+    def refresh_access_token(self) -> bool:
+        """Exchange the refresh token for a new access token"""
+        refresh_token = self.tokens.refresh_token
+        if not refresh_token or TokenManager.is_expired(refresh_token):
+            return False
         try:
-            response = self.session.get(
-                f"{self.base_url}/api/v1/databases",
-                headers=self.headers,
-                verify=False,
+            response = self._send(
+                "POST",
+                f"{self.base_url}/api/v1/security/refresh",
+                headers={"Authorization": f"Bearer {refresh_token}"},
+                timeout=10,
+                allow_redirects=False,
+            )
+            response.raise_for_status()
+
+            token = response.json().get("access_token")
+            if not token:
+                return False
+
+            self.tokens.update(token)
+            self._set_token(token)
+            print("✓ Access token refreshed")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Token refresh failed: {e}")
+            return False
+
+    def _set_token(self, token: str) -> None:
+        self.token = token
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+
+    def _renew_token(self, stale_token: Optional[str]) -> bool:
+        """Refresh, or log in again, unless another thread already did"""
+        with self._auth_lock:
+            if self.token != stale_token:
+                return True
+            return self.refresh_access_token() or self.login()
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the rate limiter, retrying transient failures
+
+        429 and 503 responses are retried for every method, since the server
+        did not process them. 502/504 responses and connection errors are only
+        retried for idempotent methods, so a create is never sent twice.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                # verify=False for Railway SSL issues
+                response = self.session.request(method, url, verify=False, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                status = response.status_code
+                retryable = status in (429, 503) or (
+                    idempotent and status in RETRYABLE_STATUSES
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                if status == 429:
+                    # Slow every caller down, not just this one
+                    self.rate_limiter.pause(delay)
+
+            attempt += 1
+            print(f"  ↻ {method} {url} retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send an authenticated request
+
+        The access token is refreshed shortly before it expires, and a
+        request rejected with 401 is retried once with a renewed token.
+        """
+        extra_headers = kwargs.pop("headers", {})
+        if self.token and self.tokens.needs_refresh():
+            self._renew_token(self.token)
+
+        for attempt in range(2):
+            token = self.token
+            response = self._send(
+                method,
+                f"{self.base_url}{path}",
+                headers={**self.headers, **extra_headers},
+                **kwargs,
+            )
+            if response.status_code != 401 or attempt or not self._renew_token(token):
+                return response
+        return response
+
+    def iter_resources(
+        self,
+        resource: str,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        columns: Optional[List[str]] = None,
+        page_size: int = 100,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield objects of a resource, fetching pages lazily
+
+        ``filters`` are Superset ``{"col", "opr", "value"}`` dicts and are
+        evaluated by the server, as is the ``columns`` selection.
+        """
+        page = 0
+        seen = 0
+        while True:
+            query: Dict[str, Any] = {"page": page, "page_size": page_size}
+            if filters:
+                query["filters"] = filters
+            if columns:
+                query["columns"] = columns
+
+            response = self._request(
+                "GET",
+                f"/api/v1/{resource}",
+                params={"q": rison_dumps(query)},
             )
             response.raise_for_status()
 
-            databases = response.json().get("result", [])
-            for db in databases:
-                if db.get("database_name") == name:
-                    print(f"✓ Found database: {name} (ID: {db.get('id')})")
-                    return db
+            data = response.json()
+            rows = data.get("result", [])
+            yield from rows
+
+            seen += len(rows)
+            # Superset caps page_size, so a short page need not be the last
+            if not rows or seen >= data.get("count", float("inf")):
+                return
+            page += 1
+
+    def find_resource(
+        self,
+        resource: str,
+        filters: List[Dict[str, Any]],
+        columns: Optional[List[str]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Get the first object matching filters, cached for ``cache_ttl``"""
+        key = (resource, rison_dumps(filters), rison_dumps(columns or []))
+        now = time.monotonic()
+        with self._lookup_lock:
+            cached = self._lookup_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        found = next(
+            iter(self.iter_resources(resource, filters, columns, page_size=1)),
+            None,
+        )
+        if found is not None:
+            with self._lookup_lock:
+                self._lookup_cache[key] = (now + self.cache_ttl, found)
+        return found
+
+    def invalidate_lookups(self, resource: Optional[str] = None) -> None:
+        """Drop cached lookups, for one resource or all of them"""
+        with self._lookup_lock:
+            if resource is None:
+                self._lookup_cache.clear()
+            else:
+                for key in [k for k in self._lookup_cache if k[0] == resource]:
+                    del self._lookup_cache[key]
+
+    def get_database_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get database ID by name"""
+        try:
+            db = self.find_resource(
+                "databases",
+                [{"col": "database_name", "opr": "eq", "value": name}],
+                columns=["id", "database_name"],
+            )
+            if db:
+                print(f"✓ Found database: {name} (ID: {db.get('id')})")
+                return db
 
             print(f"✗ Database '{name}' not found")
-            print(f"Available databases: {[db.get('database_name') for db in databases]}")
             return None
         except requests.exceptions.RequestException as e:
             print(f"✗ Failed to get databases: {e}")
             return None
 
-    def create_dataset(
+    def get_dataset(
         self, database_id: int, schema: str, table_name: str
     ) -> Optional[Dict[str, Any]]:
-        """Create dataset from table"""
+        """Get existing dataset for a table, if any"""
+        try:
+            return self.find_resource(
+                "datasets",
+                [
+                    {"col": "table_name", "opr": "eq", "value": table_name},
+                    {"col": "schema", "opr": "eq", "value": schema},
+                    {"col": "database", "opr": "rel_o_m", "value": database_id},
+                ],
+                columns=["id", "table_name", "schema"],
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to get datasets: {e}")
+            return None
+
+    def get_dataset_detail(self, dataset_id: int) -> Optional[Dict[str, Any]]:
+        """Get a dataset with its columns, metrics and ``extra``"""
+        try:
+            response = self._request(
+                "GET",
+                f"/api/v1/datasets/{dataset_id}",
+            )
+            response.raise_for_status()
+
+            return response.json().get("result", {})
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to get dataset {dataset_id}: {e}")
+            return None
+
+    def get_dataset_columns(self, dataset_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Get current column configuration of a dataset"""
+        dataset = self.get_dataset_detail(dataset_id)
+        if dataset is None:
+            return None
+        return dataset.get("columns", [])
+
+    def get_dashboard_by_title(self, title: str) -> Optional[Dict[str, Any]]:
+        """Get existing dashboard by title, if any"""
+        try:
+            return self.find_resource(
+                "dashboards",
+                [{"col": "dashboard_title", "opr": "eq", "value": title}],
+                columns=["id", "dashboard_title", "json_metadata", "published"],
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to get dashboards: {e}")
+            return None
+
+    def get_chart_by_title(
+        self, title: str, dataset_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get existing chart by title, optionally within one dataset"""
+        filters = [{"col": "chart_title", "opr": "eq", "value": title}]
+        if dataset_id is not None:
+            filters.append({"col": "datasource_id", "opr": "eq", "value": dataset_id})
+        try:
+            return self.find_resource(
+                "charts", filters, columns=["id", "chart_title", "visualization_type"]
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to get charts: {e}")
+            return None
+
+    def get_dashboard_charts(self, dashboard_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Get charts currently placed on a dashboard"""
+        try:
+            response = self._request(
+                "GET",
+                f"/api/v1/dashboards/{dashboard_id}/charts",
+            )
+            response.raise_for_status()
+
+            return response.json().get("result", [])
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to get charts of dashboard {dashboard_id}: {e}")
+            return None
+
+    def get_chart_data(
+        self, chart_id: int, force: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Run a chart's saved query, populating the data cache
+
+        ``force`` bypasses the cache and re-runs the query.
+        """
+        try:
+            response = self._request(
+                "GET",
+                f"/api/v1/charts/{chart_id}/data",
+                params={"format": "json", "force": "true" if force else "false"},
+            )
+            response.raise_for_status()
+
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to get data for chart {chart_id}: {e}")
+            return None
+
+    def create_dataset(
+        self, database_id: int, schema: str, table_name: str, sql: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Create dataset from table, or a virtual dataset when ``sql`` is given"""
         try:
             payload = {
                 "database_id": database_id,
                 "schema": schema,
                 "table_name": table_name,
             }
+            if sql:
+                payload["sql"] = sql
 
-            response = self.session.post(
-                f"{self.base_url}/api/v1/datasets",
-                headers=self.headers,
+            response = self._request(
+                "POST",
+                "/api/v1/datasets",
                 json=payload,
-                verify=False,
             )
             response.raise_for_status()
+            self.invalidate_lookups("datasets")
 
             dataset = response.json()
             dataset_id = dataset.get("id")
@@ -145,13 +698,13 @@ class SupersetClient:
         try:
             payload = {"columns": columns}
 
-            response = self.session.put(
-                f"{self.base_url}/api/v1/datasets/{dataset_id}",
-                headers=self.headers,
+            response = self._request(
+                "PUT",
+                f"/api/v1/datasets/{dataset_id}",
                 json=payload,
-                verify=False,
             )
             response.raise_for_status()
+            self.invalidate_lookups("datasets")
 
             print(f"✓ Columns configured for dataset {dataset_id}")
             return True
@@ -159,6 +712,65 @@ class SupersetClient:
             print(f"✗ Failed to configure columns: {e}")
             return False
 
+    def refresh_dataset(self, dataset_id: int) -> bool:
+        """Re-read a physical dataset's columns from the database"""
+        try:
+            response = self._request(
+                "PUT",
+                f"/api/v1/datasets/{dataset_id}/refresh",
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("datasets")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to refresh dataset {dataset_id}: {e}")
+            return False
+
+    def update_dataset(self, dataset_id: int, payload: Dict[str, Any]) -> bool:
+        """Update dataset fields; a ``columns`` list replaces all columns"""
+        try:
+            response = self._request(
+                "PUT",
+                f"/api/v1/datasets/{dataset_id}",
+                json=payload,
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("datasets")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to update dataset {dataset_id}: {e}")
+            response = getattr(e, "response", None)
+            print(f"Response: {response.text if response is not None else 'N/A'}")
+            return False
+
+    def execute_sql(
+        self, database_id: int, sql: str, schema: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Run SQL synchronously through SQL Lab
+
+        DDL and DML need "Allow DML" enabled on the database. POST is not
+        retried on gateway errors, so a statement never runs twice.
+        """
+        try:
+            response = self._request(
+                "POST",
+                "/api/v1/sqllab/execute/",
+                json={
+                    "database_id": database_id,
+                    "sql": sql,
+                    "schema": schema,
+                    "runAsync": False,
+                },
+            )
+            response.raise_for_status()
+
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to execute SQL on database {database_id}: {e}")
+            response = getattr(e, "response", None)
+            print(f"Response: {response.text if response is not None else 'N/A'}")
+            return None
+
     def create_chart(
         self,
         dataset_id: int,
@@ -175,13 +787,13 @@ class SupersetClient:
                 "query_context": query_context,
             }
 
-            response = self.session.post(
-                f"{self.base_url}/api/v1/charts",
-                headers=self.headers,
+            response = self._request(
+                "POST",
+                "/api/v1/charts",
                 json=payload,
-                verify=False,
             )
             response.raise_for_status()
+            self.invalidate_lookups("charts")
 
             chart = response.json()
             chart_id = chart.get("id")
@@ -189,9 +801,80 @@ class SupersetClient:
             return chart
         except requests.exceptions.RequestException as e:
             print(f"✗ Failed to create chart: {e}")
-            print(f"Response: {e.response.text if hasattr(e, 'response') else 'N/A'}")
+            response = getattr(e, "response", None)
+            print(f"Response: {response.text if response is not None else 'N/A'}")
             return None
 
+    def update_chart(self, chart_id: int, payload: Dict[str, Any]) -> bool:
+        """Update chart properties"""
+        try:
+            response = self._request(
+                "PUT",
+                f"/api/v1/charts/{chart_id}",
+                json=payload,
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("charts")
+
+            print(f"✓ Chart {chart_id} updated")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to update chart {chart_id}: {e}")
+            return False
+
+    def delete_chart(self, chart_id: int) -> bool:
+        """Delete chart"""
+        try:
+            response = self._request(
+                "DELETE",
+                f"/api/v1/charts/{chart_id}",
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("charts")
+
+            print(f"✓ Chart {chart_id} deleted")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to delete chart {chart_id}: {e}")
+            return False
+
+    def create_charts(
+        self, dataset_id: int, specs: List[Dict[str, Any]], max_workers: int = 4
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Create multiple charts concurrently
+
+        Each spec holds the ``chart_title``, ``visualization_type`` and
+        ``query_context`` arguments of ``create_chart``, and optionally a
+        ``dataset_id`` overriding the default one. Results are returned in
+        input order, with ``None`` in place of every chart that failed.
+        """
+        if not specs:
+            return []
+
+        def _create(spec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            return self.create_chart(
+                dataset_id=spec.get("dataset_id", dataset_id),
+                chart_title=spec["chart_title"],
+                visualization_type=spec["visualization_type"],
+                query_context=spec["query_context"],
+            )
+
+        workers = max(1, min(max_workers, len(specs)))
+        if workers == 1:
+            results = [_create(spec) for spec in specs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_create, specs))
+
+        failed = [
+            spec["chart_title"]
+            for spec, result in zip(specs, results)
+            if result is None
+        ]
+        if failed:
+            print(f"✗ {len(failed)}/{len(specs)} charts failed: {failed}")
+        return results
+
     def create_dashboard(
         self, title: str, description: str = ""
     ) -> Optional[Dict[str, Any]]:
@@ -203,13 +886,13 @@ class SupersetClient:
                 "dashboard_layout_version": "GRID_LAYOUT_v1",
             }
 
-            response = self.session.post(
-                f"{self.base_url}/api/v1/dashboards",
-                headers=self.headers,
+            response = self._request(
+                "POST",
+                "/api/v1/dashboards",
                 json=payload,
-                verify=False,
             )
             response.raise_for_status()
+            self.invalidate_lookups("dashboards")
 
             dashboard = response.json()
             dashboard_id = dashboard.get("id")
@@ -219,37 +902,42 @@ class SupersetClient:
             print(f"✗ Failed to create dashboard: {e}")
             return None
 
+    def update_dashboard(self, dashboard_id: int, payload: Dict[str, Any]) -> bool:
+        """Update dashboard properties"""
+        try:
+            response = self._request(
+                "PUT",
+                f"/api/v1/dashboards/{dashboard_id}",
+                json=payload,
+            )
+            response.raise_for_status()
+            self.invalidate_lookups("dashboards")
+
+            print(f"✓ Dashboard {dashboard_id} updated")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Failed to update dashboard {dashboard_id}: {e}")
+            return False
+
     def add_charts_to_dashboard(
-        self, dashboard_id: int, chart_configs: list
+        self,
+        dashboard_id: int,
+        chart_configs: list,
+        json_metadata: Optional[Dict[str, Any]] = None,
     ) -> bool:
         """Add multiple charts to dashboard with positions"""
         try:
-            dashboard_layout = {
-                "GRID_ID": {
-                    "GRID_DATA": {}
-                }
-            }
-
-            for config in chart_configs:
-                grid_id = str(config["grid_id"])
-                dashboard_layout["GRID_ID"]["GRID_DATA"][grid_id] = {
-                    "meta": {
-                        "chartId": config["chart_id"],
-                        "height": config["height"],
-                        "width": config["width"],
-                        "sliceName": config["name"],
-                    }
-                }
-
-            payload = {"dashboard_layout": dashboard_layout}
+            payload = {"dashboard_layout": build_dashboard_layout(chart_configs)}
+            if json_metadata is not None:
+                payload["json_metadata"] = json.dumps(json_metadata)
 
-            response = self.session.put(
-                f"{self.base_url}/api/v1/dashboards/{dashboard_id}",
-                headers=self.headers,
+            response = self._request(
+                "PUT",
+                f"/api/v1/dashboards/{dashboard_id}",
                 json=payload,
-                verify=False,
             )
             response.raise_for_status()
+            self.invalidate_lookups("dashboards")
 
             print(f"✓ Charts added to dashboard {dashboard_id}")
             return True
@@ -262,13 +950,13 @@ class SupersetClient:
         try:
             payload = {"published": True}
 
-            response = self.session.put(
-                f"{self.base_url}/api/v1/dashboards/{dashboard_id}",
-                headers=self.headers,
+            response = self._request(
+                "PUT",
+                f"/api/v1/dashboards/{dashboard_id}",
                 json=payload,
-                verify=False,
             )
             response.raise_for_status()
+            self.invalidate_lookups("dashboards")
 
             print(f"✓ Dashboard {dashboard_id} published")
             return True
@@ -276,150 +964,985 @@ class SupersetClient:
             print(f"✗ Failed to publish dashboard: {e}")
             return False
 
+    def export_dashboards(self, dashboard_ids: List[int], path: str) -> bool:
+        """Stream a ZIP bundle of dashboards (with charts, datasets, databases) to disk"""
+        tmp_path = f"{path}.part"
+        try:
+            response = self._request(
+                "GET",
+                "/api/v1/dashboard/export/",
+                params={"q": rison_dumps(list(dashboard_ids))},
+                stream=True,
+            )
+            with response:
+                response.raise_for_status()
+                size = 0
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=BUNDLE_CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp_path, path)
+
+            print(f"✓ Exported dashboards {list(dashboard_ids)} to {path} ({size} bytes)")
+            return True
+        except (requests.exceptions.RequestException, OSError) as e:
+            print(f"✗ Failed to export dashboards: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
 
-def main():
-    """Create complete log event dashboard"""
+    def import_dashboards(
+        self,
+        path: str,
+        overwrite: bool = False,
+        passwords: Optional[Dict[str, str]] = None,
+    ) -> bool:
+        """Import a dashboard ZIP bundle, streaming it from disk
+
+        ``passwords`` maps database files in the bundle, e.g.
+        ``databases/supabase_staging.yaml``, to their passwords, which
+        exports never include.
+        """
+        fields = {"overwrite": "true" if overwrite else "false"}
+        if passwords:
+            fields["passwords"] = json.dumps(passwords)
+        body = MultipartFileBody(fields, "formData", path, "application/zip")
+        try:
+            response = self._request(
+                "POST",
+                "/api/v1/dashboard/import/",
+                data=body,
+                headers={"Content-Type": body.content_type},
+            )
+            response.raise_for_status()
+            self.invalidate_lookups()
 
-    print("\n" + "=" * 60)
-    print("Creating Log Event Dashboard in Superset")
-    print("=" * 60 + "\n")
+            print(f"✓ Imported dashboard bundle {path}")
+            return True
+        except (requests.exceptions.RequestException, OSError) as e:
+            print(f"✗ Failed to import dashboard bundle: {e}")
+            response = getattr(e, "response", None)
+            if response is not None:
+                print(f"Response: {response.text[:500]}")
+            return False
 
-    # Initialize client
-    client = SupersetClient(SUPERSET_URL, SUPERSET_USERNAME, SUPERSET_PASSWORD)
 
-    # Step 1: Authenticate
-    print("[1/7] Authenticating...")
-    if not client.authenticate():
-        print("Failed to authenticate. Exiting.")
-        return
+class MultipartFileBody:
+    """multipart/form-data request body that streams a file from disk
+
+    The body can be iterated more than once, so the request survives a
+    retry, and its length is known up front, so it is not sent chunked.
+    """
+
+    def __init__(
+        self, fields: Dict[str, str], file_field: str, path: str, content_type: str
+    ):
+        self.path = path
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        parts.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; '
+            f'filename="{os.path.basename(path)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        )
+        self.head = "".join(parts).encode("utf-8")
+        self.tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.head) + os.path.getsize(self.path) + len(self.tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.head
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(BUNDLE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        yield self.tail
+
+
+def template_bundle(
+    src: str, dst: str, replacements: Dict[str, Dict[str, str]]
+) -> int:
+    """Copy a dashboard bundle, renaming databases, schemas or tables
+
+    ``replacements`` maps a top-level YAML key of the bundle's files
+    (``database_name``, ``schema``, ``table_name``, ``sqlalchemy_uri``...)
+    to ``{old value: new value}``. Only YAML files are rewritten, one
+    member at a time, so large bundles are never held in memory. Returns
+    the number of values replaced.
+    """
+    patterns = [
+        (
+            re.compile(rf"^({re.escape(key)}:\s*)(['\"]?){re.escape(old)}\2\s*$", re.M),
+            new,
+        )
+        for key, values in replacements.items()
+        for old, new in values.items()
+    ]
+
+    replaced = 0
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(
+        dst, "w", compression=zipfile.ZIP_DEFLATED
+    ) as zout:
+        for info in zin.infolist():
+            if not info.filename.endswith((".yaml", ".yml")):
+                with zin.open(info) as fin, zout.open(info.filename, "w") as fout:
+                    shutil.copyfileobj(fin, fout, BUNDLE_CHUNK_SIZE)
+                continue
+
+            text = zin.read(info).decode("utf-8")
+            for pattern, new in patterns:
+                text, count = pattern.subn(
+                    lambda m: f"{m.group(1)}{m.group(2)}{new}{m.group(2)}", text
+                )
+                replaced += count
+            zout.writestr(info.filename, text)
+    return replaced
+
+
+def load_spec(path: str) -> Dict[str, Any]:
+    """Load a declarative dashboard spec from a JSON file"""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+
+    missing = [
+        key for key in ("database", "dataset", "charts", "dashboard")
+        if key not in spec
+    ]
+    if missing:
+        raise ValueError(f"Spec {path} is missing required keys: {missing}")
+
+    rollups = {}
+    for rollup in spec.setdefault("rollups", []):
+        rollup.setdefault("kind", "table")
+        rollup.setdefault("grain", "hour")
+        if rollup["kind"] not in ROLLUP_KINDS:
+            raise ValueError(f"Rollup kind must be one of {ROLLUP_KINDS}: {rollup}")
+        if rollup["grain"] not in ROLLUP_GRAINS:
+            raise ValueError(f"Rollup grain must be one of {ROLLUP_GRAINS}: {rollup}")
+        rollups[rollup["table_name"]] = rollup
+    for chart in spec["charts"]:
+        dataset = chart.get("dataset")
+        if dataset and dataset not in rollups:
+            raise ValueError(
+                f"Chart {chart['chart_title']!r} uses unknown rollup {dataset!r}"
+            )
+        time_column, time_range = time_window(spec, dataset)
+        if time_range and not time_column:
+            raise ValueError(
+                f"Chart {chart['chart_title']!r} needs a time column for the "
+                f"default time range {time_range!r}"
+            )
+    for native_filter in spec["dashboard"].get("native_filters", []):
+        if native_filter.get("type") not in NATIVE_FILTER_TYPES:
+            raise ValueError(
+                f"Native filter type must be one of {NATIVE_FILTER_TYPES}: {native_filter}"
+            )
+        if native_filter["type"] == "select" and not native_filter.get("column"):
+            raise ValueError(f"Select filter needs a column: {native_filter}")
+        dataset = native_filter.get("dataset")
+        if dataset and dataset not in rollups:
+            raise ValueError(
+                f"Native filter {native_filter.get('name')!r} uses unknown rollup {dataset!r}"
+            )
+    return spec
+
+
+def spec_fingerprint(spec: Dict[str, Any]) -> str:
+    """Stable hash of a spec, stored on the dashboard to detect changes"""
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+ROLLUP_KINDS = ("table", "materialized_view", "virtual")
+ROLLUP_GRAINS = ("minute", "hour", "day")
+NATIVE_FILTER_TYPES = ("time", "select")
+_SQL_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _identifier(name: str) -> str:
+    """Reject names that would need quoting; rollup SQL is built from them"""
+    if not _SQL_IDENTIFIER.match(name or ""):
+        raise ValueError(f"Invalid SQL identifier in rollup spec: {name!r}")
+    return name
+
+
+def rollup_select_sql(
+    spec: Dict[str, Any], rollup: Dict[str, Any], since: Optional[str] = None
+) -> str:
+    """Aggregate the raw table to one row per time bucket and dimensions
+
+    The bucket keeps the name of the raw time column, so charts written
+    against the raw table keep working; ``since`` is a SQL expression that
+    limits the scan to recent rows.
+    """
+    source = f"{_identifier(spec['dataset']['schema'])}.{_identifier(spec['dataset']['table_name'])}"
+    time_column = _identifier(rollup["time_column"])
+    dimensions = [_identifier(d) for d in rollup.get("dimensions", [])]
+    count_column = _identifier(rollup.get("count_column", "event_count"))
+    group_by = ", ".join(str(i) for i in range(1, len(dimensions) + 2))
+
+    sql = (
+        f"SELECT date_trunc('{rollup['grain']}', {time_column}) AS {time_column}, "
+        + "".join(f"{d}, " for d in dimensions)
+        + f"COUNT(*) AS {count_column} FROM {source}"
+    )
+    if since:
+        sql += f" WHERE {time_column} >= {since}"
+    return f"{sql} GROUP BY {group_by}"
+
+
+def _rollup_window(rollup: Dict[str, Any]) -> str:
+    """Start of the buckets an incremental refresh recomputes"""
+    return (
+        f"date_trunc('{rollup['grain']}', now() - interval "
+        f"'{int(rollup.get('lookback_hours', 2))} hours')"
+    )
+
+
+def rollup_setup_sql(spec: Dict[str, Any], rollup: Dict[str, Any]) -> Optional[str]:
+    """DDL creating a rollup's storage; None for virtual rollups"""
+    schema = _identifier(spec["dataset"]["schema"])
+    name = _identifier(rollup["table_name"])
+    time_column = _identifier(rollup["time_column"])
+    if rollup["kind"] == "virtual":
+        return None
+    storage = "MATERIALIZED VIEW" if rollup["kind"] == "materialized_view" else "TABLE"
+    return (
+        f"CREATE {storage} IF NOT EXISTS {schema}.{name} AS "
+        f"{rollup_select_sql(spec, rollup)};\n"
+        f"CREATE INDEX IF NOT EXISTS {name}_{time_column}_idx "
+        f"ON {schema}.{name} ({time_column})"
+    )
+
+
+def rollup_refresh_sql(spec: Dict[str, Any], rollup: Dict[str, Any]) -> Optional[str]:
+    """SQL bringing a rollup up to date; None for virtual rollups
+
+    Tables are refreshed incrementally: the buckets inside the lookback
+    window are deleted and recomputed in a single statement, so readers
+    never see them half-written. Materialized views can only be refreshed
+    in full.
+    """
+    schema = _identifier(spec["dataset"]["schema"])
+    name = _identifier(rollup["table_name"])
+    if rollup["kind"] == "virtual":
+        return None
+    if rollup["kind"] == "materialized_view":
+        return f"REFRESH MATERIALIZED VIEW {schema}.{name}"
+
+    window = _rollup_window(rollup)
+    return (
+        f"WITH stale AS (DELETE FROM {schema}.{name} "
+        f"WHERE {_identifier(rollup['time_column'])} >= {window}) "
+        f"INSERT INTO {schema}.{name} {rollup_select_sql(spec, rollup, since=window)}"
+    )
+
+
+def rollup_steps(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """What creating each rollup of a spec takes, for either client
+
+    ``setup_sql`` creates the storage (None for virtual rollups), ``sql``
+    is the virtual dataset's query (None for stored rollups) and
+    ``columns`` the dataset's column settings.
+    """
+    return [
+        {
+            "table_name": rollup["table_name"],
+            "setup_sql": rollup_setup_sql(spec, rollup),
+            "sql": rollup_select_sql(spec, rollup) if rollup["kind"] == "virtual" else None,
+            "columns": rollup.get("columns", []),
+        }
+        for rollup in spec.get("rollups", [])
+    ]
+
+
+def ensure_rollups(
+    client: SupersetClient, spec: Dict[str, Any], database_id: int
+) -> Optional[Dict[str, int]]:
+    """Create missing rollups and their datasets; map table name to dataset ID
+
+    Existing rollup datasets are left as they are. To change a rollup's
+    definition, give it a new ``table_name``.
+    """
+    schema = spec["dataset"]["schema"]
+    dataset_ids = {}
+    for step in rollup_steps(spec):
+        table_name = step["table_name"]
+        dataset = client.get_dataset(database_id, schema, table_name)
+        if dataset:
+            print(f"✓ Found rollup dataset: {table_name} (ID: {dataset.get('id')})")
+            dataset_ids[table_name] = dataset.get("id")
+            continue
+
+        if step["setup_sql"] and client.execute_sql(database_id, step["setup_sql"], schema) is None:
+            print(f"✗ Failed to create rollup {table_name}")
+            return None
+
+        dataset = client.create_dataset(database_id, schema, table_name, sql=step["sql"])
+        if not dataset:
+            return None
+        dataset_id = dataset.get("id")
+        if step["columns"]:
+            client.configure_columns(dataset_id, step["columns"])
+        dataset_ids[table_name] = dataset_id
+    return dataset_ids
+
+
+def refresh_rollups(client: SupersetClient, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the refresh SQL of every stored rollup in a spec"""
+    started = time.monotonic()
+    database = client.get_database_by_name(spec["database"])
+    if not database:
+        raise RuntimeError(f"Database {spec['database']!r} not found")
+
+    refreshed, failed = [], []
+    for rollup in spec.get("rollups", []):
+        sql = rollup_refresh_sql(spec, rollup)
+        if sql is None:
+            continue
+        if client.execute_sql(database.get("id"), sql, spec["dataset"]["schema"]) is None:
+            failed.append(rollup["table_name"])
+        else:
+            refreshed.append(rollup["table_name"])
+
+    summary = {
+        "refreshed": refreshed,
+        "failed": failed,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    print(f"✓ Refreshed {len(refreshed)} rollups in {summary['seconds']}s")
+    if failed:
+        print(f"✗ Failed rollups: {failed}")
+    return summary
+
+
+# Column settings applied by sync-columns; later rules override earlier ones.
+# "match" is a column name pattern, "type" one or more database type
+# patterns (both case-insensitive fnmatch), and "max_distinct" only matches
+# columns with at most that many distinct values in a sample of the table.
+DEFAULT_COLUMN_RULES = [
+    {"match": ["*_at", "*_date", "*_time"], "set": {"is_dttm": True}},
+    {"type": ["TIMESTAMP*", "DATE", "DATETIME*"], "set": {"is_dttm": True}},
+    {"match": "*_id", "set": {"filterable": True}},
+    {
+        "type": ["*CHAR*", "TEXT", "STRING"],
+        "max_distinct": 100,
+        "set": {"groupby": True, "filterable": True},
+    },
+]
+COLUMN_RULE_KEYS = ("match", "type", "max_distinct", "set")
+# Fields accepted for each column by PUT /api/v1/datasets/<id>
+COLUMN_PUT_FIELDS = (
+    "id", "column_name", "type", "verbose_name", "description", "expression",
+    "filterable", "groupby", "is_active", "is_dttm", "python_date_format",
+    "extra", "advanced_data_type", "uuid",
+)
+COLUMN_SYNC_WORKERS = int(os.getenv("SUPERSET_COLUMN_SYNC_WORKERS", "8"))
+COLUMN_SYNC_SAMPLE_ROWS = int(os.getenv("SUPERSET_COLUMN_SYNC_SAMPLE_ROWS", "10000"))
+
+
+def _patterns(value: Any) -> List[str]:
+    return [value] if isinstance(value, str) else list(value or [])
+
+
+def load_column_rules(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Load and validate column rules from a JSON list, or the defaults"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+    else:
+        rules = DEFAULT_COLUMN_RULES
+    if not isinstance(rules, list):
+        raise ValueError("Column rules must be a JSON list")
+    for rule in rules:
+        unknown = set(rule) - set(COLUMN_RULE_KEYS)
+        if unknown or not isinstance(rule.get("set"), dict) or not rule["set"]:
+            raise ValueError(f"Invalid column rule (keys {COLUMN_RULE_KEYS}): {rule}")
+        bad = set(rule["set"]) - (set(COLUMN_PUT_FIELDS) - {"id", "column_name", "uuid"})
+        if bad:
+            raise ValueError(f"Column rule sets unsupported fields {sorted(bad)}: {rule}")
+    return rules
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def schema_hash_sql(schemas: List[str]) -> str:
+    """One row per table with a hash of its column names and types (Postgres)"""
+    return (
+        "SELECT table_schema, table_name, "
+        "md5(string_agg(column_name || ':' || data_type, ',' ORDER BY ordinal_position)) "
+        "AS schema_hash FROM information_schema.columns "
+        f"WHERE table_schema IN ({', '.join(_quote_literal(s) for s in sorted(schemas))}) "
+        "GROUP BY table_schema, table_name"
+    )
+
+
+def distinct_counts_sql(schema: Optional[str], table_name: str, columns: List[str]) -> str:
+    """Distinct values per column in a sample of the table"""
+    table = _quote_identifier(table_name)
+    if schema:
+        table = f"{_quote_identifier(schema)}.{table}"
+    quoted = [_quote_identifier(c) for c in columns]
+    return (
+        f"SELECT {', '.join(f'COUNT(DISTINCT {q}) AS {q}' for q in quoted)} "
+        f"FROM (SELECT {', '.join(quoted)} FROM {table} "
+        f"LIMIT {COLUMN_SYNC_SAMPLE_ROWS}) AS sample"
+    )
+
+
+def _rule_matches(
+    rule: Dict[str, Any], column: Dict[str, Any], distinct: Dict[str, int]
+) -> bool:
+    name = (column.get("column_name") or "").lower()
+    column_type = (column.get("type") or "").upper()
+    if "match" in rule and not any(
+        fnmatch(name, p.lower()) for p in _patterns(rule["match"])
+    ):
+        return False
+    if "type" in rule and not any(
+        fnmatch(column_type, p.upper()) for p in _patterns(rule["type"])
+    ):
+        return False
+    if "max_distinct" in rule:
+        count = distinct.get(column.get("column_name"))
+        if count is None or count > rule["max_distinct"]:
+            return False
+    return True
+
+
+def apply_column_rules(
+    columns: List[Dict[str, Any]],
+    rules: List[Dict[str, Any]],
+    distinct: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """The full column list for a dataset PUT, with rule settings applied
+
+    Columns keep their IDs and every setting no rule touches; calculated
+    columns (with an ``expression``) are left as they are.
+    """
+    result = []
+    for column in columns:
+        updated = {k: column[k] for k in COLUMN_PUT_FIELDS if column.get(k) is not None}
+        if not column.get("expression"):
+            for rule in rules:
+                if _rule_matches(rule, column, distinct or {}):
+                    updated.update(rule["set"])
+        result.append(updated)
+    return result
+
+
+def _needs_distinct_counts(rules: List[Dict[str, Any]]) -> bool:
+    return any("max_distinct" in rule for rule in rules)
+
+
+def _distinct_candidates(
+    columns: List[Dict[str, Any]], rules: List[Dict[str, Any]]
+) -> List[str]:
+    """Columns matched by a max_distinct rule on everything but the count"""
+    names = []
+    for column in columns:
+        if column.get("expression"):
+            continue
+        for rule in rules:
+            if "max_distinct" not in rule:
+                continue
+            unbounded = {k: v for k, v in rule.items() if k != "max_distinct"}
+            if _rule_matches(unbounded, column, {}):
+                names.append(column["column_name"])
+                break
+    return names
+
+
+def sync_dataset(
+    client: SupersetClient,
+    dataset: Dict[str, Any],
+    rules: List[Dict[str, Any]],
+    rules_fingerprint: str,
+    schema_hash: Optional[str],
+    force: bool = False,
+) -> str:
+    """Refresh one dataset's columns and apply rules; returns synced/skipped/failed"""
+    dataset_id = dataset.get("id")
+    label = f"{dataset.get('schema')}.{dataset.get('table_name')} (ID: {dataset_id})"
+    stored = _as_dict(dataset.get("extra")).get("column_sync_hash")
+    expected = (
+        spec_fingerprint({"rules": rules_fingerprint, "schema": schema_hash})
+        if schema_hash else None
+    )
+    if expected and stored == expected and not force:
+        return "skipped"
+
+    if not client.refresh_dataset(dataset_id):
+        return "failed"
+    detail = client.get_dataset_detail(dataset_id)
+    if detail is None:
+        return "failed"
+    columns = detail.get("columns", [])
+    if expected is None:
+        # No hash from the database: hash the refreshed columns instead
+        expected = spec_fingerprint({
+            "rules": rules_fingerprint,
+            "schema": [(c.get("column_name"), c.get("type")) for c in columns],
+        })
+    extra = _as_dict(detail.get("extra"))
+    if extra.get("column_sync_hash") == expected and not force:
+        return "skipped"
+
+    distinct: Dict[str, int] = {}
+    candidates = _distinct_candidates(columns, rules)
+    if candidates:
+        result = client.execute_sql(
+            dataset["database"]["id"],
+            distinct_counts_sql(detail.get("schema"), detail.get("table_name"), candidates),
+            detail.get("schema"),
+        )
+        rows = (result or {}).get("data") or []
+        if rows:
+            distinct = {name: int(count) for name, count in rows[0].items()}
+        else:
+            print(f"✗ No distinct counts for {label}; max_distinct rules skipped")
+
+    extra["column_sync_hash"] = expected
+    if not client.update_dataset(
+        dataset_id,
+        {"columns": apply_column_rules(columns, rules, distinct), "extra": json.dumps(extra)},
+    ):
+        return "failed"
+    print(f"✓ Synced columns of {label}")
+    return "synced"
+
+
+def sync_dataset_columns(
+    client: SupersetClient,
+    rules: Optional[List[Dict[str, Any]]] = None,
+    database_name: Optional[str] = None,
+    max_workers: int = COLUMN_SYNC_WORKERS,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Refresh physical datasets from the database and apply column rules
+
+    Datasets whose table schema (and the rules) are unchanged since the last
+    sync are skipped. On Postgres that is decided with one information_schema
+    query per database, so an unchanged dataset costs no request of its own.
+    """
+    started = time.monotonic()
+    rules = rules if rules is not None else load_column_rules()
+    rules_fingerprint = spec_fingerprint({"rules": rules})
+
+    filters = []
+    if database_name:
+        database = client.get_database_by_name(database_name)
+        if not database:
+            raise RuntimeError(f"Database {database_name!r} not found")
+        filters.append({"col": "database", "opr": "rel_o_m", "value": database.get("id")})
+    datasets = [
+        dataset
+        for dataset in client.iter_resources(
+            "datasets",
+            filters,
+            columns=["id", "table_name", "schema", "sql", "extra", "database.id"],
+        )
+        # Virtual datasets have no table to introspect
+        if not dataset.get("sql")
+    ]
+
+    hashes: Dict[Tuple[int, str, str], str] = {}
+    by_database: Dict[int, set] = {}
+    for dataset in datasets:
+        by_database.setdefault(dataset["database"]["id"], set()).add(dataset.get("schema"))
+    for database_id, schemas in by_database.items():
+        result = client.execute_sql(database_id, schema_hash_sql([s for s in schemas if s]))
+        for row in (result or {}).get("data") or []:
+            key = (database_id, row["table_schema"], row["table_name"])
+            hashes[key] = row["schema_hash"]
+
+    def _sync(dataset: Dict[str, Any]) -> str:
+        key = (dataset["database"]["id"], dataset.get("schema"), dataset.get("table_name"))
+        return sync_dataset(
+            client, dataset, rules, rules_fingerprint, hashes.get(key), force=force
+        )
+
+    workers = max(1, min(max_workers, len(datasets)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(_sync, datasets))
+
+    summary = {
+        outcome: [d.get("id") for d, o in zip(datasets, outcomes) if o == outcome]
+        for outcome in ("synced", "skipped", "failed")
+    }
+    summary["seconds"] = round(time.monotonic() - started, 3)
+    print(
+        f"✓ Column sync: {len(summary['synced'])} synced, "
+        f"{len(summary['skipped'])} unchanged, {len(summary['failed'])} failed "
+        f"in {summary['seconds']}s"
+    )
+    return summary
+
+
+def time_window(
+    spec: Dict[str, Any], rollup_name: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """Time column and default time range of the raw dataset or a rollup
+
+    The time column is the dataset's ``time_column``, else its first
+    temporal column; rollups use their bucket column. Rollups without a
+    ``default_time_range`` of their own inherit the dataset's.
+    """
+    dataset = spec["dataset"]
+    time_column = dataset.get("time_column") or next(
+        (c["column_name"] for c in dataset.get("columns", []) if c.get("is_dttm")),
+        None,
+    )
+    time_range = dataset.get("default_time_range")
+    if rollup_name:
+        rollup = next(r for r in spec["rollups"] if r["table_name"] == rollup_name)
+        time_column = rollup["time_column"]
+        time_range = rollup.get("default_time_range", time_range)
+    return time_column, time_range
+
+
+def bound_form_data(
+    form_data: Dict[str, Any], time_column: Optional[str], time_range: Optional[str]
+) -> Dict[str, Any]:
+    """Give a chart's form data a time range filter on the time column
+
+    Charts without a ``time_range`` get the dataset default. The range is
+    also added as a TEMPORAL_RANGE filter, so the query always carries a
+    WHERE on the (indexed) time column, whatever the visualization type.
+    """
+    form_data = dict(form_data)
+    if time_range:
+        form_data.setdefault("time_range", time_range)
+    if not time_column or not form_data.get("time_range"):
+        return form_data
+    form_data.setdefault("granularity_sqla", time_column)
+    filters = list(form_data.get("adhoc_filters", []))
+    if not any(f.get("operator") == "TEMPORAL_RANGE" for f in filters):
+        filters.append(
+            {
+                "expressionType": "SIMPLE",
+                "clause": "WHERE",
+                "subject": time_column,
+                "operator": "TEMPORAL_RANGE",
+                "comparator": form_data["time_range"],
+            }
+        )
+    form_data["adhoc_filters"] = filters
+    return form_data
+
+
+def build_chart_specs(
+    spec: Dict[str, Any],
+    dataset_id: int,
+    rollup_ids: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """Build create_chart arguments and dashboard positions from a spec
+
+    Charts naming a rollup in ``dataset`` query that rollup's dataset,
+    looked up in ``rollup_ids``; the others query the raw table. Every
+    chart is bounded by its dataset's default time range (see time_window).
+    """
+    chart_specs = []
+    for chart in spec["charts"]:
+        table_name = chart.get("dataset") or spec["dataset"]["table_name"]
+        chart_dataset_id = (
+            rollup_ids[chart["dataset"]] if chart.get("dataset") else dataset_id
+        )
+        form_data = bound_form_data(
+            chart.get("form_data", {}), *time_window(spec, chart.get("dataset"))
+        )
+        form_data["datasource_name"] = table_name
+        layout = chart.get("layout", {})
+        chart_specs.append(
+            {
+                "chart_title": chart["chart_title"],
+                "visualization_type": chart["visualization_type"],
+                "dataset_id": chart_dataset_id,
+                "query_context": {
+                    "datasource": {"id": chart_dataset_id, "type": "table"},
+                    "form_data": form_data,
+                },
+                "height": layout.get("height", 50),
+                "width": layout.get("width", 12),
+                "name": layout.get("name", chart["chart_title"]),
+            }
+        )
+    return chart_specs
+
+
+def build_native_filters(
+    spec: Dict[str, Any],
+    dataset_id: int,
+    rollup_ids: Dict[str, int],
+    chart_ids: List[int],
+) -> List[Dict[str, Any]]:
+    """Build the ``native_filter_configuration`` for a dashboard's json_metadata
+
+    Filters apply to every chart on the dashboard. Their IDs derive from
+    their names, so reapplying a spec keeps the filter state in saved
+    permalinks. Select filters list values from the raw dataset, or from
+    the rollup named in ``dataset``, which is much cheaper to scan.
+    """
+    native_filters = []
+    for native_filter in spec["dashboard"].get("native_filters", []):
+        name = native_filter.get("name") or native_filter.get("column") or "Time range"
+        config = {
+            "id": "NATIVE_FILTER-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:10],
+            "name": name,
+            "type": "NATIVE_FILTER",
+            "description": native_filter.get("description", ""),
+            "cascadeParentIds": [],
+            "scope": {"rootPath": ["ROOT_ID"], "excluded": []},
+            "chartsInScope": list(chart_ids),
+        }
+        default = native_filter.get("default")
+        if native_filter["type"] == "time":
+            default = default or spec["dataset"].get("default_time_range")
+            config.update(
+                filterType="filter_time",
+                targets=[{}],
+                # Required: the range can be changed but not cleared
+                controlValues={"enableEmptyFilter": bool(default)},
+                defaultDataMask={
+                    "extraFormData": {"time_range": default} if default else {},
+                    "filterState": {"value": default} if default else {},
+                },
+            )
+        else:
+            column = native_filter["column"]
+            values = default if isinstance(default, list) else [default] if default else []
+            config.update(
+                filterType="filter_select",
+                targets=[
+                    {
+                        "datasetId": (
+                            rollup_ids[native_filter["dataset"]]
+                            if native_filter.get("dataset")
+                            else dataset_id
+                        ),
+                        "column": {"name": column},
+                    }
+                ],
+                controlValues={
+                    "multiSelect": native_filter.get("multi", True),
+                    "enableEmptyFilter": False,
+                    "defaultToFirstItem": False,
+                    "inverseSelection": False,
+                    "searchAllOptions": native_filter.get("search_all", False),
+                },
+                defaultDataMask={
+                    "extraFormData": (
+                        {"filters": [{"col": column, "op": "IN", "val": values}]}
+                        if values
+                        else {}
+                    ),
+                    "filterState": {"value": values} if values else {},
+                },
+            )
+        native_filters.append(config)
+    return native_filters
+
+
+def build_dashboard_layout(chart_configs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the grid layout for charts placed on a dashboard"""
+    dashboard_layout = {
+        "GRID_ID": {
+            "GRID_DATA": {}
+        }
+    }
+
+    for config in chart_configs:
+        grid_id = str(config["grid_id"])
+        dashboard_layout["GRID_ID"]["GRID_DATA"][grid_id] = {
+            "meta": {
+                "chartId": config["chart_id"],
+                "height": config["height"],
+                "width": config["width"],
+                "sliceName": config["name"],
+            }
+        }
+    return dashboard_layout
+
+
+def _as_dict(value: Any) -> Dict[str, Any]:
+    """Superset returns some JSON fields as strings; normalize them"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value) if value else {}
+        except ValueError:
+            return {}
+    return value or {}
+
+
+def changed_columns(
+    desired: List[Dict[str, Any]], current: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Spec columns with a setting that differs from the dataset's"""
+    by_name = {column.get("column_name"): column for column in current}
+    return [
+        column
+        for column in desired
+        if any(
+            by_name.get(column["column_name"], {}).get(key) != value
+            for key, value in column.items()
+        )
+    ]
+
+
+def plan_charts(
+    chart_specs: List[Dict[str, Any]], existing: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Diff chart specs against the charts already on a dashboard
+
+    Charts are matched by title. Returns the specs to create, the
+    ``(chart_id, payload)`` updates, the IDs of charts no longer in the
+    spec, and the IDs of the charts kept, by title.
+    """
+    remaining = {chart.get("chart_title"): chart for chart in existing}
+    plan = {"create": [], "update": [], "delete": [], "chart_ids": {}}
+    for chart_spec in chart_specs:
+        current = remaining.pop(chart_spec["chart_title"], None)
+        if current is None:
+            plan["create"].append(chart_spec)
+            continue
+
+        plan["chart_ids"][chart_spec["chart_title"]] = current.get("id")
+        if (
+            current.get("visualization_type") != chart_spec["visualization_type"]
+            or _as_dict(current.get("query_context")) != chart_spec["query_context"]
+        ):
+            plan["update"].append(
+                (
+                    current.get("id"),
+                    {
+                        "dataset_id": chart_spec["dataset_id"],
+                        "visualization_type": chart_spec["visualization_type"],
+                        "query_context": chart_spec["query_context"],
+                    },
+                )
+            )
+    # Charts left over were placed by an earlier version of the spec
+    plan["delete"] = [chart.get("id") for chart in remaining.values()]
+    return plan
+
+
+def dashboard_payload(
+    spec: Dict[str, Any],
+    chart_specs: List[Dict[str, Any]],
+    chart_ids: Dict[str, int],
+    dataset_id: int,
+    rollup_ids: Dict[str, int],
+    metadata: Dict[str, Any],
+    fingerprint: Optional[str],
+) -> Dict[str, Any]:
+    """PUT /api/v1/dashboards/<id> body placing the charts of a spec
+
+    Charts missing from ``chart_ids`` (e.g. failed to create) are left
+    out. The fingerprint is stored in ``metadata``, or dropped from it when
+    None, so an incomplete dashboard is applied again next time.
+    """
+    chart_configs = [
+        {
+            "grid_id": grid_id,
+            "chart_id": chart_ids[chart_spec["chart_title"]],
+            "height": chart_spec["height"],
+            "width": chart_spec["width"],
+            "name": chart_spec["name"],
+        }
+        for grid_id, chart_spec in enumerate(chart_specs)
+        if chart_spec["chart_title"] in chart_ids
+    ]
+    metadata = dict(metadata)
+    if "native_filters" in spec["dashboard"]:
+        metadata["native_filter_configuration"] = build_native_filters(
+            spec, dataset_id, rollup_ids, [c["chart_id"] for c in chart_configs]
+        )
+    if fingerprint:
+        metadata["spec_fingerprint"] = fingerprint
+    else:
+        metadata.pop("spec_fingerprint", None)
+    return {
+        "dashboard_layout": build_dashboard_layout(chart_configs),
+        "description": spec["dashboard"].get("description", ""),
+        "json_metadata": json.dumps(metadata),
+        "published": spec["dashboard"].get("published", True),
+    }
+
+
+def create_from_spec(client: SupersetClient, spec: Dict[str, Any]) -> Optional[int]:
+    """Create dataset, charts and dashboard described by a spec from scratch"""
+    database_name = spec["database"]
+    schema = spec["dataset"]["schema"]
+    table_name = spec["dataset"]["table_name"]
 
     # Step 2: Find database
     print("\n[2/7] Finding database...")
-    database = client.get_database_by_name(DATABASE_NAME)
+    database = client.get_database_by_name(database_name)
     if not database:
         print("Failed to find database. Exiting.")
-        return
+        return None
 
     database_id = database.get("id")
 
     # Step 3: Create dataset
     print("\n[3/7] Creating dataset...")
-    dataset = client.create_dataset(database_id, SCHEMA, TABLE_NAME)
+    dataset = client.create_dataset(database_id, schema, table_name)
     if not dataset:
         print("Failed to create dataset. Exiting.")
-        return
+        return None
 
     dataset_id = dataset.get("id")
 
     # Step 4: Configure columns
     print("\n[4/7] Configuring columns...")
-    columns = [
-        {
-            "column_name": "created_at",
-            "is_dttm": True,
-            "python_date_format": "%Y-%m-%d %H:%M:%S.%f",
-        },
-        {"column_name": "event_type", "filterable": True, "groupby": True},
-        {"column_name": "user_id", "filterable": True, "groupby": True},
-        {"column_name": "session_id", "filterable": True},
-    ]
+    client.configure_columns(dataset_id, spec["dataset"].get("columns", []))
 
-    client.configure_columns(dataset_id, columns)
+    rollup_ids = ensure_rollups(client, spec, database_id)
+    if rollup_ids is None:
+        print("Failed to create rollups. Exiting.")
+        return None
 
     # Step 5: Create charts
     print("\n[5/7] Creating charts...")
-    charts = []
-
-    # Chart 1: Events over time
-    chart1 = client.create_chart(
-        dataset_id=dataset_id,
-        chart_title="Log Events Timeline",
-        visualization_type="line",
-        query_context={
-            "datasource": {"id": dataset_id, "type": "table"},
-            "form_data": {
-                "granularity_sqla": "created_at",
-                "time_range": "Last 7 days",
-                "metrics": [{"label": "count"}],
-                "datasource_name": TABLE_NAME,
-            },
-        },
-    )
-    if chart1:
-        charts.append(chart1)
-
-    # Chart 2: Events by type
-    chart2 = client.create_chart(
-        dataset_id=dataset_id,
-        chart_title="Events by Type",
-        visualization_type="bar",
-        query_context={
-            "datasource": {"id": dataset_id, "type": "table"},
-            "form_data": {
-                "metrics": [{"label": "count"}],
-                "groupby": ["event_type"],
-                "datasource_name": TABLE_NAME,
-            },
-        },
-    )
-    if chart2:
-        charts.append(chart2)
-
-    # Chart 3: Events by user
-    chart3 = client.create_chart(
-        dataset_id=dataset_id,
-        chart_title="Top Users by Events",
-        visualization_type="horizontal_bar",
-        query_context={
-            "datasource": {"id": dataset_id, "type": "table"},
-            "form_data": {
-                "metrics": [{"label": "count"}],
-                "groupby": ["user_id"],
-                "row_limit": 10,
-                "datasource_name": TABLE_NAME,
-            },
-        },
+    chart_specs = build_chart_specs(spec, dataset_id, rollup_ids)
+    results = client.create_charts(
+        dataset_id, chart_specs, max_workers=CHART_WORKERS
     )
-    if chart3:
-        charts.append(chart3)
-
-    # Chart 4: Recent events table
-    chart4 = client.create_chart(
-        dataset_id=dataset_id,
-        chart_title="Recent Events",
-        visualization_type="table",
-        query_context={
-            "datasource": {"id": dataset_id, "type": "table"},
-            "form_data": {
-                "datasource_name": TABLE_NAME,
-                "row_limit": 100,
-                "all_columns": [
-                    "created_at",
-                    "event_type",
-                    "user_id",
-                    "session_id",
-                ],
-            },
-        },
-    )
-    if chart4:
-        charts.append(chart4)
+    charts = [chart for chart in results if chart]
 
     if not charts:
         print("Failed to create charts. Exiting.")
-        return
+        return None
 
     print(f"✓ Created {len(charts)} charts")
 
     # Step 6: Create dashboard
     print("\n[6/7] Creating dashboard...")
     dashboard = client.create_dashboard(
-        title="Log Events Dashboard",
-        description="Real-time analysis of application log events from peter_log_event table",
+        title=spec["dashboard"]["title"],
+        description=spec["dashboard"].get("description", ""),
     )
     if not dashboard:
         print("Failed to create dashboard. Exiting.")
-        return
+        return None
 
     dashboard_id = dashboard.get("id")
 
@@ -427,53 +1950,514 @@ def main():
     print("\n[7/7] Adding charts to dashboard...")
     chart_configs = [
         {
-            "grid_id": 0,
-            "chart_id": charts[0].get("id"),
-            "height": 50,
-            "width": 12,
-            "name": "Log Events Timeline",
-        },
-        {
-            "grid_id": 1,
-            "chart_id": charts[1].get("id"),
-            "height": 50,
-            "width": 6,
-            "name": "Events by Type",
-        },
-        {
-            "grid_id": 2,
-            "chart_id": charts[2].get("id"),
-            "height": 50,
-            "width": 6,
-            "name": "Top Users",
-        },
-        {
-            "grid_id": 3,
-            "chart_id": charts[3].get("id"),
-            "height": 100,
-            "width": 12,
-            "name": "Recent Events",
-        },
+            "grid_id": grid_id,
+            "chart_id": chart.get("id"),
+            "height": chart_spec["height"],
+            "width": chart_spec["width"],
+            "name": chart_spec["name"],
+        }
+        for grid_id, (chart_spec, chart) in enumerate(zip(chart_specs, results))
+        if chart
     ]
 
-    if client.add_charts_to_dashboard(dashboard_id, chart_configs):
-        client.publish_dashboard(dashboard_id)
+    metadata = None
+    if "native_filters" in spec["dashboard"]:
+        metadata = {
+            "native_filter_configuration": build_native_filters(
+                spec, dataset_id, rollup_ids, [c["chart_id"] for c in chart_configs]
+            )
+        }
+
+    if client.add_charts_to_dashboard(dashboard_id, chart_configs, metadata):
+        if spec["dashboard"].get("published", True):
+            client.publish_dashboard(dashboard_id)
+
+    print("\nCharts created:")
+    for i, chart in enumerate(charts, 1):
+        print(f"  {i}. {chart.get('chart_title')} (ID: {chart.get('id')})")
+    return dashboard_id
+
+
+def apply_result(dashboard_id: Optional[int], errors: List[str]) -> Dict[str, Any]:
+    """Outcome of apply_spec: the dashboard ID and the steps that failed
+
+    ``dashboard_id`` is None when the dashboard could not be saved; ``ok``
+    is only set when every step succeeded.
+    """
+    return {
+        "dashboard_id": dashboard_id,
+        "errors": errors,
+        "ok": dashboard_id is not None and not errors,
+    }
+
+
+def apply_spec(
+    client: SupersetClient,
+    spec: Dict[str, Any],
+    force: bool = False,
+    chart_workers: int = CHART_WORKERS,
+) -> Dict[str, Any]:
+    """Bring the server in line with a spec, sending only the calls needed
+
+    The spec fingerprint is stored in the dashboard's ``json_metadata``, so
+    an unchanged dashboard is detected with a single lookup. Pass ``force``
+    to diff against the server state even when the fingerprint matches.
+    The fingerprint is only stored when every step succeeded, so a partial
+    run is retried on the next apply. Returns an apply_result listing the
+    failed steps.
+    """
+    fingerprint = spec_fingerprint(spec)
+    title = spec["dashboard"]["title"]
+    errors: List[str] = []
+
+    print("\n[1/5] Fetching dashboard state...")
+    dashboard = client.get_dashboard_by_title(title)
+    metadata = _as_dict(dashboard.get("json_metadata")) if dashboard else {}
+    if (
+        dashboard
+        and not force
+        and metadata.get("spec_fingerprint") == fingerprint
+    ):
+        print(f"✓ Dashboard '{title}' is up to date (ID: {dashboard.get('id')})")
+        return apply_result(dashboard.get("id"), errors)
+
+    print("\n[2/5] Resolving database and dataset...")
+    database = client.get_database_by_name(spec["database"])
+    if not database:
+        print("Failed to find database. Exiting.")
+        return apply_result(None, [f"database {spec['database']!r} not found"])
+    database_id = database.get("id")
+
+    schema = spec["dataset"]["schema"]
+    table_name = spec["dataset"]["table_name"]
+    dataset = client.get_dataset(database_id, schema, table_name)
+    if dataset:
+        print(f"✓ Found dataset: {table_name} (ID: {dataset.get('id')})")
+    else:
+        dataset = client.create_dataset(database_id, schema, table_name)
+        if not dataset:
+            print("Failed to create dataset. Exiting.")
+            return apply_result(None, [f"dataset {table_name!r} not created"])
+    dataset_id = dataset.get("id")
+
+    print("\n[3/5] Diffing columns...")
+    desired_columns = spec["dataset"].get("columns", [])
+    if changed_columns(desired_columns, client.get_dataset_columns(dataset_id) or []):
+        if not client.configure_columns(dataset_id, desired_columns):
+            errors.append(f"columns of dataset {dataset_id} not configured")
+    else:
+        print("✓ Columns unchanged")
+
+    rollup_ids = ensure_rollups(client, spec, database_id)
+    if rollup_ids is None:
+        print("Failed to create rollups. Exiting.")
+        return apply_result(None, ["rollups not created"])
+
+    print("\n[4/5] Diffing charts...")
+    chart_specs = build_chart_specs(spec, dataset_id, rollup_ids)
+    existing = []
+    if dashboard:
+        existing = client.get_dashboard_charts(dashboard.get("id")) or []
+    plan = plan_charts(chart_specs, existing)
+    chart_ids = plan["chart_ids"]
+
+    for chart_id, payload in plan["update"]:
+        if not client.update_chart(chart_id, payload):
+            errors.append(f"chart {chart_id} not updated")
+
+    created = client.create_charts(dataset_id, plan["create"], max_workers=chart_workers)
+    for chart_spec, chart in zip(plan["create"], created):
+        if chart:
+            chart_ids[chart_spec["chart_title"]] = chart.get("id")
+        else:
+            errors.append(f"chart {chart_spec['chart_title']!r} not created")
+
+    for chart_id in plan["delete"]:
+        if not client.delete_chart(chart_id):
+            errors.append(f"chart {chart_id} not deleted")
+
+    print(
+        f"✓ Charts: {len(plan['create'])} to create, {len(plan['delete'])} removed, "
+        f"{len(chart_specs) - len(plan['create'])} kept"
+    )
+
+    print("\n[5/5] Applying dashboard...")
+    if not dashboard:
+        dashboard = client.create_dashboard(
+            title=title, description=spec["dashboard"].get("description", "")
+        )
+        if not dashboard:
+            print("Failed to create dashboard. Exiting.")
+            return apply_result(None, errors + ["dashboard not created"])
+    dashboard_id = dashboard.get("id")
+
+    payload = dashboard_payload(
+        spec, chart_specs, chart_ids, dataset_id, rollup_ids, metadata,
+        None if errors else fingerprint,
+    )
+    if not client.update_dashboard(dashboard_id, payload):
+        print("Failed to save dashboard. Exiting.")
+        return apply_result(None, errors + [f"dashboard {dashboard_id} not saved"])
+    if errors:
+        print("✗ Some steps failed; the next apply will retry them")
+    return apply_result(dashboard_id, errors)
+
+
+FANOUT_WORKERS = int(os.getenv("SUPERSET_FANOUT_WORKERS", "8"))
+TENANT_KEYS = ("name", "database", "schema", "table_name", "dashboard_title", "published")
+
+
+def load_targets(path: str) -> List[Dict[str, Any]]:
+    """Load fan-out targets: a JSON list of tenants with ``name`` and ``database``"""
+    with open(path, encoding="utf-8") as f:
+        targets = json.load(f)
+    if not isinstance(targets, list):
+        raise ValueError(f"Targets file {path} must hold a JSON list")
+
+    names = set()
+    for target in targets:
+        unknown = set(target) - set(TENANT_KEYS)
+        if unknown or not target.get("name") or not target.get("database"):
+            raise ValueError(
+                f"Invalid target (needs name and database, may set {TENANT_KEYS}): {target}"
+            )
+        if target["name"] in names:
+            raise ValueError(f"Duplicate target name {target['name']!r} in {path}")
+        names.add(target["name"])
+    return targets
+
+
+def tenant_spec(spec: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """The spec for one tenant: its database, schema, table and dashboard title
+
+    Dashboards are found by title, so each tenant gets its own, by default
+    the spec's title followed by the tenant name.
+    """
+    tenant = json.loads(json.dumps(spec))
+    tenant["database"] = target["database"]
+    for key in ("schema", "table_name"):
+        if target.get(key):
+            tenant["dataset"][key] = target[key]
+    tenant["dashboard"]["title"] = target.get("dashboard_title") or (
+        f"{spec['dashboard']['title']} ({target['name']})"
+    )
+    if "published" in target:
+        tenant["dashboard"]["published"] = target["published"]
+    return tenant
+
+
+class ProvisionJournal:
+    """Append-only JSON lines record of tenant outcomes, for resuming runs
+
+    A tenant is done once its latest record says so for the same spec
+    fingerprint; failed and unfinished tenants run again on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    self.latest[record.get("tenant")] = record
+
+    def is_done(self, name: str, fingerprint: str) -> bool:
+        record = self.latest.get(name) or {}
+        return record.get("status") == "done" and record.get("fingerprint") == fingerprint
+
+    def record(self, **fields: Any) -> None:
+        fields["at"] = datetime.now(timezone.utc).isoformat()
+        line = json.dumps(fields, sort_keys=True)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.latest[fields.get("tenant")] = fields
+
+
+def fan_out(
+    client: SupersetClient,
+    spec: Dict[str, Any],
+    targets: List[Dict[str, Any]],
+    journal_path: str,
+    max_workers: int = FANOUT_WORKERS,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Run apply_spec for every target in a worker pool
+
+    A failing tenant only fails its own record; the others carry on.
+    Tenants already done with the same spec (per the journal) are skipped,
+    so an interrupted run resumes where it stopped.
+    """
+    started = time.monotonic()
+    journal = ProvisionJournal(journal_path)
+
+    pending, resumed = [], []
+    for target in targets:
+        tenant = tenant_spec(spec, target)
+        fingerprint = spec_fingerprint(tenant)
+        if not force and journal.is_done(target["name"], fingerprint):
+            resumed.append(target["name"])
+        else:
+            pending.append((target["name"], tenant, fingerprint))
+
+    def _provision(item: Tuple[str, Dict[str, Any], str]) -> Dict[str, Any]:
+        name, tenant, fingerprint = item
+        tenant_started = time.monotonic()
+        try:
+            # Tenants already run in parallel; charts go one at a time
+            result = apply_spec(client, tenant, force=force, chart_workers=1)
+        except Exception as e:  # isolate tenants: one bad target must not stop the run
+            result = apply_result(None, [f"{type(e).__name__}: {e}"])
+        # A dashboard with some failed steps (e.g. a chart) counts as failed,
+        # so the next run applies it again
+        dashboard_id = result["dashboard_id"]
+        error = "; ".join(result["errors"]) if not result["ok"] else None
+        record = {
+            "tenant": name,
+            "status": "failed" if error else "done",
+            "fingerprint": fingerprint,
+            "dashboard_id": dashboard_id,
+            "seconds": round(time.monotonic() - tenant_started, 3),
+        }
+        if error:
+            record["error"] = error
+        journal.record(**record)
+        return record
+
+    workers = max(1, min(max_workers, len(pending) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        records = list(executor.map(_provision, pending))
+
+    durations = sorted(r["seconds"] for r in records)
+    summary = {
+        "targets": len(targets),
+        "done": [r["tenant"] for r in records if r["status"] == "done"],
+        "resumed": resumed,
+        "failed": {r["tenant"]: r["error"] for r in records if r["status"] == "failed"},
+        "dashboards": {
+            r["tenant"]: r["dashboard_id"] for r in records if r["status"] == "done"
+        },
+        "tenant_seconds_median": durations[len(durations) // 2] if durations else None,
+        "tenant_seconds_max": durations[-1] if durations else None,
+        "seconds": round(time.monotonic() - started, 3),
+        "journal": journal_path,
+    }
+    return summary
+
+
+def print_fan_out_report(summary: Dict[str, Any]) -> None:
+    print("\n" + "=" * 60)
+    print(
+        f"Fan-out: {summary['targets']} targets, {len(summary['done'])} provisioned, "
+        f"{len(summary['resumed'])} already done, {len(summary['failed'])} failed "
+        f"in {summary['seconds']}s"
+    )
+    if summary["tenant_seconds_median"] is not None:
+        print(
+            f"Per tenant: median {summary['tenant_seconds_median']}s, "
+            f"max {summary['tenant_seconds_max']}s"
+        )
+    for name, dashboard_id in sorted(summary["dashboards"].items()):
+        print(f"  ✓ {name}: {SUPERSET_URL}/dashboard/{dashboard_id}")
+    for name, error in sorted(summary["failed"].items()):
+        print(f"  ✗ {name}: {error}")
+    print(f"Journal: {summary['journal']} (rerun to retry failed tenants)")
+    print("=" * 60)
+
+
+def _parse_replacements(values: List[str]) -> Dict[str, Dict[str, str]]:
+    """Parse ``key=old:new`` command line values for template_bundle"""
+    replacements: Dict[str, Dict[str, str]] = {}
+    for value in values:
+        key, _, change = value.partition("=")
+        old, sep, new = change.partition(":")
+        if not key or not sep:
+            raise SystemExit(f"Invalid --replace {value!r}, expected key=old:new")
+        replacements.setdefault(key, {})[old] = new
+    return replacements
+
+
+def main():
+    """Create, apply, export or import the log event dashboard"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=(
+            "create", "apply", "export", "import", "refresh-rollups", "sync-columns", "fan-out",
+        ),
+        default="create",
+        help=(
+            "create: always create new objects; apply: diff against the server; "
+            "export/import: move dashboards as ZIP bundles; "
+            "refresh-rollups: bring the spec's rollup tables up to date; "
+            "sync-columns: refresh datasets from the database and apply column rules; "
+            "fan-out: apply the spec for every tenant in --targets"
+        ),
+    )
+    parser.add_argument(
+        "--spec", default=DEFAULT_SPEC_PATH, help="Dashboard spec (JSON)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help=(
+            "apply: diff against the server even if the spec is unchanged; "
+            "sync-columns: sync datasets whose schema is unchanged too; "
+            "fan-out: also rerun tenants the journal marks as done"
+        ),
+    )
+    parser.add_argument(
+        "--ids", type=int, nargs="+", help="export: dashboard IDs to export"
+    )
+    parser.add_argument(
+        "--bundle", default="dashboard_export.zip", help="export/import: ZIP path"
+    )
+    parser.add_argument(
+        "--replace",
+        action="append",
+        default=[],
+        metavar="KEY=OLD:NEW",
+        help="export/import: rewrite a value in the bundle, e.g. schema=public:prod",
+    )
+    parser.add_argument(
+        "--overwrite", action="store_true", help="import: replace existing objects"
+    )
+    parser.add_argument(
+        "--rules", help="sync-columns: column rules (JSON list), default DEFAULT_COLUMN_RULES"
+    )
+    parser.add_argument(
+        "--database", help="sync-columns: only datasets of this database"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=(
+            f"sync-columns/fan-out: datasets or tenants processed concurrently "
+            f"(default {COLUMN_SYNC_WORKERS}/{FANOUT_WORKERS})"
+        ),
+    )
+    parser.add_argument(
+        "--targets", help="fan-out: tenants (JSON list of name, database, schema, ...)"
+    )
+    parser.add_argument(
+        "--journal",
+        help="fan-out: progress journal (JSON lines), default <targets>.journal.jsonl",
+    )
+    parser.add_argument("--report", help="fan-out: write the summary as JSON")
+    args = parser.parse_args()
+
+    replacements = _parse_replacements(args.replace)
+    if args.command == "export" and not args.ids:
+        parser.error("export requires --ids")
+    if args.command == "fan-out" and not args.targets:
+        parser.error("fan-out requires --targets")
+    if args.workers is None:
+        args.workers = FANOUT_WORKERS if args.command == "fan-out" else COLUMN_SYNC_WORKERS
+
+    print("\n" + "=" * 60)
+    print(f"{args.command.title()} Log Event Dashboard in Superset")
+    print("=" * 60 + "\n")
+
+    # Initialize client
+    client = SupersetClient(
+        SUPERSET_URL,
+        SUPERSET_USERNAME,
+        SUPERSET_PASSWORD,
+        pool_size=max(10, args.workers),
+    )
+
+    # Step 1: Authenticate
+    print("Authenticating...")
+    if not client.authenticate():
+        print("Failed to authenticate. Exiting.")
+        return
+
+    if args.command == "export":
+        raw_path = f"{args.bundle}.raw" if replacements else args.bundle
+        if client.export_dashboards(args.ids, raw_path) and replacements:
+            count = template_bundle(raw_path, args.bundle, replacements)
+            os.remove(raw_path)
+            print(f"✓ Rewrote {count} values in {args.bundle}")
+        return
+
+    if args.command == "import":
+        bundle = args.bundle
+        if replacements:
+            bundle = f"{args.bundle}.templated.zip"
+            count = template_bundle(args.bundle, bundle, replacements)
+            print(f"✓ Rewrote {count} values in {bundle}")
+        try:
+            client.import_dashboards(
+                bundle,
+                overwrite=args.overwrite,
+                passwords=json.loads(os.getenv("SUPERSET_IMPORT_PASSWORDS", "{}")),
+            )
+        finally:
+            if bundle != args.bundle:
+                os.remove(bundle)
+        return
+
+    if args.command == "sync-columns":
+        summary = sync_dataset_columns(
+            client,
+            rules=load_column_rules(args.rules),
+            database_name=args.database,
+            max_workers=args.workers,
+            force=args.force,
+        )
+        if summary["failed"]:
+            raise SystemExit(f"Column sync failed for datasets {summary['failed']}")
+        return
+
+    spec = load_spec(args.spec)
+    if args.command == "fan-out":
+        summary = fan_out(
+            client,
+            spec,
+            load_targets(args.targets),
+            args.journal or f"{args.targets}.journal.jsonl",
+            max_workers=args.workers,
+            force=args.force,
+        )
+        print_fan_out_report(summary)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        if summary["failed"]:
+            raise SystemExit(f"{len(summary['failed'])} tenants failed")
+        return
+
+    if args.command == "refresh-rollups":
+        refresh_rollups(client, spec)
+        return
+
+    if args.command == "apply":
+        dashboard_id = apply_spec(client, spec, force=args.force)["dashboard_id"]
+    else:
+        dashboard_id = create_from_spec(client, spec)
+    if dashboard_id is None:
+        return
 
     # Summary
     print("\n" + "=" * 60)
-    print("✓ Dashboard Created Successfully!")
+    print("✓ Dashboard Ready!")
     print("=" * 60)
     print(f"\nDashboard URL:")
     print(
         f"{SUPERSET_URL}/dashboard/{dashboard_id}"
     )
-    print(f"\nDashboard Name: Log Events Dashboard")
+    print(f"\nDashboard Name: {spec['dashboard']['title']}")
     print(f"Dashboard ID: {dashboard_id}")
-    print(f"Table: {SCHEMA}.{TABLE_NAME}")
-    print(f"Database: {DATABASE_NAME}")
-    print(f"\nCharts created:")
-    for i, chart in enumerate(charts, 1):
-        print(f"  {i}. {chart.get('chart_title')} (ID: {chart.get('id')})")
+    print(f"Table: {spec['dataset']['schema']}.{spec['dataset']['table_name']}")
+    print(f"Database: {spec['database']}")
     print("\n" + "=" * 60)
 
 
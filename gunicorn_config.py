@@ -0,0 +1,131 @@
+"""
+Gunicorn server profile for the Superset web role
+
+startup.sh runs gunicorn with this file. Every setting can be overridden
+from env (names follow Superset's run-server.sh where one exists); worker
+count defaults to what fits the container's CPU and memory limits, and
+the effective values are logged at boot.
+"""
+
+import os
+
+WORKER_CLASSES = ("gthread", "gevent")
+
+
+def _env_int(name, default, minimum=None):
+    val = os.environ.get(name)
+    if val is None or val == "":
+        return default
+    try:
+        result = int(val)
+    except ValueError:
+        raise ValueError("%s must be an integer, got %r" % (name, val))
+    if minimum is not None and result < minimum:
+        raise ValueError("%s must be at least %s, got %s" % (name, minimum, result))
+    return result
+
+
+def _env_bool(name, default=False):
+    val = os.environ.get(name)
+    if val is None:
+        return default
+    return val.lower() in ("1", "true", "yes", "on")
+
+
+def _read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """CPUs this container may use, honouring cgroup quotas"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    quota_line = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if quota_line:
+        quota, _, period = quota_line.partition(" ")
+        if quota != "max" and period:
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+        return cpus
+
+    # cgroup v1
+    quota = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        cpus = min(cpus, max(1, int(quota) // int(period)))
+    return cpus
+
+
+def memory_limit_bytes():
+    """Container memory limit, or None when unlimited"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read_first_line(path)
+        if value and value != "max":
+            limit = int(value)
+            # cgroup v1 reports "unlimited" as a huge number
+            if limit < 1 << 60:
+                return limit
+    return None
+
+
+def default_workers(cpus, memory_limit, worker_memory_mb):
+    """2 x CPUs + 1, capped by how many workers fit in memory"""
+    workers = 2 * cpus + 1
+    if memory_limit:
+        workers = min(workers, memory_limit // (worker_memory_mb * 1024 * 1024))
+    return max(1, workers)
+
+
+_cpus = available_cpus()
+_memory_limit = memory_limit_bytes()
+_worker_memory_mb = _env_int("SERVER_WORKER_MEMORY_MB", 400, minimum=1)
+
+bind = "%s:%s" % (os.environ.get("SUPERSET_BIND_ADDRESS", "0.0.0.0"), os.environ.get("SUPERSET_PORT", "8088"))
+workers = _env_int("SERVER_WORKER_AMOUNT", default_workers(_cpus, _memory_limit, _worker_memory_mb), minimum=1)
+worker_class = os.environ.get("SERVER_WORKER_CLASS", "gthread")
+if worker_class not in WORKER_CLASSES:
+    raise ValueError("SERVER_WORKER_CLASS must be one of %s, got %r" % (WORKER_CLASSES, worker_class))
+if worker_class == "gevent":
+    import gevent  # noqa: F401  fail at boot rather than on the first request
+threads = _env_int("SERVER_THREADS_AMOUNT", 4, minimum=1)
+worker_connections = _env_int("SERVER_WORKER_CONNECTIONS", 1000, minimum=1)
+
+timeout = _env_int("GUNICORN_TIMEOUT", 120, minimum=1)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30, minimum=0)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5, minimum=0)
+
+# Recycle workers to contain memory growth; jitter avoids restarting all at once
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000, minimum=0)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max(1, max_requests // 10), minimum=0)
+
+# Load the app once in the master so workers share its memory copy-on-write.
+# gevent must monkey-patch before the app is imported, so it defaults to off there.
+preload_app = _env_bool("GUNICORN_PRELOAD", worker_class != "gevent")
+
+limit_request_line = _env_int("SERVER_LIMIT_REQUEST_LINE", 0, minimum=0)
+limit_request_field_size = _env_int("SERVER_LIMIT_REQUEST_FIELD_SIZE", 0, minimum=0)
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    server.log.info(
+        "Server profile: workers=%s worker_class=%s threads=%s worker_connections=%s "
+        "timeout=%s graceful_timeout=%s keepalive=%s max_requests=%s(+%s) preload_app=%s "
+        "(cpus=%s memory_limit_mb=%s worker_memory_mb=%s)",
+        workers, worker_class, threads, worker_connections,
+        timeout, graceful_timeout, keepalive, max_requests, max_requests_jitter, preload_app,
+        _cpus, _memory_limit // (1024 * 1024) if _memory_limit else "unlimited", _worker_memory_mb,
+    )
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the shared Prometheus registry
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
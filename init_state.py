@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Init state checks for startup.sh
+
+Answers "can this init step be skipped?" without booting the Superset app,
+so warm restarts skip migrations, admin creation and `superset init`. Each
+command exits 0 when the step is already done and non-zero otherwise,
+including on any error, so a failed check always falls back to running the
+step.
+
+Usage:
+python init_state.py migrations-current     # DB revision == Alembic head
+python init_state.py admin-exists USERNAME
+python init_state.py init-current           # permissions fingerprint unchanged
+python init_state.py record-init            # store fingerprint after superset init
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+STATE_TABLE = "railway_init_state"
+CONFIG_PATH = os.environ.get("SUPERSET_CONFIG_PATH", "/app/docker/superset_config.py")
+
+
+def _database_uri():
+    # Same precedence as superset_config.py, read from the environment:
+    # exec'ing the config would import Celery, Redis and the app's settings
+    uri = os.environ.get("SQLALCHEMY_DATABASE_URI", "")
+    if not uri or "${" in uri:
+        uri = os.environ.get("DATABASE_URL", "")
+    return uri
+
+
+def _engine():
+    uri = _database_uri()
+    if not uri:
+        raise RuntimeError("SQLALCHEMY_DATABASE_URI is not configured")
+    return create_engine(uri, poolclass=NullPool)
+
+
+def _superset_dir():
+    # Locate the package without importing it; importing superset is slow
+    spec = importlib.util.find_spec("superset")
+    return list(spec.submodule_search_locations)[0]
+
+
+def alembic_heads():
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory(os.path.join(_superset_dir(), "migrations"))
+    return set(script.get_heads())
+
+
+def migrations_current():
+    with _engine().connect() as conn:
+        current = {row[0] for row in conn.execute(text("SELECT version_num FROM alembic_version"))}
+    heads = alembic_heads()
+    print("DB revision %s, code head %s" % (sorted(current), sorted(heads)))
+    return current == heads
+
+
+def admin_exists(username):
+    with _engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT 1 FROM ab_user WHERE username = :username"), {"username": username}
+        ).first()
+    return row is not None
+
+
+def permissions_fingerprint():
+    """Changes whenever `superset init` could produce different roles/perms"""
+    from importlib.metadata import version
+
+    digest = hashlib.sha256()
+    digest.update(version("apache-superset").encode())
+    digest.update(",".join(sorted(alembic_heads())).encode())
+    with open(CONFIG_PATH, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _ensure_state_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS %s (name VARCHAR(64) PRIMARY KEY, value VARCHAR(256))" % STATE_TABLE
+    ))
+
+
+def init_current():
+    with _engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT value FROM %s WHERE name = 'permissions_fingerprint'" % STATE_TABLE)
+        ).first()
+    return row is not None and row[0] == permissions_fingerprint()
+
+
+def record_init():
+    fingerprint = permissions_fingerprint()
+    with _engine().begin() as conn:
+        _ensure_state_table(conn)
+        conn.execute(text("DELETE FROM %s WHERE name = 'permissions_fingerprint'" % STATE_TABLE))
+        conn.execute(
+            text("INSERT INTO %s (name, value) VALUES ('permissions_fingerprint', :value)" % STATE_TABLE),
+            {"value": fingerprint},
+        )
+    return True
+
+
+COMMANDS = {
+    "migrations-current": migrations_current,
+    "admin-exists": admin_exists,
+    "init-current": init_current,
+    "record-init": record_init,
+}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in COMMANDS:
+        print(__doc__)
+        return 2
+    try:
+        return 0 if COMMANDS[argv[1]](*argv[2:]) else 1
+    except Exception as e:  # any failure means "run the step"
+        print("init_state %s: %s" % (argv[1], e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
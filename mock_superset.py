@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+In-process mock of the Superset REST API
+
+Serves the /api/v1 endpoints used by SupersetClient, AsyncSupersetClient
+and diagnose_superset.py from memory: login and token refresh, databases,
+datasets, charts, dashboards, chart data and SQL Lab. Client changes can
+then be exercised and benchmarked without a network or a live instance.
+
+- ``latency``/``jitter`` delay every response, like a real round trip.
+- ``error_rate`` fails that share of API requests with one of
+  ``error_statuses`` (503 by default, with a Retry-After header), and
+  inject() fails the next requests matching a method and path.
+- List endpoints filter, select columns and paginate like Superset,
+  capped at ``max_page_size`` rows per page.
+- Access tokens are JWTs with a real ``exp`` claim, so expiry and refresh
+  follow the same path as against Superset.
+
+Usage:
+python mock_superset.py --port 8089 --latency-ms 40 --error-rate 0.02
+SUPERSET_URL=http://localhost:8089 python create_superset_dashboard.py apply
+
+    with MockSuperset(latency=0.02, databases=["supabase staging"]) as server:
+        client = SupersetClient(server.url, "admin", "admin", token_cache=None)
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+RESOURCES = ("databases", "datasets", "charts", "dashboards")
+# Filter columns that name a relation rather than a stored field
+FILTER_ALIASES = {"database": "database_id", "datasource_id": "dataset_id"}
+_OBJECT_PATH = re.compile(r"^/api/v1/(\w+)/(\d+)(?:/(\w+))?/?$")
+_ID_SEGMENT = re.compile(r"/\d+")
+_NUMBER = re.compile(r"^-?\d+(\.\d+)?([eE][-+]?\d+)?$")
+
+
+def rison_loads(text: str) -> Any:
+    """Decode Rison as written by create_superset_dashboard.rison_dumps"""
+    value, end = _rison_value(text, 0)
+    if end != len(text):
+        raise ValueError(f"Trailing characters in Rison at {end}: {text!r}")
+    return value
+
+
+def _rison_value(text: str, i: int) -> Tuple[Any, int]:
+    if text.startswith("!t", i):
+        return True, i + 2
+    if text.startswith("!f", i):
+        return False, i + 2
+    if text.startswith("!n", i):
+        return None, i + 2
+    if text.startswith("!(", i):
+        items, i = [], i + 2
+        while text[i] != ")":
+            item, i = _rison_value(text, i)
+            items.append(item)
+            i += text[i] == ","
+        return items, i + 1
+    if text[i] == "(":
+        obj, i = {}, i + 1
+        while text[i] != ")":
+            key, i = _rison_value(text, i)
+            value, i = _rison_value(text, i + 1)  # skip ":"
+            obj[str(key)] = value
+            i += text[i] == ","
+        return obj, i + 1
+    if text[i] == "'":
+        chars, i = [], i + 1
+        while text[i] != "'":
+            if text[i] == "!":
+                i += 1
+            chars.append(text[i])
+            i += 1
+        return "".join(chars), i + 1
+
+    end = i
+    while end < len(text) and text[end] not in ":,()":
+        end += 1
+    token = text[i:end]
+    if not _NUMBER.match(token):
+        return token, end
+    return (float(token) if any(c in token for c in ".eE") else int(token)), end
+
+
+def make_token(subject: str, ttl: float, kind: str = "access") -> str:
+    """Unsigned JWT; clients only read its ``exp`` claim"""
+
+    def _part(value: Dict[str, Any]) -> str:
+        raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+    claims = {"sub": subject, "type": kind, "exp": int(time.time() + ttl)}
+    return f"{_part({'alg': 'none', 'typ': 'JWT'})}.{_part(claims)}.mock"
+
+
+def _token_claims(token: str) -> Dict[str, Any]:
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, TypeError, ValueError):
+        return {}
+
+
+def _matches(obj: Dict[str, Any], flt: Dict[str, Any]) -> bool:
+    col = flt.get("col")
+    value = obj.get(col, obj.get(FILTER_ALIASES.get(col, col)))
+    opr, expected = flt.get("opr"), flt.get("value")
+    if opr in ("eq", "rel_o_m"):
+        return value == expected
+    if opr == "neq":
+        return value != expected
+    if opr in ("ct", "sw", "ew"):
+        text, needle = str(value or "").lower(), str(expected).lower()
+        return {"ct": needle in text, "sw": text.startswith(needle), "ew": text.endswith(needle)}[opr]
+    if opr == "in":
+        return value in (expected or [])
+    raise ValueError(f"Unsupported filter operator {opr!r}")
+
+
+class MockSuperset:
+    """Threaded HTTP server holding Superset objects in memory"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        username: str = "admin",
+        password: str = "admin",
+        databases: Optional[List[str]] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (503,),
+        retry_after: Optional[float] = 0.0,
+        max_page_size: int = 100,
+        token_ttl: float = 900.0,
+        seed: Optional[int] = None,
+    ):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self.token_ttl = token_ttl
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._injected: List[Dict[str, Any]] = []
+        self.reset(databases or [])
+
+        server = self
+
+        class _Handler(_MockHandler):
+            mock = server
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Serve from a background thread; returns the base URL"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.httpd.serve_forever, name="mock-superset", daemon=True
+            )
+            self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockSuperset":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def reset(self, databases: Optional[List[str]] = None) -> None:
+        """Drop every object and counter; optionally seed databases by name"""
+        with self._lock:
+            self.store: Dict[str, Dict[int, Dict[str, Any]]] = {r: {} for r in RESOURCES}
+            self._next_id = 1
+            self.calls: Dict[str, int] = {}
+            self.errors: Dict[str, int] = {}
+            self.sql: List[str] = []
+        for name in databases or []:
+            self.add("databases", {"database_name": name, "backend": "postgresql"})
+
+    def add(self, resource: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+        """Store an object under a new ID, as a POST would"""
+        with self._lock:
+            obj = dict(obj, id=self._next_id)
+            self.store[resource][self._next_id] = obj
+            self._next_id += 1
+            return obj
+
+    def inject(
+        self,
+        status: int,
+        count: int = 1,
+        method: Optional[str] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        """Fail the next ``count`` requests matching method and path prefix"""
+        with self._lock:
+            self._injected.append(
+                {"status": status, "count": count, "method": method, "path": path}
+            )
+
+    @property
+    def requests(self) -> int:
+        return sum(self.calls.values())
+
+    def _record(self, route: str) -> None:
+        with self._lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+
+    def _pick_error(self, method: str, path: str) -> Optional[int]:
+        with self._lock:
+            for rule in self._injected:
+                if (rule["method"] in (None, method)) and path.startswith(rule["path"] or ""):
+                    rule["count"] -= 1
+                    if rule["count"] <= 0:
+                        self._injected.remove(rule)
+                    return rule["status"]
+            if self.error_rate and path.startswith("/api/v1/"):
+                if self._random.random() < self.error_rate:
+                    return self._random.choice(self.error_statuses)
+        return None
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    mock: MockSuperset
+    protocol_version = "HTTP/1.1"  # keep-alive, like Superset behind gunicorn
+    # Send headers and body in one segment; otherwise Nagle's algorithm and
+    # delayed ACKs add ~40 ms to every keep-alive response
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PUT(self) -> None:
+        self._handle("PUT")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+    def _handle(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        path, query = parts.path, parse_qs(parts.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        mock = self.mock
+        route = f"{method} {_ID_SEGMENT.sub('/<id>', path)}"
+        mock._record(route)
+
+        delay = mock._delay()
+        if delay:
+            time.sleep(delay)
+        status = mock._pick_error(method, path)
+        if status is not None:
+            with mock._lock:
+                mock.errors[route] = mock.errors.get(route, 0) + 1
+            headers = {}
+            if status in (429, 503) and mock.retry_after is not None:
+                headers["Retry-After"] = f"{mock.retry_after:g}"
+            return self._send(status, {"message": "Injected error"}, headers)
+
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            return self._send(400, {"message": "Request body is not JSON"})
+        try:
+            self._send(*self._route(method, path, query, body))
+        except (IndexError, KeyError, ValueError) as e:
+            self._send(400, {"message": str(e)})
+
+    def _send(
+        self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self, kind: str = "access") -> bool:
+        header = self.headers.get("Authorization", "")
+        claims = _token_claims(header[len("Bearer "):]) if header.startswith("Bearer ") else {}
+        return claims.get("type") == kind and claims.get("exp", 0) > time.time()
+
+    def _route(
+        self, method: str, path: str, query: Dict[str, List[str]], body: Dict[str, Any]
+    ) -> Tuple[int, Any]:
+        mock = self.mock
+        if path == "/health":
+            return 200, "OK"
+        if path in ("/", "/api/v1/"):
+            return 200, {"message": "Mock Superset"}
+        if path == "/api/v1/security/login" and method == "POST":
+            if (body.get("username"), body.get("password")) != (mock.username, mock.password):
+                return 401, {"message": "Not authorized"}
+            tokens = {"access_token": make_token(mock.username, mock.token_ttl)}
+            if body.get("refresh"):
+                tokens["refresh_token"] = make_token(mock.username, 30 * 86400, "refresh")
+            return 200, tokens
+        if path == "/api/v1/security/refresh" and method == "POST":
+            if not self._authorized("refresh"):
+                return 401, {"message": "Not authorized"}
+            return 200, {"access_token": make_token(mock.username, mock.token_ttl)}
+
+        if not self._authorized():
+            return 401, {"msg": "Token has expired" if "Authorization" in self.headers else "Missing Authorization Header"}
+
+        if path == "/api/v1/sqllab/execute/" and method == "POST":
+            with mock._lock:
+                mock.sql.append(body["sql"])
+            return 200, {"status": "success", "data": [], "columns": [], "query": {"sql": body["sql"]}}
+
+        resource = path[len("/api/v1/"):].strip("/")
+        if resource in RESOURCES:
+            if method == "GET":
+                return 200, self._list(resource, query)
+            if method == "POST":
+                obj = mock.add(resource, body)
+                return 201, {"id": obj["id"], "result": body}
+
+        match = _OBJECT_PATH.match(path)
+        if not match or match.group(1) not in RESOURCES:
+            return 404, {"message": "Not found"}
+        resource, pk, action = match.group(1), int(match.group(2)), match.group(3)
+        with mock._lock:
+            obj = mock.store[resource].get(pk)
+            if obj is None:
+                return 404, {"message": "Not found"}
+            if action is None and method == "GET":
+                return 200, {"id": pk, "result": dict(obj)}
+            if action is None and method == "PUT":
+                obj.update(body)
+                return 200, {"id": pk, "result": body}
+            if action is None and method == "DELETE":
+                del mock.store[resource][pk]
+                return 200, {"message": "OK"}
+            if resource == "datasets" and action == "refresh" and method == "PUT":
+                return 200, {"message": "OK"}
+            if resource == "charts" and action == "data" and method == "GET":
+                return 200, {"result": [{"data": [], "rowcount": 0, "is_cached": False}]}
+            if resource == "dashboards" and action in ("charts", "datasets") and method == "GET":
+                charts = [
+                    dict(mock.store["charts"][chart_id])
+                    for chart_id in _layout_chart_ids(obj)
+                    if chart_id in mock.store["charts"]
+                ]
+                if action == "datasets":
+                    ids = sorted({c.get("dataset_id") for c in charts} - {None})
+                    return 200, {"result": [mock.store["datasets"][i] for i in ids if i in mock.store["datasets"]]}
+                return 200, {"result": charts}
+        return 405, {"message": "Method not allowed"}
+
+    def _list(self, resource: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        mock = self.mock
+        q = rison_loads(query["q"][0]) if query.get("q") else {}
+        page = int(q.get("page", 0))
+        page_size = min(int(q.get("page_size", 25)), mock.max_page_size)
+        with mock._lock:
+            rows = [
+                obj
+                for _, obj in sorted(mock.store[resource].items())
+                if all(_matches(obj, flt) for flt in q.get("filters", []))
+            ]
+        selected = rows[page * page_size:(page + 1) * page_size]
+        columns = q.get("columns")
+        if columns:
+            selected = [{c: obj.get(c) for c in columns} for obj in selected]
+        return {"count": len(rows), "result": selected}
+
+
+def _layout_chart_ids(dashboard: Dict[str, Any]) -> List[int]:
+    """Chart IDs placed by build_dashboard_layout, in grid order"""
+    layout = dashboard.get("dashboard_layout") or {}
+    if isinstance(layout, str):
+        layout = json.loads(layout)
+    grid = layout.get("GRID_ID", {}).get("GRID_DATA", {})
+    return [entry["meta"]["chartId"] for entry in grid.values() if "meta" in entry]
+
+
+def main():
+    """Serve the mock until interrupted"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument(
+        "--database", action="append", default=[],
+        help="Database name to seed (repeatable; default: supabase staging)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, up to")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of API requests failed")
+    parser.add_argument(
+        "--error-status", type=int, action="append", help="Status for failed requests (default: 503)"
+    )
+    parser.add_argument("--max-page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, help="Random seed for repeatable errors and jitter")
+    args = parser.parse_args()
+
+    server = MockSuperset(
+        host=args.host,
+        port=args.port,
+        username=args.username,
+        password=args.password,
+        databases=args.database or ["supabase staging"],
+        latency=args.latency_ms / 1000.0,
+        jitter=args.jitter_ms / 1000.0,
+        error_rate=args.error_rate,
+        error_statuses=tuple(args.error_status or (503,)),
+        max_page_size=args.max_page_size,
+        seed=args.seed,
+    )
+    print(f"Mock Superset listening on {server.url} (login {args.username}/{args.password})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\nServed {server.requests} requests, {sum(server.errors.values())} injected errors")
+
+
+if __name__ == "__main__":
+    main()
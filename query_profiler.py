@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Slow-query capture for Superset
+
+superset_config.py installs this module as SQL_QUERY_MUTATOR, which tags
+every analytics query with a comment naming its dashboard, chart, user and
+database:
+
+    /* superset dashboard=12 chart=34 user=alice database=supabase_staging */
+
+A wrapper around Superset's engine spec execute() times each statement.
+Queries slower than SUPERSET_SLOW_QUERY_MS are sampled with their EXPLAIN
+plan; a background thread stores the samples in a SQLite file, trimmed to
+the newest SUPERSET_SLOW_QUERY_KEEP rows. Fast queries only pay for a
+timer and a regex match.
+
+List the worst offenders:
+python query_profiler.py top --since 24 --limit 20
+python query_profiler.py show 42      # full SQL and plan of one sample
+"""
+
+import argparse
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from superset_metrics import metrics
+except ImportError:  # the CLI runs without Superset's dependencies
+    metrics = None
+
+logger = logging.getLogger(__name__)
+
+TAG_PREFIX = "/* superset "
+STORE_PATH = os.environ.get(
+    "SUPERSET_SLOW_QUERY_DB",
+    os.path.join(os.environ.get("SUPERSET_HOME", "/app/superset_home"), "slow_queries.db"),
+)
+_TAG = re.compile(r"^/\* superset ([^*]*)\*/\n")
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.@-]+")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slow_queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    captured_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    database TEXT,
+    dashboard_id INTEGER,
+    chart_id INTEGER,
+    username TEXT,
+    fingerprint TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    plan TEXT
+)
+"""
+
+
+def _tag_value(value: Any) -> str:
+    # Comment-safe: no "*/", no whitespace, bounded length
+    return _UNSAFE.sub("_", str(value))[:64]
+
+
+def _request_context() -> Dict[str, Any]:
+    """Dashboard, chart and user of the current request, when there is one"""
+    try:
+        from flask import g, has_request_context, request
+    except ImportError:
+        return {}
+    if not has_request_context():
+        return {}
+
+    context: Dict[str, Any] = {}
+    user = getattr(g, "user", None)
+    if getattr(user, "username", None):
+        context["user"] = user.username
+
+    # Chart data requests carry the chart's form_data in their query context
+    body = request.get_json(silent=True) if request.is_json else None
+    form_data = (body.get("form_data") if isinstance(body, dict) else None) or {}
+    if "pk" in (request.view_args or {}) and "/chart/" in request.path:
+        context["chart"] = request.view_args["pk"]
+    chart_id = form_data.get("slice_id")
+    dashboard_id = form_data.get("dashboardId") or request.args.get("dashboard_id")
+    if chart_id:
+        context["chart"] = chart_id
+    if dashboard_id:
+        context["dashboard"] = dashboard_id
+    return context
+
+
+def tag_query(sql: str, *args: Any, **kwargs: Any) -> str:
+    """SQL_QUERY_MUTATOR: prefix the SQL with a comment describing its origin
+
+    Superset's signature changed across versions; the database is taken
+    from the ``database`` keyword when given.
+    """
+    if sql.startswith(TAG_PREFIX):
+        return sql
+    context = _request_context()
+    database = kwargs.get("database")
+    if getattr(database, "database_name", None):
+        context["database"] = database.database_name
+    tag = " ".join(
+        f"{key}={_tag_value(context[key])}"
+        for key in ("dashboard", "chart", "user", "database")
+        if context.get(key) not in (None, "")
+    )
+    return f"{TAG_PREFIX}{tag} */\n{sql}"
+
+
+def parse_tag(statement: str) -> Optional[Dict[str, str]]:
+    """Read back the tag written by tag_query; None for untagged statements"""
+    match = _TAG.match(statement)
+    if not match:
+        return None
+    return dict(item.split("=", 1) for item in match.group(1).split() if "=" in item)
+
+
+def fingerprint(statement: str) -> str:
+    """The statement without its tag, literals and extra whitespace"""
+    body = _TAG.sub("", statement, count=1)
+    return " ".join(_LITERALS.sub("?", body).split())[:2000]
+
+
+class SlowQueryRecorder:
+    """Times analytics statements and stores slow ones from a background thread"""
+
+    def __init__(self, threshold_ms: float, store_path: str = STORE_PATH, keep: int = 1000):
+        self.threshold_ms = threshold_ms
+        self.store_path = store_path
+        self.keep = keep
+        self._queue: "queue.Queue" = queue.Queue(maxsize=256)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def observe(self, cursor, statement: str, duration: float, database: Any, ok: bool) -> None:
+        """Record one executed statement; slow ones are sampled with their plan"""
+        tag = parse_tag(statement) or {}
+        database_name = getattr(database, "database_name", None) or tag.get("database")
+        if metrics is not None:
+            metrics.observe("query_duration_seconds", database_name or "unknown", seconds=duration)
+
+        if not self.threshold_ms or duration * 1000.0 < self.threshold_ms:
+            return
+        # A failed statement may have aborted the transaction; don't touch it
+        plan = explain(cursor, statement, database) if ok else None
+        self._submit(
+            (time.time(), duration, database_name, tag, statement, plan)
+        )
+
+    def _submit(self, sample) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._drain, name="query-profiler", daemon=True
+                )
+                self._thread.start()
+        try:
+            self._queue.put_nowait(sample)
+        except queue.Full:
+            logger.warning("Slow query queue is full; dropping a %.0fms sample", sample[1] * 1000.0)
+
+    def _drain(self) -> None:
+        store = connect_store(self.store_path)
+        while True:
+            captured_at, duration, database_name, tag, statement, plan = self._queue.get()
+            try:
+                store.execute(
+                    "INSERT INTO slow_queries (captured_at, duration_ms, database, dashboard_id,"
+                    " chart_id, username, fingerprint, sql, plan) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        captured_at,
+                        round(duration * 1000.0, 1),
+                        database_name,
+                        _as_int(tag.get("dashboard")),
+                        _as_int(tag.get("chart")),
+                        tag.get("user"),
+                        fingerprint(statement),
+                        statement,
+                        plan,
+                    ),
+                )
+                # Ring buffer: keep only the newest rows
+                store.execute(
+                    "DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?",
+                    (self.keep,),
+                )
+                store.commit()
+            except Exception:  # the profiler must never take the app down
+                logger.warning("Failed to store slow query sample", exc_info=True)
+
+
+def _as_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def explain(cursor, statement: str, database: Any) -> Optional[str]:
+    """EXPLAIN plan of a read-only Postgres statement
+
+    Runs on the query's own connection, right after it finished, so a
+    sample costs one planner round trip and no new connection. Other
+    backends are skipped: their EXPLAIN syntax and side effects on the
+    connection differ.
+    """
+    body = _TAG.sub("", statement, count=1)
+    if getattr(database, "backend", None) != "postgresql" or not _EXPLAINABLE.match(body):
+        return None
+    try:
+        explain_cursor = cursor.connection.cursor()
+        try:
+            explain_cursor.execute("EXPLAIN " + body)
+            return "\n".join(str(row[0]) for row in explain_cursor.fetchall())
+        finally:
+            explain_cursor.close()
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+
+
+def connect_store(path: str = STORE_PATH) -> sqlite3.Connection:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    store = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    # Gunicorn workers share the file
+    store.execute("PRAGMA journal_mode=WAL")
+    store.execute(SCHEMA)
+    return store
+
+
+recorder: Optional[SlowQueryRecorder] = None
+
+
+def install(threshold_ms: float, store_path: str = STORE_PATH, keep: int = 1000) -> SlowQueryRecorder:
+    """Create the process-wide recorder; called by superset_config.py"""
+    global recorder
+    if recorder is None:
+        recorder = SlowQueryRecorder(threshold_ms, store_path, keep)
+    return recorder
+
+
+def init_app(app):
+    """FLASK_APP_MUTATOR: time every statement Superset sends to a database
+
+    Superset runs analytics queries on raw DB-API cursors through
+    BaseEngineSpec.execute, out of reach of SQLAlchemy events, so that is
+    the method wrapped. It runs in the web app and in Celery workers.
+    """
+    from superset.db_engine_specs.base import BaseEngineSpec
+
+    execute = BaseEngineSpec.execute.__func__
+    if recorder is None or getattr(execute, "query_profiler", False):
+        return app
+
+    def timed_execute(cls, cursor, query, *args, **kwargs):
+        database = args[0] if args else kwargs.get("database")
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = execute(cls, cursor, query, *args, **kwargs)
+            ok = True
+            return result
+        finally:
+            try:
+                recorder.observe(cursor, query, time.perf_counter() - started, database, ok)
+            except Exception:  # never fail the query because of the profiler
+                logger.warning("Failed to profile query", exc_info=True)
+
+    timed_execute.query_profiler = True
+    BaseEngineSpec.execute = classmethod(timed_execute)
+    return app
+
+
+def worst_queries(
+    store: sqlite3.Connection, since_hours: float = 24, limit: int = 20
+) -> List[Dict[str, Any]]:
+    """Slow query fingerprints ordered by total time spent"""
+    rows = store.execute(
+        "SELECT fingerprint, COUNT(*), SUM(duration_ms), AVG(duration_ms), MAX(duration_ms),"
+        " MAX(id), GROUP_CONCAT(DISTINCT chart_id), GROUP_CONCAT(DISTINCT dashboard_id)"
+        " FROM slow_queries WHERE captured_at >= ? GROUP BY fingerprint"
+        " ORDER BY SUM(duration_ms) DESC LIMIT ?",
+        (time.time() - since_hours * 3600, limit),
+    ).fetchall()
+    return [
+        {
+            "fingerprint": row[0],
+            "count": row[1],
+            "total_ms": round(row[2], 1),
+            "avg_ms": round(row[3], 1),
+            "max_ms": round(row[4], 1),
+            "latest_id": row[5],
+            "charts": row[6] or "",
+            "dashboards": row[7] or "",
+        }
+        for row in rows
+    ]
+
+
+def main():
+    """List slow queries captured by the profiler"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--db", default=STORE_PATH, help="Slow query SQLite file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    top = commands.add_parser("top", help="Worst query shapes by total time")
+    top.add_argument("--since", type=float, default=24, help="Hours to look back")
+    top.add_argument("--limit", type=int, default=20)
+    show = commands.add_parser("show", help="Full SQL and plan of one sample")
+    show.add_argument("id", type=int)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No slow queries captured yet ({args.db} does not exist)")
+        return
+
+    store = connect_store(args.db)
+    if args.command == "top":
+        offenders = worst_queries(store, args.since, args.limit)
+        if not offenders:
+            print(f"No slow queries in the last {args.since:g}h")
+        for i, row in enumerate(offenders, 1):
+            print(
+                f"{i}. {row['count']}x total={row['total_ms']:.0f}ms avg={row['avg_ms']:.0f}ms "
+                f"max={row['max_ms']:.0f}ms charts=[{row['charts']}] "
+                f"dashboards=[{row['dashboards']}] latest=#{row['latest_id']}"
+            )
+            print(f"   {row['fingerprint'][:300]}")
+        return
+
+    row = store.execute(
+        "SELECT captured_at, duration_ms, database, dashboard_id, chart_id, username, sql, plan"
+        " FROM slow_queries WHERE id = ?",
+        (args.id,),
+    ).fetchone()
+    if row is None:
+        print(f"No sample #{args.id}")
+        return
+    captured_at, duration_ms, database, dashboard_id, chart_id, username, sql, plan = row
+    print(
+        f"#{args.id} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(captured_at))} "
+        f"{duration_ms:.0f}ms database={database} dashboard={dashboard_id} "
+        f"chart={chart_id} user={username}"
+    )
+    print(f"\n{sql}\n")
+    print(plan or "(no plan)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Compact serialization for cached and async query results
+
+Enabled from superset_config.py with SUPERSET_RESULTS_CODEC (zstd, lz4 or
+zlib). It replaces the serializer of the data cache tier and of
+RESULTS_BACKEND:
+- DataFrames are written as Arrow IPC streams (columnar) instead of pickled
+  pandas blocks; frames with nested values (lists, dicts) or that Arrow
+  cannot represent fall back to pickle.
+- Payloads of at least ``min_bytes`` are compressed; a payload that does
+  not shrink (Superset's async results are already zlib-compressed
+  msgpack) is stored as is.
+- Entries written by the default serializer are still read, so switching
+  codecs needs no cache flush.
+Bytes stored and saved per tier are exported through superset_metrics.
+"""
+
+import io
+import logging
+import pickle
+import zlib
+
+import pandas as pd
+import pyarrow as pa
+from cachelib.serializers import RedisSerializer
+
+from superset_metrics import InstrumentedRedisCache, metrics
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("zstd", "lz4", "zlib")
+# Compressed entries: b"~" + codec id + compressed pickle. The default
+# serializer writes b"!" + pickle or a bare integer, so the marker is unambiguous.
+_MARKER = b"~"
+_CODEC_IDS = {"zstd": b"z", "lz4": b"l", "zlib": b"g"}
+
+
+def _compress(codec, data):
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == "lz4":
+        import lz4.frame
+
+        return lz4.frame.compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(codec_id, data):
+    if codec_id == _CODEC_IDS["zstd"]:
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec_id == _CODEC_IDS["lz4"]:
+        import lz4.frame
+
+        return lz4.frame.decompress(data)
+    if codec_id == _CODEC_IDS["zlib"]:
+        return zlib.decompress(data)
+    raise ValueError("Unknown result codec id %r" % codec_id)
+
+
+def _dataframe_to_arrow(df):
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _dataframe_from_arrow(data):
+    # Integer columns with nulls stay integers (as objects) instead of floats
+    return pa.ipc.open_stream(data).read_all().to_pandas(integer_object_nulls=True)
+
+
+def _is_flat(values):
+    """True for columns Arrow gives back unchanged: primitives and plain strings
+
+    Object columns of lists, dicts or arrays would come back as NumPy
+    arrays or dicts with every key, so they are pickled instead.
+    """
+    if isinstance(values.dtype, pd.StringDtype) or values.dtype.kind in "biufmM":
+        return True
+    return values.dtype == object and pd.api.types.infer_dtype(
+        values, skipna=True
+    ) in ("string", "empty")
+
+
+class _ColumnarPickler(pickle.Pickler):
+    """Pickler writing DataFrames of flat columns as Arrow IPC streams"""
+
+    def reducer_override(self, obj):
+        if type(obj) is not pd.DataFrame:
+            return NotImplemented
+        # Arrow needs unique string column names
+        if not obj.columns.is_unique or not all(isinstance(c, str) for c in obj.columns):
+            return NotImplemented
+        if not all(_is_flat(obj[c]) for c in obj.columns):
+            return NotImplemented
+        if not isinstance(obj.index, pd.RangeIndex) and not _is_flat(obj.index):
+            return NotImplemented
+        try:
+            return _dataframe_from_arrow, (_dataframe_to_arrow(obj),)
+        except (pa.ArrowException, TypeError, ValueError):
+            return NotImplemented
+
+
+class ResultSerializer(RedisSerializer):
+    """cachelib Redis serializer with columnar pickling and compression"""
+
+    def __init__(self, codec, min_bytes=16384, columnar=True, tier="results"):
+        if codec not in CODECS:
+            raise ValueError("SUPERSET_RESULTS_CODEC must be one of %s, got %r" % (CODECS, codec))
+        try:
+            _compress(codec, b"")
+        except ImportError:
+            raise ValueError("SUPERSET_RESULTS_CODEC=%s needs the %s package"
+                             % (codec, "zstandard" if codec == "zstd" else codec))
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self.columnar = columnar
+        self.tier = tier
+
+    def _pickle(self, value, protocol):
+        if not self.columnar:
+            return pickle.dumps(value, protocol)
+        buffer = io.BytesIO()
+        _ColumnarPickler(buffer, protocol).dump(value)
+        return buffer.getvalue()
+
+    def dumps(self, value, protocol=pickle.HIGHEST_PROTOCOL):
+        # Integers stay plain for INCRBY/DECRBY, as in the default serializer
+        if type(value) is int:
+            return str(value).encode("ascii")
+        payload = self._pickle(value, protocol)
+        stored = b"!" + payload
+        if len(payload) >= self.min_bytes:
+            compressed = _compress(self.codec, payload)
+            if len(compressed) < len(payload):
+                stored = _MARKER + _CODEC_IDS[self.codec] + compressed
+        metrics.incr("result_stored_bytes", self.tier, value=len(stored))
+        if stored[:1] == _MARKER:
+            # Against what the default serializer would store: b"!" + pickle
+            metrics.incr("result_saved_bytes", self.tier, value=len(payload) + 1 - len(stored))
+        return stored
+
+    def loads(self, value):
+        if value is None or not value.startswith(_MARKER):
+            return super().loads(value)
+        try:
+            return pickle.loads(_decompress(value[1:2], value[2:]))
+        except Exception:
+            # Treated as a miss, like an unreadable pickle in the default serializer
+            logger.warning("Dropping unreadable %s cache entry", self.tier, exc_info=True)
+            return None
+
+
+class CompressedRedisCache(InstrumentedRedisCache):
+    """Flask-Caching Redis backend using ResultSerializer
+
+    CACHE_TYPE of the tiers built with compress=True in superset_config.py;
+    configured by CACHE_CODEC, CACHE_CODEC_MIN_BYTES and CACHE_COLUMNAR.
+    """
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        cache = super().factory(app, config, args, kwargs)
+        cache.serializer = ResultSerializer(
+            config["CACHE_CODEC"],
+            min_bytes=config.get("CACHE_CODEC_MIN_BYTES", 16384),
+            columnar=config.get("CACHE_COLUMNAR", True),
+            tier=cache.tier,
+        )
+        return cache
@@ -0,0 +1,396 @@
+"""
+Result size guardrails and streaming CSV export
+
+Installed from superset_config.py:
+- Per-role limits. RESULT_LIMITS maps role names to ``rows``, ``bytes``
+  and ``export_rows``; a user gets the highest limit of their listed roles,
+  or "default" when none is listed. On chart data and SQL Lab requests,
+  the row limit is applied to SELECT statements (CTEs included) through
+  the database's own LIMIT handling (SQL_QUERY_MUTATOR), and Superset's
+  fetch is done in chunks that stop at the byte limit instead of
+  materializing the whole result.
+- Streaming CSV export of a chart's query:
+  GET /api/v1/export/chart/<id>/csv writes CSV in chunks from a
+  server-side cursor, up to EXPORT_SYNC_MAX_ROWS rows.
+  POST /api/v1/export/chart/<id>/csv queues a Celery job for bigger
+  exports; it stores gzip chunks in Redis for EXPORT_TTL seconds, and
+  GET /api/v1/export/jobs/<job_id> reports its status or streams the
+  finished .csv.gz.
+Memory stays at one chunk per request whatever the result size.
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import re
+import uuid
+
+import sqlparse
+from flask import (
+    Response,
+    current_app,
+    g,
+    has_app_context,
+    has_request_context,
+    request,
+    stream_with_context,
+)
+from flask_appbuilder.api import BaseApi, expose, protect, safe
+from sqlparse import tokens
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "superset_export_"
+# Requests whose queries return results to a user: chart data and SQL Lab
+RESULT_QUERY_PATHS = ("/api/v1/chart/", "/api/v1/sqllab/execute", "/superset/explore_json/")
+_WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "MERGE", "INTO"}
+# Exports stream to the client or Redis instead of being held in memory, so
+# they may exceed the role's result byte limit; this bounds the CSV text size
+EXPORT_BYTES_FACTOR = 4
+# Gzip chunks read from Redis per LRANGE when a finished export is downloaded
+DOWNLOAD_BATCH_CHUNKS = 64
+
+
+class ResultTooLargeError(Exception):
+    pass
+
+
+def _config(name):
+    return current_app.config[name]
+
+
+def _current_user():
+    return getattr(g, "user", None) if has_app_context() else None
+
+
+def user_limits(user=None):
+    """Highest rows/bytes/export_rows limits across the user's listed roles
+
+    Users with no listed role get "default", which also fills in the keys
+    a role leaves out.
+    """
+    limits = _config("RESULT_LIMITS")
+    user = user if user is not None else _current_user()
+    names = [role.name for role in getattr(user, "roles", None) or []]
+    applicable = [limits[name] for name in names if name in limits and name != "default"]
+    return {
+        key: max(entry.get(key, limits["default"][key]) for entry in applicable or [{}])
+        for key in ("rows", "bytes", "export_rows")
+    }
+
+
+def _result_query_limits():
+    """The user's limits when the current request returns query results"""
+    if not has_request_context() or g.get("result_export"):
+        return None
+    if not request.path.startswith(RESULT_QUERY_PATHS):
+        return None
+    return user_limits()
+
+
+def is_plain_select(sql):
+    """True for a single SELECT statement that writes nothing
+
+    WITH queries count when their main statement is a SELECT and no CTE
+    body modifies data: WITH stale AS (DELETE ...) INSERT ... must keep
+    its data-modifying CTE at the top level, so it is never rewritten.
+    """
+    statements = [s for s in sqlparse.parse(sql) if s.token_first(skip_cm=True) is not None]
+    if len(statements) != 1:
+        return False
+    statement = statements[0]
+    first = statement.token_first(skip_cm=True)
+    if first.ttype is tokens.Keyword.CTE:
+        # The main statement follows the CTE list at the top level
+        first = next((t for t in statement.tokens if t.ttype is tokens.DML), None)
+    if first is None or first.ttype is not tokens.DML or first.normalized != "SELECT":
+        return False
+    # Also covers the CTE bodies, which are nested in the parse tree
+    return not any(
+        token.ttype in tokens.Keyword and token.normalized in _WRITE_KEYWORDS
+        for token in statement.flatten()
+    )
+
+
+def limit_rows(sql, *args, **kwargs):
+    """SQL_QUERY_MUTATOR: cap chart and SQL Lab SELECTs at the user's row limit
+
+    The limit goes through the database's own apply_limit_to_sql, which
+    lowers or adds the LIMIT clause the way the engine supports, so ORDER BY
+    and column names are kept. Other queries (Celery, CLI, DDL/DML, CSV
+    exports) are left alone; Superset's own ROW_LIMIT/SQL_MAX_ROW still
+    apply there.
+    """
+    database = kwargs.get("database")
+    if database is None or not hasattr(database, "apply_limit_to_sql"):
+        return sql
+    limits = _result_query_limits()
+    if limits is None or not is_plain_select(sql):
+        return sql
+    return database.apply_limit_to_sql(sql, limits["rows"])
+
+
+def _estimate_bytes(rows):
+    # Close enough to compare against a limit, cheap enough to run per chunk
+    size = 0
+    for row in rows:
+        for value in row:
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    return size
+
+
+class _ByteLimitedCursor:
+    """Cursor proxy whose fetches read in chunks and stop at ``max_bytes``"""
+
+    def __init__(self, cursor, max_bytes, chunk_rows):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_max_bytes", max_bytes)
+        object.__setattr__(self, "_chunk_rows", chunk_rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def fetchmany(self, size=None):
+        return self._fetch(size)
+
+    def fetchall(self):
+        return self._fetch(None)
+
+    def _fetch(self, limit):
+        rows, size = [], 0
+        while limit is None or len(rows) < limit:
+            want = self._chunk_rows if limit is None else min(self._chunk_rows, limit - len(rows))
+            chunk = self._cursor.fetchmany(want)
+            if not chunk:
+                break
+            size += _estimate_bytes(chunk)
+            if size > self._max_bytes:
+                raise ResultTooLargeError(
+                    "The result is larger than the %g MB allowed for your role. Narrow the "
+                    "filters or time range, or export it with an async CSV export."
+                    % round(self._max_bytes / (1024.0 * 1024), 1)
+                )
+            rows.extend(chunk)
+        return rows
+
+
+def _install_fetch_guard():
+    from superset.db_engine_specs.base import BaseEngineSpec
+
+    fetch_data = BaseEngineSpec.fetch_data.__func__
+    if getattr(fetch_data, "result_export", False):
+        return
+
+    def guarded_fetch_data(cls, cursor, limit=None):
+        limits = _result_query_limits()
+        if limits is None:
+            return fetch_data(cls, cursor, limit)
+        guarded = _ByteLimitedCursor(
+            cursor, limits["bytes"], _config("EXPORT_CHUNK_ROWS")
+        )
+        return fetch_data(cls, guarded, limit)
+
+    guarded_fetch_data.result_export = True
+    BaseEngineSpec.fetch_data = classmethod(guarded_fetch_data)
+
+
+def chart_query(chart_id, row_limit):
+    """Database, schema and SQL of a chart's saved query, checking access"""
+    from superset import db, security_manager
+    from superset.models.slice import Slice
+
+    chart = db.session.query(Slice).get(chart_id)
+    if chart is None or chart.datasource is None:
+        raise LookupError("Chart %s not found" % chart_id)
+    security_manager.raise_for_access(datasource=chart.datasource)
+
+    query_context = chart.get_query_context()
+    if query_context is None or not query_context.queries:
+        raise ValueError("Chart %s has no saved query; open and save it in Explore first" % chart_id)
+    query_obj = query_context.queries[0]
+    query_obj.row_limit = row_limit
+    g.result_export = True
+    try:
+        sql = chart.datasource.get_query_str(query_obj.to_dict())
+    finally:
+        g.pop("result_export", None)
+    return chart, chart.datasource.database, chart.datasource.schema, sql
+
+
+def iter_csv(database, schema, sql, chunk_rows):
+    """Yield CSV text chunk by chunk from a server-side cursor
+
+    Postgres gets a named (server-side) cursor, so rows are read from the
+    database as they are written out; other backends stream from their
+    default cursor.
+    """
+    with database.get_raw_connection(schema=schema) as conn:
+        if database.backend == "postgresql":
+            cursor = conn.cursor(name="superset_export_%s" % uuid.uuid4().hex[:12])
+            cursor.itersize = chunk_rows
+        else:
+            cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            rows = cursor.fetchmany(chunk_rows)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # Named cursors only describe their columns after the first fetch
+            writer.writerow([column[0] for column in cursor.description or []])
+            while rows:
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                rows = cursor.fetchmany(chunk_rows)
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            cursor.close()
+
+
+def _redis():
+    from redis import Redis
+
+    return Redis.from_url(_config("EXPORT_REDIS_URL"))
+
+
+def _job_meta(redis, job_id):
+    raw = redis.get(KEY_PREFIX + job_id + "_meta")
+    return json.loads(raw) if raw else None
+
+
+def _save_meta(redis, job_id, meta):
+    redis.set(KEY_PREFIX + job_id + "_meta", json.dumps(meta), ex=_config("EXPORT_TTL"))
+
+
+def export_chart_csv(job_id, chart_id, username):
+    """Run a chart's query and store the CSV as gzip chunks in Redis
+
+    Runs in a Celery worker (the exports.chart_csv task in celery_tasks.py).
+    """
+    from superset import security_manager
+    from superset.utils.core import override_user
+
+    redis = _redis()
+    meta = _job_meta(redis, job_id) or {}
+    chunks_key = KEY_PREFIX + job_id + "_chunks"
+    ttl = _config("EXPORT_TTL")
+    meta.update(status="running")
+    _save_meta(redis, job_id, meta)
+    try:
+        user = security_manager.find_user(username=username)
+        with override_user(user):
+            limits = user_limits(user)
+            chart, database, schema, sql = chart_query(chart_id, limits["export_rows"])
+            size = 0
+            for text in iter_csv(database, schema, sql, _config("EXPORT_CHUNK_ROWS")):
+                size += len(text)
+                if size > limits["bytes"] * EXPORT_BYTES_FACTOR:
+                    raise ResultTooLargeError("Export exceeds the size allowed for your role")
+                # Concatenated gzip members are a valid gzip file
+                redis.rpush(chunks_key, gzip.compress(text.encode("utf-8"), compresslevel=5))
+                redis.expire(chunks_key, ttl)
+        meta.update(status="done", bytes=size, filename="%s.csv.gz" % _filename(chart.slice_name))
+    except Exception as e:  # includes Celery's SoftTimeLimitExceeded
+        logger.warning("CSV export %s of chart %s failed", job_id, chart_id, exc_info=True)
+        redis.delete(chunks_key)
+        meta.update(status="failed", error=str(e))
+    _save_meta(redis, job_id, meta)
+
+
+def iter_chunks(redis, chunks_key, batch=DOWNLOAD_BATCH_CHUNKS):
+    """Yield a finished export's gzip chunks, ``batch`` per round trip
+
+    LRANGE from a moving offset; LINDEX per chunk would walk the list each
+    time, making a download quadratic in its length.
+    """
+    start = 0
+    while True:
+        chunks = redis.lrange(chunks_key, start, start + batch - 1)
+        yield from chunks
+        if len(chunks) < batch:
+            return
+        start += batch
+
+
+def _filename(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name or "export").strip("_") or "export"
+
+
+class CsvExportApi(BaseApi):
+    """Streaming and async CSV exports; guarded by the chart read permission"""
+
+    resource_name = "export"
+    class_permission_name = "Chart"
+    method_permission_name = {"chart_csv": "read", "start_chart_csv": "read", "job": "read"}
+    allow_browser_login = True
+    openapi_spec_tag = "CSV Export"
+
+    @expose("/chart/<int:pk>/csv", methods=("GET",))
+    @protect()
+    @safe
+    def chart_csv(self, pk):
+        rows = min(user_limits()["export_rows"], _config("EXPORT_SYNC_MAX_ROWS"))
+        try:
+            chart, database, schema, sql = chart_query(pk, rows)
+        except LookupError as e:
+            return self.response_404(message=str(e))
+        except ValueError as e:
+            return self.response_400(message=str(e))
+
+        return Response(
+            stream_with_context(iter_csv(database, schema, sql, _config("EXPORT_CHUNK_ROWS"))),
+            mimetype="text/csv",
+            headers={
+                "Content-Disposition": 'attachment; filename="%s.csv"' % _filename(chart.slice_name),
+                "X-Row-Limit": str(rows),
+            },
+        )
+
+    @expose("/chart/<int:pk>/csv", methods=("POST",))
+    @protect()
+    @safe
+    def start_chart_csv(self, pk):
+        from superset.extensions import celery_app
+
+        if not _config("EXPORT_REDIS_URL"):
+            return self.response_400(message="Async exports need Redis; use GET for a streamed export")
+        job_id = uuid.uuid4().hex
+        _save_meta(_redis(), job_id, {"status": "queued", "chart_id": pk, "user": g.user.username})
+        celery_app.send_task("exports.chart_csv", args=(job_id, pk, g.user.username))
+        return self.response(
+            202, job_id=job_id, status_url="/api/v1/export/jobs/%s" % job_id
+        )
+
+    @expose("/jobs/<job_id>", methods=("GET",))
+    @protect()
+    @safe
+    def job(self, job_id):
+        redis = _redis()
+        meta = _job_meta(redis, job_id)
+        # Only the user who started an export may fetch it
+        if meta is None or meta.get("user") != g.user.username:
+            return self.response_404()
+        if meta["status"] != "done":
+            return self.response(200 if meta["status"] == "failed" else 202, **meta)
+
+        return Response(
+            iter_chunks(redis, KEY_PREFIX + job_id + "_chunks"),
+            mimetype="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="%s"' % meta["filename"]},
+        )
+
+
+def init_app(app):
+    """FLASK_APP_MUTATOR: install the fetch guard and register the export API"""
+    from superset.extensions import appbuilder
+
+    _install_fetch_guard()
+    appbuilder.add_api(CsvExportApi)
+    return app
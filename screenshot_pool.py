@@ -0,0 +1,204 @@
+"""
+Reused browser for dashboard thumbnails and report screenshots
+
+Superset's Playwright driver starts Playwright and launches a new Chromium
+for every screenshot. init_app() (a FLASK_APP_MUTATOR hook in
+superset_config.py) swaps the sync_playwright it uses for one that keeps a
+single browser per Celery worker process. Each screenshot still gets its own
+browser context, so cookies and logins never leak between screenshots. The
+browser is relaunched after SUPERSET_SCREENSHOT_BROWSER_MAX_USES screenshots,
+when its launch arguments change, or once it has crashed.
+
+Playwright objects are bound to the thread that started them; calls from any
+other thread, or while the browser is busy, fall back to Superset's
+one-browser-per-screenshot behaviour.
+
+Also provides the THUMBNAIL_*_DIGEST_FUNC hooks: thumbnails are cached under
+a hash of the dashboard's (or chart's) content, so saving an unchanged
+dashboard never re-renders it.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+from celery.signals import worker_process_shutdown
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    def __init__(self, max_uses=50):
+        self.max_uses = max_uses
+        self._playwright = None
+        self._browser = None
+        self._args = None
+        self._uses = 0
+        self._thread = None
+        self.lock = threading.Lock()
+
+    def owns_thread(self):
+        return self._thread in (None, threading.get_ident())
+
+    def browser(self, args):
+        args = list(args or [])
+        stale = (
+            self._browser is None
+            or not self._browser.is_connected()
+            or self._uses >= self.max_uses
+            or args != self._args
+        )
+        if stale:
+            self.close()
+            from playwright.sync_api import sync_playwright
+
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(args=args)
+            self._args = args
+            self._thread = threading.get_ident()
+            self._uses = 0
+            logger.info("Launched screenshot browser, reused for up to %d screenshots", self.max_uses)
+        self._uses += 1
+        return self._browser
+
+    def close(self):
+        browser, playwright = self._browser, self._playwright
+        self._browser = self._playwright = None
+        self._thread = None
+        for closer in (browser and browser.close, playwright and playwright.stop):
+            if closer:
+                try:
+                    closer()
+                except Exception:  # the browser may already be gone
+                    logger.debug("Error closing screenshot browser", exc_info=True)
+
+
+class _BorrowedBrowser:
+    """The pooled browser as one screenshot sees it: close() only closes its contexts"""
+
+    def __init__(self, browser):
+        self._browser = browser
+        self._contexts = []
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+    def new_context(self, **kwargs):
+        context = self._browser.new_context(**kwargs)
+        self._contexts.append(context)
+        return context
+
+    def new_page(self, **kwargs):
+        return self.new_context(**kwargs).new_page()
+
+    def close(self, **kwargs):
+        while self._contexts:
+            try:
+                self._contexts.pop().close()
+            except Exception:
+                logger.debug("Error closing screenshot context", exc_info=True)
+
+
+class _PooledBrowserType:
+    def __init__(self, pool, borrowed):
+        self._pool = pool
+        self._borrowed = borrowed
+
+    def launch(self, args=None, **kwargs):
+        browser = _BorrowedBrowser(self._pool.browser(args))
+        self._borrowed.append(browser)
+        return browser
+
+
+class _PooledPlaywright:
+    def __init__(self, pool, borrowed):
+        self.chromium = _PooledBrowserType(pool, borrowed)
+
+
+pool = BrowserPool()
+_original_sync_playwright = None
+
+
+@contextmanager
+def pooled_playwright():
+    """Drop-in for ``sync_playwright()`` as used by Superset's WebDriverPlaywright"""
+    if not pool.owns_thread() or not pool.lock.acquire(blocking=False):
+        with _original_sync_playwright() as playwright:
+            yield playwright
+        return
+    borrowed = []
+    try:
+        yield _PooledPlaywright(pool, borrowed)
+    finally:
+        # Superset skips browser.close() when a screenshot fails; don't leak the context
+        for browser in borrowed:
+            browser.close()
+        pool.lock.release()
+
+
+def _content_digest(parts, args):
+    # Executor arguments make per-user thumbnails (THUMBNAIL_EXECUTE_AS) distinct
+    text = json.dumps(parts, sort_keys=True, default=str) + "\n" + "\n".join(str(a) for a in args)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _chart_parts(chart):
+    datasource = chart.datasource
+    return {
+        "id": chart.id,
+        "viz_type": chart.viz_type,
+        "params": chart.params,
+        "query_context": chart.query_context,
+        # Dataset edits (metrics, columns) change what the chart renders
+        "datasource": getattr(datasource, "uid", None),
+        "datasource_changed_on": getattr(datasource, "changed_on", None),
+    }
+
+
+def dashboard_digest(dashboard, *args):
+    """THUMBNAIL_DASHBOARD_DIGEST_FUNC: hash of the layout, metadata, CSS and charts"""
+    return _content_digest(
+        {
+            "id": dashboard.id,
+            "title": dashboard.dashboard_title,
+            "position_json": dashboard.position_json,
+            "json_metadata": dashboard.json_metadata,
+            "css": dashboard.css,
+            "charts": [_chart_parts(chart) for chart in sorted(dashboard.slices, key=lambda c: c.id)],
+        },
+        args,
+    )
+
+
+def chart_digest(chart, *args):
+    """THUMBNAIL_CHART_DIGEST_FUNC: hash of the chart's definition and its dataset"""
+    return _content_digest(_chart_parts(chart), args)
+
+
+def init_app(app):
+    """FLASK_APP_MUTATOR: route Superset's Playwright screenshots through the pool"""
+    global _original_sync_playwright
+
+    try:
+        from superset.utils import webdriver
+    except ImportError:
+        return app
+    if getattr(webdriver, "sync_playwright", None) is None:
+        logger.warning("Playwright is not installed; thumbnails use Superset's Selenium driver")
+        return app
+    if webdriver.sync_playwright is not pooled_playwright:
+        pool.max_uses = app.config.get("SCREENSHOT_BROWSER_MAX_USES", pool.max_uses)
+        _original_sync_playwright = webdriver.sync_playwright
+        webdriver.sync_playwright = pooled_playwright
+    return app
+
+
+@worker_process_shutdown.connect
+def _close_pool(**kwargs):
+    pool.close()
+
+
+atexit.register(pool.close)
@@ -18,9 +18,64 @@
 set -e
 
 #
-# Always install local overrides first
+# pip and playwright work happens at build time (see Dockerfile); only rerun
+# the bootstrap when local overrides are mounted or it is asked for explicitly
 #
-/app/docker/docker-bootstrap.sh
+if [ -f /app/docker/requirements-local.txt ] || [ "${SUPERSET_RUN_BOOTSTRAP:-false}" = "true" ]; then
+    /app/docker/docker-bootstrap.sh
+fi
+
+# Fast boot: skip init steps whose state is already current (set to false to
+# always run every step)
+SUPERSET_FAST_BOOT="${SUPERSET_FAST_BOOT:-true}"
+INIT_STATE="python /app/docker/init_state.py"
+
+# Succeeds when fast boot is on and the given init_state check passes
+step_is_current() {
+    [ "$SUPERSET_FAST_BOOT" = "true" ] && $INIT_STATE "$@"
+}
+
+# Prometheus metrics from gunicorn workers and Celery children are merged
+# through files in this directory; start each container with it empty
+if [ "${SUPERSET_METRICS_BACKEND:-}" = "prometheus" ]; then
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/superset-metrics}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+#
+# One image serves every Railway service: pick the role with the first
+# argument or SUPERSET_ROLE (web, worker or beat). Only web runs the init steps.
+#
+SUPERSET_ROLE="${1:-${SUPERSET_ROLE:-web}}"
+CELERY_APP="superset.tasks.celery_app:app"
+# Queues a worker consumes (see task_routes in superset_config.py); run
+# dedicated workers by narrowing this per service
+CELERY_WORKER_QUEUES="${CELERY_WORKER_QUEUES:-celery,sql_lab,reports,cache_warmup}"
+
+case "$SUPERSET_ROLE" in
+  worker)
+    echo "Starting Celery worker (queues: ${CELERY_WORKER_QUEUES})..."
+    exec celery --app="$CELERY_APP" worker \
+      --pool=prefork \
+      -O fair \
+      --queues="$CELERY_WORKER_QUEUES" \
+      --loglevel="${CELERY_LOG_LEVEL:-INFO}"
+    ;;
+  beat)
+    echo "Starting Celery beat..."
+    exec celery --app="$CELERY_APP" beat \
+      --pidfile=/tmp/celerybeat.pid \
+      --schedule=/tmp/celerybeat-schedule \
+      --loglevel="${CELERY_LOG_LEVEL:-INFO}"
+    ;;
+  web)
+    ;;
+  *)
+    echo "Unknown SUPERSET_ROLE '${SUPERSET_ROLE}', expected web, worker or beat"
+    exit 1
+    ;;
+esac
 
 STEP_CNT=4
 
@@ -52,21 +107,34 @@ if [ "$CYPRESS_CONFIG" == "true" ]; then
 fi
 # Initialize the database
 echo_step "1" "Starting" "Applying DB migrations"
-superset db upgrade
+if step_is_current migrations-current; then
+    echo "Database already at the latest revision, skipping"
+else
+    superset db upgrade
+fi
 echo_step "1" "Complete" "Applying DB migrations"
 
 # Create an admin user
 echo_step "2" "Starting" "Setting up admin user ( $ADMIN_USERNAME / $ADMIN_PASSWORD )"
-superset fab create-admin \
-              --username "$ADMIN_USERNAME" \
-              --firstname "$ADMIN_FIRSTNAME" \
-              --lastname "$ADMIN_LASTNAME" \
-              --email "$ADMIN_EMAIL" \
-              --password "$ADMIN_PASSWORD"
+if step_is_current admin-exists "$ADMIN_USERNAME"; then
+    echo "Admin user $ADMIN_USERNAME already exists, skipping"
+else
+    superset fab create-admin \
+                  --username "$ADMIN_USERNAME" \
+                  --firstname "$ADMIN_FIRSTNAME" \
+                  --lastname "$ADMIN_LASTNAME" \
+                  --email "$ADMIN_EMAIL" \
+                  --password "$ADMIN_PASSWORD"
+fi
 echo_step "2" "Complete" "Setting up admin user"
 # Create default roles and permissions
 echo_step "3" "Starting" "Setting up roles and perms"
-superset init
+if step_is_current init-current; then
+    echo "Roles and permissions unchanged since last init, skipping"
+else
+    superset init
+    $INIT_STATE record-init || true
+fi
 echo_step "3" "Complete" "Setting up roles and perms"
 
 if [ "$SUPERSET_LOAD_EXAMPLES" = "yes" ]; then
@@ -83,4 +151,8 @@ if [ "$SUPERSET_LOAD_EXAMPLES" = "yes" ]; then
 fi
 
 echo "Starting web app..."
-/usr/bin/run-server.sh
\ No newline at end of file
+# Worker count, class, timeouts and recycling come from the server profile;
+# see gunicorn_config.py for the env variables it reads
+exec gunicorn \
+    --config "${GUNICORN_CONFIG:-/app/docker/gunicorn_config.py}" \
+    "superset.app:create_app()"
\ No newline at end of file
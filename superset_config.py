@@ -1,6 +1,13 @@
+import json
 import os
 import sys
 import logging
+from fnmatch import fnmatch
+from urllib.parse import urlsplit, urlunsplit
+
+from cachelib.redis import RedisCache
+from celery.schedules import crontab
+from redis import Redis
 
 logger = logging.getLogger()
 
@@ -23,6 +30,7 @@ SUPERSET_CACHE_REDIS_URL = os.environ.get("SUPERSET_CACHE_REDIS_URL", "")
 RATELIMIT_STORAGE_URI = SUPERSET_CACHE_REDIS_URL or os.environ.get("RATELIMIT_STORAGE_URI", "")
 
 # Get database URI - prefer DATABASE_URL over SQLALCHEMY_DATABASE_URI to avoid template strings
+# (init_state.py resolves it the same way; keep the two in step)
 _db_uri = os.environ.get("SQLALCHEMY_DATABASE_URI", "")
 # If SQLALCHEMY_DATABASE_URI contains template syntax or is empty, use DATABASE_URL instead
 if not _db_uri or "${" in _db_uri:
@@ -45,27 +53,403 @@ except ValueError:
     REDIS_PORT = 6379
 REDIS_URL = os.environ.get("REDIS_URL", os.environ.get("CACHE_REDIS_URL", ""))
 
-# Cache configuration (use URLs when available)
-CACHE_CONFIG = {
-    "CACHE_TYPE": "RedisCache",
-    "CACHE_DEFAULT_TIMEOUT": 300,
-    "CACHE_KEY_PREFIX": "superset_",
-    "CACHE_REDIS_HOST": REDIS_HOST or None,
-    "CACHE_REDIS_PORT": REDIS_PORT,
-    "CACHE_REDIS_DB": 0,
-    "CACHE_REDIS_URL": REDIS_URL or SUPERSET_CACHE_REDIS_URL,
-}
-DATA_CACHE_CONFIG = CACHE_CONFIG
+# Helper to read validated integers from env; invalid values fail at import
+def _env_int(name, default, minimum=None, maximum=None):
+    val = os.environ.get(name)
+    if val is None or val == "":
+        return default
+    try:
+        result = int(val)
+    except ValueError:
+        raise ValueError("%s must be an integer, got %r" % (name, val))
+    if (minimum is not None and result < minimum) or (maximum is not None and result > maximum):
+        raise ValueError("%s must be between %s and %s, got %s" % (name, minimum, maximum, result))
+    return result
+
+# Hooks run on the Flask app once Superset has created it (web and Celery)
+_APP_MUTATORS = []
+
+def FLASK_APP_MUTATOR(app):
+    for mutate in _APP_MUTATORS:
+        mutate(app)
+
+# Rewrites applied in order to SQL before Superset runs it
+_SQL_MUTATORS = []
+
+def SQL_QUERY_MUTATOR(sql, *args, **kwargs):
+    for mutate in _SQL_MUTATORS:
+        sql = mutate(sql, *args, **kwargs)
+    return sql
+
+# Metrics (see superset_metrics.py): "prometheus" serves /metrics, "statsd" pushes
+# to STATSD_HOST; empty disables them
+SUPERSET_METRICS_BACKEND = os.environ.get("SUPERSET_METRICS_BACKEND", "").lower()
+if SUPERSET_METRICS_BACKEND:
+    import superset_metrics
+
+    superset_metrics.configure(
+        SUPERSET_METRICS_BACKEND,
+        max_label_values=_env_int("SUPERSET_METRICS_MAX_LABEL_VALUES", 100, minimum=1),
+    )
+    STATS_LOGGER = superset_metrics.MetricsStatsLogger()
+    QUERY_LOGGER = superset_metrics.log_query
+    _APP_MUTATORS.append(superset_metrics.init_app)
+
+# Slow-query capture (see query_profiler.py): tags analytics SQL with its dashboard,
+# chart and user, and samples queries slower than SUPERSET_SLOW_QUERY_MS (0 disables
+# sampling) with their EXPLAIN plans
+if _env_bool("SUPERSET_QUERY_PROFILER", True):
+    import query_profiler
+
+    query_profiler.install(
+        threshold_ms=_env_int("SUPERSET_SLOW_QUERY_MS", 1000, minimum=0),
+        keep=_env_int("SUPERSET_SLOW_QUERY_KEEP", 1000, minimum=1),
+    )
+    _SQL_MUTATORS.append(query_profiler.tag_query)
+    _APP_MUTATORS.append(query_profiler.init_app)
+
+# Point a redis:// URL at a specific DB index, replacing any DB already in it
+def _redis_url(base_url, db):
+    parts = urlsplit(base_url)
+    return urlunsplit((parts.scheme, parts.netloc, "/%d" % db, parts.query, parts.fragment))
+
+# Result serialization (see result_codec.py): SUPERSET_RESULTS_CODEC=zstd|lz4|zlib
+# compresses data cache entries and async SQL Lab results of at least
+# SUPERSET_RESULTS_CODEC_MIN_BYTES; empty keeps the default pickle. With
+# SUPERSET_RESULTS_COLUMNAR, cached DataFrames are stored as Arrow and async
+# results as Arrow/msgpack (Superset's RESULTS_BACKEND_USE_MSGPACK).
+SUPERSET_RESULTS_CODEC = os.environ.get("SUPERSET_RESULTS_CODEC", "").lower()
+SUPERSET_RESULTS_CODEC_MIN_BYTES = _env_int("SUPERSET_RESULTS_CODEC_MIN_BYTES", 16384, minimum=0)
+SUPERSET_RESULTS_COLUMNAR = _env_bool("SUPERSET_RESULTS_COLUMNAR", True)
+RESULTS_BACKEND_USE_MSGPACK = SUPERSET_RESULTS_COLUMNAR
+
+# Build one cache tier. Each tier gets its own Redis DB, key prefix and
+# timeout, overridable with SUPERSET_<TIER>_CACHE_{REDIS_DB,KEY_PREFIX,TIMEOUT}.
+# DB indexes share one Redis memory budget; set SUPERSET_<TIER>_CACHE_REDIS_URL
+# to move a tier (e.g. DATA) to its own instance so it cannot evict the others.
+def _cache_tier(tier, db, prefix, timeout, compress=False, **extra):
+    env = "SUPERSET_%s_CACHE" % tier
+    redis_db = _env_int(env + "_REDIS_DB", db, minimum=0, maximum=15)
+    key_prefix = os.environ.get(env + "_KEY_PREFIX", prefix)
+    if not key_prefix:
+        raise ValueError("%s_KEY_PREFIX must not be empty" % env)
+    base_url = os.environ.get(env + "_REDIS_URL") or REDIS_URL or SUPERSET_CACHE_REDIS_URL
+    config = {
+        "CACHE_TYPE": "RedisCache",
+        "CACHE_DEFAULT_TIMEOUT": _env_int(env + "_TIMEOUT", timeout, minimum=0),
+        "CACHE_KEY_PREFIX": key_prefix,
+        "CACHE_REDIS_HOST": REDIS_HOST or None,
+        "CACHE_REDIS_PORT": REDIS_PORT,
+        "CACHE_REDIS_DB": redis_db,
+        "CACHE_REDIS_URL": _redis_url(base_url, redis_db) if base_url else "",
+    }
+    if SUPERSET_METRICS_BACKEND:
+        # Same Redis backend, counting hits and misses for this tier
+        config["CACHE_TYPE"] = "superset_metrics.InstrumentedRedisCache"
+        config["CACHE_METRICS_TIER"] = tier.lower()
+    if compress and SUPERSET_RESULTS_CODEC:
+        # Also counts hits and misses: CompressedRedisCache extends InstrumentedRedisCache
+        config.update(
+            CACHE_TYPE="result_codec.CompressedRedisCache",
+            CACHE_METRICS_TIER=tier.lower(),
+            CACHE_CODEC=SUPERSET_RESULTS_CODEC,
+            CACHE_CODEC_MIN_BYTES=SUPERSET_RESULTS_CODEC_MIN_BYTES,
+            CACHE_COLUMNAR=SUPERSET_RESULTS_COLUMNAR,
+        )
+    config.update(extra)
+    return config
+
+# Cache configuration (use URLs when available). Celery uses DBs 0 and 1,
+# async SQL Lab results DB 7.
+CACHE_CONFIG = _cache_tier("METADATA", 2, "superset_meta_", 300)
+DATA_CACHE_CONFIG = _cache_tier("DATA", 3, "superset_data_", 3600, compress=True)
+FILTER_STATE_CACHE_CONFIG = _cache_tier(
+    "FILTER_STATE", 4, "superset_filter_state_", 86400, REFRESH_TIMEOUT_ON_RETRIEVAL=True
+)
+EXPLORE_FORM_DATA_CACHE_CONFIG = _cache_tier(
+    "EXPLORE_FORM_DATA", 5, "superset_explore_form_", 86400, REFRESH_TIMEOUT_ON_RETRIEVAL=True
+)
+THUMBNAIL_CACHE_CONFIG = _cache_tier("THUMBNAIL", 6, "superset_thumbnail_", 604800)
+
+_CACHE_TIERS = (
+    ("metadata", CACHE_CONFIG),
+    ("data", DATA_CACHE_CONFIG),
+    ("filter_state", FILTER_STATE_CACHE_CONFIG),
+    ("explore_form_data", EXPLORE_FORM_DATA_CACHE_CONFIG),
+    ("thumbnail", THUMBNAIL_CACHE_CONFIG),
+)
+
+# Tiers sharing a Redis DB must not share a key prefix
+_cache_keys = {}
+for _name, _config in _CACHE_TIERS:
+    _key = (_config["CACHE_REDIS_URL"] or _config["CACHE_REDIS_DB"], _config["CACHE_KEY_PREFIX"])
+    if _key in _cache_keys:
+        raise ValueError("%s and %s share Redis DB and key prefix %r"
+                         % (_cache_keys[_key], _name, _config["CACHE_KEY_PREFIX"]))
+    _cache_keys[_key] = _name
+
+# Cache warm-up for published dashboards (see celery_tasks.py); 0 disables the schedule
+SUPERSET_WARMUP_INTERVAL_MINUTES = _env_int("SUPERSET_WARMUP_INTERVAL_MINUTES", 30, minimum=0)
+
+# Incremental refresh of the dashboard spec's rollup tables; 0 disables the schedule.
+# Keep it shorter than the rollups' lookback_hours so no bucket is missed.
+SUPERSET_ROLLUP_REFRESH_MINUTES = _env_int("SUPERSET_ROLLUP_REFRESH_MINUTES", 15, minimum=0)
+
+# Celery: broker, result and async query stores live in their own Redis DBs
+_CELERY_REDIS_URL = SUPERSET_CACHE_REDIS_URL or REDIS_URL
+CELERY_BROKER_DB = _env_int("SUPERSET_CELERY_BROKER_DB", 1, minimum=0, maximum=15)
+CELERY_RESULT_DB = _env_int("SUPERSET_CELERY_RESULT_DB", 0, minimum=0, maximum=15)
+RESULTS_REDIS_DB = _env_int("SUPERSET_RESULTS_REDIS_DB", 7, minimum=0, maximum=15)
 
 class CeleryConfig(object):
-    # Use the redis url and append DB index for broker and result backend
-    BROKER_URL = (SUPERSET_CACHE_REDIS_URL or REDIS_URL) + "/1" if (SUPERSET_CACHE_REDIS_URL or REDIS_URL) else None
-    CELERY_IMPORTS = ("superset.sql_lab",)
-    CELERY_RESULT_BACKEND = (SUPERSET_CACHE_REDIS_URL or REDIS_URL) + "/0" if (SUPERSET_CACHE_REDIS_URL or REDIS_URL) else None
-    CELERY_ANNOTATIONS = {"tasks.add": {"rate_limit": "10/s"}}
+    broker_url = _redis_url(_CELERY_REDIS_URL, CELERY_BROKER_DB) if _CELERY_REDIS_URL else None
+    result_backend = _redis_url(_CELERY_REDIS_URL, CELERY_RESULT_DB) if _CELERY_REDIS_URL else None
+    broker_connection_retry_on_startup = True
+    imports = (
+        "superset.sql_lab",
+        "superset.tasks.scheduler",
+        "superset.tasks.thumbnails",
+        "superset.tasks.cache",
+        "celery_tasks",
+    )
+    # SQL Lab queries and reports are long: fetch one task at a time and only
+    # ack it once done, so a killed worker hands the task to another one
+    worker_prefetch_multiplier = _env_int("CELERY_WORKER_PREFETCH_MULTIPLIER", 1, minimum=1)
+    worker_concurrency = _env_int("CELERY_WORKER_CONCURRENCY", None, minimum=1)
+    worker_max_tasks_per_child = _env_int("CELERY_WORKER_MAX_TASKS_PER_CHILD", 128, minimum=1)
+    task_acks_late = True
+    task_reject_on_worker_lost = True
+    task_default_queue = "celery"
+    # Workers consume CELERY_WORKER_QUEUES (startup.sh), all of these by default
+    task_routes = {
+        "sql_lab.get_sql_results": {"queue": "sql_lab"},
+        "reports.*": {"queue": "reports"},
+        "cache_chart_thumbnail": {"queue": "reports"},
+        "cache_dashboard_thumbnail": {"queue": "reports"},
+        "cache_dashboard_screenshot": {"queue": "reports"},
+        "cache-warmup": {"queue": "cache_warmup"},
+        "fetch_url": {"queue": "cache_warmup"},
+        "cache_warmup.*": {"queue": "cache_warmup"},
+        # Async CSV exports are long-running queries like SQL Lab's
+        "exports.*": {"queue": "sql_lab"},
+    }
+    task_annotations = {
+        "sql_lab.get_sql_results": {"rate_limit": os.environ.get("CELERY_SQL_LAB_RATE_LIMIT", "100/s")},
+    }
+    beat_schedule = {
+        "reports.scheduler": {
+            "task": "reports.scheduler",
+            "schedule": crontab(minute="*", hour="*"),
+        },
+        "reports.prune_log": {
+            "task": "reports.prune_log",
+            "schedule": crontab(minute=0, hour=0),
+        },
+    }
+    if SUPERSET_WARMUP_INTERVAL_MINUTES:
+        beat_schedule["warm-dashboards"] = {
+            "task": "cache_warmup.warm_dashboards",
+            "schedule": SUPERSET_WARMUP_INTERVAL_MINUTES * 60.0,
+        }
+    if SUPERSET_ROLLUP_REFRESH_MINUTES:
+        beat_schedule["refresh-rollups"] = {
+            "task": "rollups.refresh",
+            "schedule": SUPERSET_ROLLUP_REFRESH_MINUTES * 60.0,
+        }
 
 CELERY_CONFIG = CeleryConfig
 
+# Async SQL Lab results (databases with "Asynchronous query execution" enabled)
+if _CELERY_REDIS_URL or REDIS_HOST:
+    RESULTS_BACKEND = RedisCache(
+        host=Redis.from_url(_redis_url(_CELERY_REDIS_URL, RESULTS_REDIS_DB)) if _CELERY_REDIS_URL
+        else Redis(host=REDIS_HOST, port=REDIS_PORT, db=RESULTS_REDIS_DB),
+        key_prefix="superset_results_",
+        default_timeout=_env_int("SUPERSET_RESULTS_TIMEOUT", 86400, minimum=0),
+    )
+    if SUPERSET_RESULTS_CODEC:
+        import result_codec
+
+        RESULTS_BACKEND.serializer = result_codec.ResultSerializer(
+            SUPERSET_RESULTS_CODEC,
+            min_bytes=SUPERSET_RESULTS_CODEC_MIN_BYTES,
+            columnar=SUPERSET_RESULTS_COLUMNAR,
+            tier="results",
+        )
+SQLLAB_ASYNC_TIME_LIMIT_SEC = _env_int("SQLLAB_ASYNC_TIME_LIMIT_SEC", 6 * 60 * 60, minimum=1)
+
+# Result size limits (result_export.py; SUPERSET_RESULT_LIMITS_ENABLED=false
+# turns them off). "rows" caps chart and SQL Lab SELECTs, "bytes" aborts a
+# fetch once the rows read exceed it, so one huge result cannot run the web
+# worker out of memory, and "export_rows" caps CSV exports. Users get the
+# highest limit of their listed roles, or "default" when none is listed;
+# "default" also fills keys a role leaves out. Add or raise roles with
+# SUPERSET_RESULT_LIMITS, e.g. {"Admin": {"rows": 500000, "bytes": 268435456}}
+ROW_LIMIT = _env_int("SUPERSET_ROW_LIMIT", 50000, minimum=1)
+SQL_MAX_ROW = _env_int("SUPERSET_SQL_MAX_ROW", 100000, minimum=1)
+DISPLAY_MAX_ROW = _env_int("SUPERSET_DISPLAY_MAX_ROW", 10000, minimum=1)
+SAMPLES_ROW_LIMIT = _env_int("SUPERSET_SAMPLES_ROW_LIMIT", 1000, minimum=1)
+RESULT_LIMITS = {
+    "default": {"rows": ROW_LIMIT, "bytes": 64 * 1024 * 1024, "export_rows": 1000000},
+}
+try:
+    for _role, _limits in json.loads(os.environ.get("SUPERSET_RESULT_LIMITS") or "{}").items():
+        RESULT_LIMITS.setdefault(_role, {}).update(_limits)
+except (ValueError, AttributeError):
+    raise ValueError("SUPERSET_RESULT_LIMITS must be a JSON object keyed by role name")
+for _role, _limits in RESULT_LIMITS.items():
+    for _key, _value in _limits.items():
+        if _key not in RESULT_LIMITS["default"] or not isinstance(_value, int) or _value < 1:
+            raise ValueError("SUPERSET_RESULT_LIMITS: %s.%s must be a positive integer" % (_role, _key))
+
+# Streaming CSV export: GET /api/v1/export/chart/<id>/csv streams up to
+# SUPERSET_EXPORT_SYNC_MAX_ROWS rows; POST queues a Celery export whose gzip
+# chunks are kept in the results Redis DB for SUPERSET_EXPORT_TTL seconds
+EXPORT_SYNC_MAX_ROWS = _env_int("SUPERSET_EXPORT_SYNC_MAX_ROWS", 100000, minimum=1)
+EXPORT_CHUNK_ROWS = _env_int("SUPERSET_EXPORT_CHUNK_ROWS", 5000, minimum=1)
+EXPORT_TTL = _env_int("SUPERSET_EXPORT_TTL", 3600, minimum=60)
+if _CELERY_REDIS_URL:
+    EXPORT_REDIS_URL = _redis_url(_CELERY_REDIS_URL, RESULTS_REDIS_DB)
+elif REDIS_HOST:
+    EXPORT_REDIS_URL = "redis://%s:%s/%d" % (REDIS_HOST, REDIS_PORT, RESULTS_REDIS_DB)
+else:
+    EXPORT_REDIS_URL = None
+if _env_bool("SUPERSET_RESULT_LIMITS_ENABLED", True):
+    import result_export
+
+    # Before the profiler's tag, which must stay on the first line
+    _SQL_MUTATORS.insert(0, result_export.limit_rows)
+    _APP_MUTATORS.append(result_export.init_app)
+
+# Feature flags; SUPERSET_FEATURE_FLAGS (JSON) adds or overrides flags
+SUPERSET_THUMBNAILS = _env_bool("SUPERSET_THUMBNAILS", True)
+FEATURE_FLAGS = {
+    "THUMBNAILS": SUPERSET_THUMBNAILS,
+    # Queue a re-render when a dashboard or chart is saved; unchanged content
+    # keeps its digest, so the cached thumbnail is reused
+    "THUMBNAILS_SQLA_LISTENERS": SUPERSET_THUMBNAILS,
+    "PLAYWRIGHT_REPORTS_AND_THUMBNAILS": True,
+}
+try:
+    FEATURE_FLAGS.update(json.loads(os.environ.get("SUPERSET_FEATURE_FLAGS") or "{}"))
+except (ValueError, TypeError):
+    raise ValueError("SUPERSET_FEATURE_FLAGS must be a JSON object of flag names to booleans")
+
+# Thumbnails and report screenshots are rendered by Celery workers (reports
+# queue) with Playwright; screenshot_pool.py keeps one browser per worker
+# process and keys cached thumbnails (THUMBNAIL_CACHE_CONFIG) by a hash of the
+# dashboard's content. The worker opens the web service at WEBDRIVER_BASEURL
+# (on Railway, its private URL); links in reports use the public URL.
+WEBDRIVER_TYPE = "chromium"
+WEBDRIVER_OPTION_ARGS = ["--headless", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"]
+WEBDRIVER_WINDOW = {
+    "dashboard": (1600, 2000),
+    "slice": (3000, 1200),
+    "pixel_density": _env_int("SUPERSET_SCREENSHOT_PIXEL_DENSITY", 1, minimum=1, maximum=4),
+}
+WEBDRIVER_BASEURL = (
+    os.environ.get("SUPERSET_WEBDRIVER_BASEURL")
+    or os.environ.get("SUPERSET_WARMUP_URL")
+    or "http://localhost:%s" % SUPERSET_PORT
+).rstrip("/") + "/"
+if os.environ.get("SUPERSET_PUBLIC_URL"):
+    WEBDRIVER_BASEURL_USER_FRIENDLY = os.environ["SUPERSET_PUBLIC_URL"].rstrip("/") + "/"
+elif os.environ.get("RAILWAY_PUBLIC_DOMAIN"):
+    WEBDRIVER_BASEURL_USER_FRIENDLY = "https://%s/" % os.environ["RAILWAY_PUBLIC_DOMAIN"]
+else:
+    WEBDRIVER_BASEURL_USER_FRIENDLY = WEBDRIVER_BASEURL
+SCREENSHOT_LOCATE_WAIT = _env_int("SUPERSET_SCREENSHOT_LOCATE_WAIT", 10, minimum=1)
+SCREENSHOT_LOAD_WAIT = _env_int("SUPERSET_SCREENSHOT_LOAD_WAIT", 60, minimum=1)
+SCREENSHOT_BROWSER_MAX_USES = _env_int("SUPERSET_SCREENSHOT_BROWSER_MAX_USES", 50, minimum=1)
+THUMBNAIL_SELENIUM_USER = os.environ.get("SUPERSET_THUMBNAIL_USER") or os.environ.get("SUPERSET_ADMIN_USER", "admin")
+if SUPERSET_THUMBNAILS:
+    import screenshot_pool
+
+    THUMBNAIL_DASHBOARD_DIGEST_FUNC = screenshot_pool.dashboard_digest
+    THUMBNAIL_CHART_DIGEST_FUNC = screenshot_pool.chart_digest
+    _APP_MUTATORS.append(screenshot_pool.init_app)
+
+# Metadata DB connection pool. Pre-ping and recycle replace connections the
+# Supabase pooler (or any idle timeout) has closed before a request uses them.
+# SQLALCHEMY_PGBOUNCER_MODE=true (the default when the URI points at a
+# transaction pooler on port 6543) hands pooling to PgBouncer: NullPool, and
+# no startup "options", which transaction poolers reject.
+def _is_transaction_pooler(host, port):
+    return bool(host) and host.endswith(".pooler.supabase.com") and port == 6543
+
+_metadata_url = urlsplit(SQLALCHEMY_DATABASE_URI)
+SQLALCHEMY_PGBOUNCER_MODE = _env_bool(
+    "SQLALCHEMY_PGBOUNCER_MODE", _is_transaction_pooler(_metadata_url.hostname, _metadata_url.port)
+)
+SQLALCHEMY_STATEMENT_TIMEOUT_MS = _env_int("SQLALCHEMY_STATEMENT_TIMEOUT_MS", 0, minimum=0)
+if SQLALCHEMY_PGBOUNCER_MODE:
+    from sqlalchemy.pool import NullPool
+
+    SQLALCHEMY_ENGINE_OPTIONS = {"poolclass": NullPool}
+    if SQLALCHEMY_STATEMENT_TIMEOUT_MS:
+        logger.warning("SQLALCHEMY_STATEMENT_TIMEOUT_MS is ignored in PgBouncer mode; "
+                       "set it on the database role instead (ALTER ROLE ... SET statement_timeout)")
+elif _metadata_url.scheme.startswith("sqlite"):
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+else:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": _env_int("SQLALCHEMY_POOL_SIZE", 5, minimum=1, maximum=100),
+        "max_overflow": _env_int("SQLALCHEMY_MAX_OVERFLOW", 10, minimum=0, maximum=100),
+        "pool_timeout": _env_int("SQLALCHEMY_POOL_TIMEOUT", 30, minimum=1),
+        "pool_recycle": _env_int("SQLALCHEMY_POOL_RECYCLE", 300, minimum=-1),
+        "pool_pre_ping": _env_bool("SQLALCHEMY_POOL_PRE_PING", True),
+    }
+    if SQLALCHEMY_STATEMENT_TIMEOUT_MS and _metadata_url.scheme.startswith("postgres"):
+        SQLALCHEMY_ENGINE_OPTIONS["connect_args"] = {
+            "options": "-c statement_timeout=%d" % SQLALCHEMY_STATEMENT_TIMEOUT_MS,
+        }
+
+# Engine defaults for data sources added in the UI, keyed by host pattern
+# (fnmatch, optionally "host:port"). Anything set in a database's own
+# "Engine parameters" wins. Only "poolclass": "NullPool" and connect_args are
+# useful here: Superset builds a fresh engine per query, so a QueuePool would
+# never be reused. Extend or override with SUPERSET_DB_ENGINE_DEFAULTS (JSON).
+DB_ENGINE_DEFAULTS = {
+    "*.pooler.supabase.com:6543": {
+        "poolclass": "NullPool",
+        "connect_args": {"connect_timeout": 10, "keepalives": 1, "keepalives_idle": 30},
+    },
+    "*.supabase.co": {
+        "connect_args": {"connect_timeout": 10, "keepalives": 1, "keepalives_idle": 30},
+    },
+}
+try:
+    DB_ENGINE_DEFAULTS.update(json.loads(os.environ.get("SUPERSET_DB_ENGINE_DEFAULTS") or "{}"))
+except ValueError:
+    raise ValueError("SUPERSET_DB_ENGINE_DEFAULTS must be a JSON object keyed by host pattern")
+
+def _engine_defaults(host, port):
+    for pattern, defaults in DB_ENGINE_DEFAULTS.items():
+        if ":" in pattern:
+            target = "%s:%s" % (host, port)
+        else:
+            target = host
+        if fnmatch(target or "", pattern):
+            return defaults
+    return None
+
+def DB_CONNECTION_MUTATOR(sqlalchemy_url, params, *args, **kwargs):
+    defaults = _engine_defaults(sqlalchemy_url.host, sqlalchemy_url.port)
+    if not defaults:
+        return sqlalchemy_url, params
+    for name, value in defaults.items():
+        if name == "poolclass":
+            from sqlalchemy import pool
+
+            params.setdefault("poolclass", getattr(pool, value))
+        elif name == "connect_args":
+            connect_args = params.setdefault("connect_args", {})
+            for arg, arg_value in value.items():
+                connect_args.setdefault(arg, arg_value)
+        else:
+            params.setdefault(name, value)
+    return sqlalchemy_url, params
+
 # Expose useful variables to Superset
 RATELIMIT_STORAGE_URI = RATELIMIT_STORAGE_URI
 SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI
@@ -82,3 +466,11 @@ SUPERSET_PORT = SUPERSET_PORT
 # Optional: log what we loaded (avoid logging secrets)
 logger.info("Loaded superset_config: env=%s, load_examples=%s, redis_host=%s, redis_port=%s",
             SUPERSET_ENV, SUPERSET_LOAD_EXAMPLES, REDIS_HOST, REDIS_PORT)
+logger.info("Metadata DB engine options: %s",
+            {k: getattr(v, "__name__", v) for k, v in SQLALCHEMY_ENGINE_OPTIONS.items()})
+logger.info("Thumbnails: %s, webdriver base URL %s", SUPERSET_THUMBNAILS, WEBDRIVER_BASEURL)
+logger.info("Result serialization: codec=%s, min_bytes=%s, columnar=%s",
+            SUPERSET_RESULTS_CODEC or "none", SUPERSET_RESULTS_CODEC_MIN_BYTES, SUPERSET_RESULTS_COLUMNAR)
+logger.info("Cache tiers (db/prefix/timeout): %s",
+            ", ".join("%s=%s/%s/%s" % (name, c["CACHE_REDIS_DB"], c["CACHE_KEY_PREFIX"], c["CACHE_DEFAULT_TIMEOUT"])
+                      for name, c in _CACHE_TIERS))
@@ -0,0 +1,342 @@
+"""
+Metrics for the Superset Railway image
+
+Activated from superset_config.py with SUPERSET_METRICS_BACKEND:
+- "prometheus": the web role serves /metrics to scrapers sending
+  SUPERSET_METRICS_TOKEN (without it, /metrics is off); Celery workers
+  serve their own, unauthenticated, metrics on SUPERSET_METRICS_WORKER_ADDR
+  (default 127.0.0.1) and SUPERSET_METRICS_WORKER_PORT. Gunicorn and
+  Celery children share one registry through PROMETHEUS_MULTIPROC_DIR,
+  which startup.sh prepares.
+- "statsd": everything is pushed to STATSD_HOST:STATSD_PORT.
+
+Recorded: Superset's own STATS_LOGGER events, queries seen by QUERY_LOGGER,
+request latency per route, cache hits and misses per cache tier, bytes
+stored and saved by result_codec.py, and Celery task durations. Every
+label is capped at SUPERSET_METRICS_MAX_LABEL_VALUES distinct values per
+process; values past the cap are reported as "other", so an unexpected
+stream of keys cannot blow up the series count.
+"""
+
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from celery.signals import task_postrun, task_prerun, worker_ready
+from flask_caching.backends.rediscache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("prometheus", "statsd")
+OVERFLOW_LABEL = "other"
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+_STATSD_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+
+# name -> (kind, help, label names, histogram buckets)
+METRICS = {
+    "stats_events": ("counter", "Superset STATS_LOGGER counters", ("key",), None),
+    "stats_timing_seconds": ("histogram", "Superset STATS_LOGGER timings", ("key",), REQUEST_BUCKETS),
+    "stats_gauge": ("gauge", "Superset STATS_LOGGER gauges", ("key",), None),
+    "request_duration_seconds": (
+        "histogram", "HTTP request latency", ("endpoint", "method", "status"), REQUEST_BUCKETS,
+    ),
+    "cache_requests": ("counter", "Cache lookups by tier and result", ("tier", "result"), None),
+    "result_stored_bytes": ("counter", "Bytes written to Redis by result_codec.py", ("tier",), None),
+    "result_saved_bytes": ("counter", "Bytes saved by result_codec.py compression", ("tier",), None),
+    "queries": ("counter", "Queries sent to analytics databases", ("database",), None),
+    "query_duration_seconds": (
+        "histogram", "Analytics query run time, from query_profiler.py", ("database",), TASK_BUCKETS,
+    ),
+    "celery_task_duration_seconds": (
+        "histogram", "Celery task run time", ("task", "state"), TASK_BUCKETS,
+    ),
+}
+
+
+class LabelLimiter:
+    """Admit at most ``limit`` distinct values per label; the rest become "other" """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, label, value):
+        value = str(value)
+        seen = self._seen.get(label)
+        if seen is not None and value in seen:
+            return value
+        with self._lock:
+            seen = self._seen.setdefault(label, set())
+            if value in seen:
+                return value
+            if len(seen) >= self.limit:
+                return OVERFLOW_LABEL
+            seen.add(value)
+            return value
+
+
+class PrometheusBackend:
+    def __init__(self):
+        import prometheus_client
+
+        self._metrics = {}
+        for name, (kind, description, labels, buckets) in METRICS.items():
+            if kind == "counter":
+                metric = prometheus_client.Counter("superset_" + name, description, labels)
+            elif kind == "gauge":
+                metric = prometheus_client.Gauge(
+                    "superset_" + name, description, labels, multiprocess_mode="livesum"
+                )
+            else:
+                metric = prometheus_client.Histogram(
+                    "superset_" + name, description, labels, buckets=buckets
+                )
+            self._metrics[name] = metric
+
+    def incr(self, name, labels, value=1):
+        self._metrics[name].labels(**labels).inc(value)
+
+    def gauge(self, name, labels, value):
+        self._metrics[name].labels(**labels).set(value)
+
+    def observe(self, name, labels, seconds):
+        self._metrics[name].labels(**labels).observe(seconds)
+
+
+class StatsdBackend:
+    """Labels become dotted key segments: superset.cache_requests.data.hit"""
+
+    def __init__(self):
+        from statsd import StatsClient
+
+        self.client = StatsClient(
+            host=os.environ.get("STATSD_HOST", "localhost"),
+            port=int(os.environ.get("STATSD_PORT", "8125")),
+            prefix=os.environ.get("STATSD_PREFIX", "superset"),
+        )
+
+    @staticmethod
+    def _key(name, labels):
+        # "." separates segments and ":" ends the key in the StatsD protocol
+        parts = [name] + [_STATSD_UNSAFE.sub("_", str(v)).strip("_") or "root"
+                          for v in labels.values()]
+        return ".".join(parts)
+
+    def incr(self, name, labels, value=1):
+        self.client.incr(self._key(name, labels), value)
+
+    def gauge(self, name, labels, value):
+        self.client.gauge(self._key(name, labels), value)
+
+    def observe(self, name, labels, seconds):
+        self.client.timing(self._key(name, labels), seconds * 1000.0)
+
+
+class Metrics:
+    """The configured backend behind a label limiter; a no-op until configured"""
+
+    def __init__(self):
+        self.backend = None
+        self.limit_label = LabelLimiter(100)
+
+    def configure(self, backend, max_label_values=100):
+        if backend not in BACKENDS:
+            raise ValueError("SUPERSET_METRICS_BACKEND must be one of %s, got %r" % (BACKENDS, backend))
+        self.limit_label = LabelLimiter(max_label_values)
+        self.backend = PrometheusBackend() if backend == "prometheus" else StatsdBackend()
+
+    def _labels(self, name, values):
+        return {label: self.limit_label(name + "." + label, value)
+                for label, value in zip(METRICS[name][2], values)}
+
+    def _emit(self, method, name, values, value):
+        if self.backend is None:
+            return
+        try:
+            getattr(self.backend, method)(name, self._labels(name, values), value)
+        except Exception:  # metrics must never break a request or a task
+            logger.warning("Failed to record metric %s", name, exc_info=True)
+
+    def incr(self, name, *values, value=1):
+        self._emit("incr", name, values, value)
+
+    def gauge(self, name, *values, value):
+        self._emit("gauge", name, values, value)
+
+    def observe(self, name, *values, seconds):
+        self._emit("observe", name, values, seconds)
+
+
+metrics = Metrics()
+
+
+def configure(backend, max_label_values=100):
+    """Select the backend; called by superset_config.py"""
+    metrics.configure(backend, max_label_values)
+    if backend == "prometheus" and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        logger.warning("PROMETHEUS_MULTIPROC_DIR is not set; /metrics only shows the worker that serves it")
+
+
+class MetricsStatsLogger:
+    """STATS_LOGGER for Superset, with the interface of superset.stats_logger.BaseStatsLogger
+
+    Counters only go up, so ``decr`` is counted under "<key>.decr".
+    Superset reports timings in milliseconds.
+    """
+
+    def __init__(self, prefix="superset"):
+        self.prefix = prefix
+
+    def key(self, key):
+        if self.prefix:
+            return self.prefix + key
+        return key
+
+    def incr(self, key):
+        metrics.incr("stats_events", key)
+
+    def decr(self, key):
+        metrics.incr("stats_events", key + ".decr")
+
+    def timing(self, key, value):
+        metrics.observe("stats_timing_seconds", key, seconds=value / 1000.0)
+
+    def gauge(self, key, value):
+        metrics.gauge("stats_gauge", key, value=value)
+
+
+def log_query(database, sql, schema=None, *args, **kwargs):
+    """QUERY_LOGGER: count queries per analytics database
+
+    Superset passes the Database model, its SQLAlchemy URL or the URI string
+    depending on where the query comes from.
+    """
+    if isinstance(database, str):
+        name = urlsplit(database).hostname
+    else:
+        name = getattr(database, "database_name", None) or getattr(database, "host", None)
+    metrics.incr("queries", name or "unknown")
+
+
+class InstrumentedRedisCache(RedisCache):
+    """Flask-Caching Redis backend counting hits and misses
+
+    Used as CACHE_TYPE for each cache tier; the tier name comes from the
+    CACHE_METRICS_TIER config key.
+    """
+
+    tier = "unknown"
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        cache = super().factory(app, config, args, kwargs)
+        cache.tier = config.get("CACHE_METRICS_TIER", cls.tier)
+        return cache
+
+    def get(self, key):
+        value = super().get(key)
+        metrics.incr("cache_requests", self.tier, "hit" if value is not None else "miss")
+        return value
+
+    def get_many(self, *keys):
+        values = super().get_many(*keys)
+        hits = sum(1 for value in values if value is not None)
+        if hits:
+            metrics.incr("cache_requests", self.tier, "hit", value=hits)
+        if len(values) - hits:
+            metrics.incr("cache_requests", self.tier, "miss", value=len(values) - hits)
+        return values
+
+
+def init_app(app):
+    """FLASK_APP_MUTATOR: time every request and, for Prometheus, serve /metrics"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_latency(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            # The route template, not the path, keeps IDs out of the labels
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            metrics.observe(
+                "request_duration_seconds",
+                endpoint,
+                request.method,
+                "%dxx" % (response.status_code // 100),
+                seconds=time.perf_counter() - started,
+            )
+        return response
+
+    if isinstance(metrics.backend, PrometheusBackend):
+        # The web port is public; metrics name routes, databases and tasks
+        if os.environ.get("SUPERSET_METRICS_TOKEN"):
+            app.add_url_rule("/metrics", "superset_metrics", _metrics_view)
+        else:
+            logger.warning("SUPERSET_METRICS_TOKEN is not set; /metrics is not served")
+    return app
+
+
+def _registry():
+    import prometheus_client
+    from prometheus_client import multiprocess
+
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return prometheus_client.REGISTRY
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def _metrics_view():
+    from flask import Response, abort, request
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+    expected = "Bearer " + os.environ["SUPERSET_METRICS_TOKEN"]
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+        abort(401)
+    return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+_task_started = {}
+
+
+@task_prerun.connect
+def _task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.observe(
+            "celery_task_duration_seconds",
+            getattr(task, "name", "unknown"),
+            state or "UNKNOWN",
+            seconds=time.perf_counter() - started,
+        )
+
+
+@worker_ready.connect
+def _serve_worker_metrics(sender=None, **kwargs):
+    """Workers have no web server; expose their registry on a port of their own"""
+    if not isinstance(metrics.backend, PrometheusBackend):
+        return
+    from prometheus_client import start_http_server
+
+    # No auth on this port: listen on loopback unless pointed at a private
+    # interface (on Railway, "::" is only reachable over the private network)
+    addr = os.environ.get("SUPERSET_METRICS_WORKER_ADDR", "127.0.0.1")
+    port = int(os.environ.get("SUPERSET_METRICS_WORKER_PORT", "9808"))
+    start_http_server(port, addr=addr, registry=_registry())
+    logger.info("Serving Celery worker metrics on %s:%s", addr, port)
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_superset import MockSuperset  # noqa: E402
+
+
+@pytest.fixture
+def superset():
+    """Mock Superset server, emptied for every test"""
+    with MockSuperset(databases=["examples"], seed=1) as server:
+        yield server
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+import async_superset_client
+import create_superset_dashboard as csd
+from create_superset_dashboard import (
+    SupersetClient,
+    changed_columns,
+    load_spec,
+    plan_charts,
+    tenant_spec,
+)
+
+
+@pytest.fixture
+def spec():
+    return tenant_spec(load_spec(csd.DEFAULT_SPEC_PATH), {"name": "t1", "database": "examples"})
+
+
+def apply_sync(server, spec):
+    client = SupersetClient(server.url, "admin", "admin", token_cache=None)
+    assert client.authenticate()
+    return csd.apply_spec(client, spec, chart_workers=1)
+
+
+def apply_async(server, spec):
+    async def _run():
+        async with async_superset_client.AsyncSupersetClient(
+            server.url, "admin", "admin", token_cache=None
+        ) as client:
+            assert await client.authenticate()
+            return await async_superset_client.apply_spec(client, spec)
+
+    return asyncio.run(_run())
+
+
+def dashboard_metadata(server):
+    (dashboard,) = server.store["dashboards"].values()
+    return json.loads(dashboard["json_metadata"])
+
+
+def test_changed_columns():
+    current = [{"column_name": "a", "is_dttm": True}, {"column_name": "b"}]
+    desired = [{"column_name": "a", "is_dttm": True}, {"column_name": "b", "groupby": True}]
+    assert changed_columns(desired, current) == [desired[1]]
+
+
+def test_plan_charts():
+    specs = [
+        {"chart_title": t, "visualization_type": "table", "dataset_id": 1,
+         "query_context": {"form_data": {}}}
+        for t in ("kept", "changed", "new")
+    ]
+    existing = [
+        {"id": 1, "chart_title": "kept", "visualization_type": "table",
+         "query_context": json.dumps({"form_data": {}})},
+        {"id": 2, "chart_title": "changed", "visualization_type": "pie",
+         "query_context": {"form_data": {}}},
+        {"id": 3, "chart_title": "stale"},
+    ]
+    plan = plan_charts(specs, existing)
+    assert plan["create"] == [specs[2]]
+    assert [chart_id for chart_id, _ in plan["update"]] == [2]
+    assert plan["delete"] == [3]
+    assert plan["chart_ids"] == {"kept": 1, "changed": 2}
+
+
+@pytest.mark.parametrize("apply", [apply_sync, apply_async])
+def test_apply_creates_then_skips(superset, spec, apply):
+    result = apply(superset, spec)
+    assert result["ok"] and result["errors"] == []
+    assert len(superset.store["charts"]) == len(spec["charts"])
+    assert dashboard_metadata(superset)["spec_fingerprint"] == csd.spec_fingerprint(spec)
+
+    requests_sent = superset.requests
+    assert apply(superset, spec) == result
+    # The login and the dashboard lookup
+    assert superset.requests - requests_sent == 2
+
+
+@pytest.mark.parametrize("apply", [apply_sync, apply_async])
+def test_failed_chart_leaves_no_fingerprint(superset, spec, apply):
+    superset.inject(500, method="POST", path="/api/v1/charts")
+    result = apply(superset, spec)
+    assert result["dashboard_id"] is not None and not result["ok"]
+    assert len(result["errors"]) == 1 and "not created" in result["errors"][0]
+    assert "spec_fingerprint" not in dashboard_metadata(superset)
+
+    # The next apply creates the missing chart and completes
+    again = apply(superset, spec)
+    assert again["ok"] and again["dashboard_id"] == result["dashboard_id"]
+    assert len(superset.store["charts"]) == len(spec["charts"])
+    assert dashboard_metadata(superset)["spec_fingerprint"] == csd.spec_fingerprint(spec)
+
+
+@pytest.mark.parametrize("apply", [apply_sync, apply_async])
+def test_failed_dashboard_save_returns_none(superset, spec, apply):
+    superset.inject(500, method="PUT", path="/api/v1/dashboards")
+    result = apply(superset, spec)
+    assert result["dashboard_id"] is None and not result["ok"]
+    assert result["errors"][-1].endswith("not saved")
+
+
+def test_fan_out_records_errors_from_result(superset, spec, tmp_path):
+    superset.inject(500, method="POST", path="/api/v1/charts")
+    targets = [
+        {"name": "acme", "database": "examples"},
+        {"name": "globex", "database": "missing"},
+    ]
+    client = SupersetClient(superset.url, "admin", "admin", token_cache=None)
+    assert client.authenticate()
+    journal = str(tmp_path / "journal.jsonl")
+
+    summary = csd.fan_out(client, spec, targets, journal, max_workers=2)
+    assert summary["done"] == []
+    assert "not created" in summary["failed"]["acme"]
+    assert summary["failed"]["globex"] == "database 'missing' not found"
+
+    # Only the failed tenants run again, and the chart is created this time
+    summary = csd.fan_out(client, spec, targets, journal, max_workers=2)
+    assert summary["done"] == ["acme"]
+    assert list(summary["failed"]) == ["globex"]
+
+
+def test_rollup_steps(spec):
+    steps = {step["table_name"]: step for step in csd.rollup_steps(spec)}
+    for rollup in spec["rollups"]:
+        step = steps[rollup["table_name"]]
+        if rollup["kind"] == "virtual":
+            assert step["setup_sql"] is None and step["sql"].startswith("SELECT")
+        else:
+            assert step["setup_sql"].startswith("CREATE") and step["sql"] is None
@@ -0,0 +1,188 @@
+import asyncio
+
+from async_superset_client import AsyncSupersetClient
+from mock_superset import make_token
+
+LOGIN = "POST /api/v1/security/login"
+REFRESH = "POST /api/v1/security/refresh"
+
+
+def run(server, body, **kwargs):
+    """Run ``body(client)`` with an authenticated client against ``server``"""
+
+    async def _run():
+        async with AsyncSupersetClient(
+            server.url, "admin", "admin", token_cache=None, **kwargs
+        ) as client:
+            assert await client.authenticate()
+            return await body(client)
+
+    return asyncio.run(_run())
+
+
+def chart_spec(title):
+    return {
+        "chart_title": title,
+        "visualization_type": "table",
+        "query_context": {"queries": [{}]},
+    }
+
+
+def test_login(superset):
+    async def body(client):
+        return client.token
+
+    assert run(superset, body)
+    assert superset.calls[LOGIN] == 1
+
+
+def test_wrong_password_fails_login(superset):
+    async def _run():
+        async with AsyncSupersetClient(
+            superset.url, "admin", "wrong", token_cache=None
+        ) as client:
+            return await client.authenticate()
+
+    assert asyncio.run(_run()) is False
+
+
+def test_token_refreshed_before_expiry(superset):
+    # Tokens live shorter than the refresh leeway, so every request renews
+    superset.token_ttl = 30
+
+    async def body(client):
+        return await client.get_database_by_name("examples")
+
+    assert run(superset, body)["database_name"] == "examples"
+    assert superset.calls[LOGIN] == 1
+    assert superset.calls[REFRESH] >= 1
+
+
+def test_rejected_token_renewed_once(superset):
+    async def body(client):
+        client._set_token(make_token("admin", -10))
+        return await client.get_database_by_name("examples")
+
+    assert run(superset, body)
+    assert superset.calls[REFRESH] == 1
+    assert superset.calls["GET /api/v1/databases"] == 2
+
+
+def test_retry_on_503_and_429(superset):
+    superset.inject(503, count=2, method="GET", path="/api/v1/databases")
+    superset.inject(429, method="POST", path="/api/v1/charts")
+
+    async def body(client):
+        db = await client.get_database_by_name("examples")
+        chart = await client.create_chart(db["id"], "Events", "table", {})
+        return db, chart
+
+    db, chart = run(superset, body)
+    assert db and chart
+    assert superset.errors == {"GET /api/v1/databases": 2, "POST /api/v1/charts": 1}
+    assert superset.calls["POST /api/v1/charts"] == 2
+
+
+def test_502_not_retried_for_post(superset):
+    superset.inject(502, method="POST", path="/api/v1/charts")
+
+    async def body(client):
+        return await client.create_chart(1, "Events", "table", {})
+
+    assert run(superset, body) is None
+    assert superset.calls["POST /api/v1/charts"] == 1
+
+
+def test_retries_give_up(superset):
+    superset.inject(503, count=10, method="GET", path="/api/v1/databases")
+
+    async def body(client):
+        return await client.get_database_by_name("examples")
+
+    assert run(superset, body, max_retries=2) is None
+    assert superset.calls["GET /api/v1/databases"] == 3
+
+
+def test_request_returns_error_response(superset):
+    async def body(client):
+        return await client._request("GET", "/api/v1/charts/999")
+
+    assert run(superset, body).status_code == 404
+
+
+def test_pagination_ignores_short_pages(superset):
+    superset.max_page_size = 3
+    for i in range(10):
+        superset.add("datasets", {"table_name": f"table{i}"})
+
+    async def body(client):
+        return [row async for row in client.iter_resources("datasets", page_size=100)]
+
+    rows = run(superset, body)
+    assert [row["table_name"] for row in rows] == [f"table{i}" for i in range(10)]
+    assert superset.calls["GET /api/v1/datasets"] == 4
+
+
+def test_find_resource_cached(superset):
+    for i in range(3):
+        superset.add("datasets", {"table_name": "events", "schema": f"s{i}"})
+
+    async def body(client):
+        filters = [{"col": "table_name", "opr": "eq", "value": "events"}]
+        first = await client.find_resource("datasets", filters)
+        again = await client.find_resource("datasets", filters)
+        return first, again
+
+    first, again = run(superset, body)
+    assert first == again
+    assert first["schema"] == "s0"
+    assert superset.calls["GET /api/v1/datasets"] == 1
+
+
+def test_create_charts_concurrently(superset):
+    superset.latency = 0.05
+    titles = [f"Chart {i}" for i in range(8)]
+
+    async def body(client):
+        return await client.create_charts(1, [chart_spec(t) for t in titles])
+
+    charts = run(superset, body, concurrency=8)
+    assert [c["result"]["chart_title"] for c in charts] == titles
+    assert len({c["id"] for c in charts}) == len(titles)
+    assert superset.calls["POST /api/v1/charts"] == len(titles)
+
+
+def test_create_charts_keeps_order_on_failure(superset):
+    superset.inject(500, method="POST", path="/api/v1/charts")
+    titles = [f"Chart {i}" for i in range(4)]
+
+    async def body(client):
+        return await client.create_charts(1, [chart_spec(t) for t in titles])
+
+    charts = run(superset, body, concurrency=1)
+    assert charts[0] is None
+    assert [c["result"]["chart_title"] for c in charts[1:]] == titles[1:]
+
+
+def test_request_merges_caller_headers(superset):
+    async def body(client):
+        return await client._request(
+            "GET", "/api/v1/databases", headers={"Accept": "application/json"}
+        )
+
+    assert run(superset, body).status_code == 200
+
+
+def test_token_cache_reused(superset, tmp_path):
+    cache = str(tmp_path / "tokens.json")
+
+    async def _authenticate():
+        async with AsyncSupersetClient(
+            superset.url, "admin", "admin", token_cache=cache
+        ) as client:
+            assert await client.authenticate()
+            return await client.get_database_by_name("examples")
+
+    assert asyncio.run(_authenticate())
+    assert asyncio.run(_authenticate())
+    assert superset.calls[LOGIN] == 1
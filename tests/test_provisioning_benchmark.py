@@ -0,0 +1,113 @@
+"""
+Benchmark dashboard provisioning against the mock Superset server
+
+Provisions the dashboard spec for BENCHMARK_TENANTS tenants from an empty
+MockSuperset with each client mode and times the whole run:
+
+- sequential: SupersetClient, one tenant after another, one chart at a time
+- concurrent: SupersetClient, tenants and charts on thread pools
+- async: AsyncSupersetClient, every tenant and chart in one event loop
+
+Needs pytest-benchmark; see the README for saving and comparing runs.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import pytest
+
+from async_superset_client import AsyncSupersetClient
+from async_superset_client import apply_spec as apply_spec_async
+from create_superset_dashboard import (
+    CHART_WORKERS,
+    DEFAULT_SPEC_PATH,
+    FANOUT_WORKERS,
+    SupersetClient,
+    apply_result,
+    apply_spec,
+    load_spec,
+    tenant_spec,
+)
+from mock_superset import MockSuperset
+
+pytest.importorskip("pytest_benchmark")
+
+TENANTS = int(os.getenv("BENCHMARK_TENANTS", "10"))
+LATENCY_MS = float(os.getenv("BENCHMARK_LATENCY_MS", "20"))
+JITTER_MS = float(os.getenv("BENCHMARK_JITTER_MS", "5"))
+ERROR_RATE = float(os.getenv("BENCHMARK_ERROR_RATE", "0"))
+ROUNDS = int(os.getenv("BENCHMARK_ROUNDS", "3"))
+
+
+def run_sequential(url: str, specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    client = SupersetClient(url, "admin", "admin", pool_size=1, token_cache=None)
+    if not client.authenticate():
+        return [apply_result(None, ["login failed"])] * len(specs)
+    return [apply_spec(client, spec, chart_workers=1) for spec in specs]
+
+
+def run_concurrent(url: str, specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Every tenant may have CHART_WORKERS requests in flight
+    client = SupersetClient(
+        url, "admin", "admin", pool_size=FANOUT_WORKERS * CHART_WORKERS, token_cache=None
+    )
+    if not client.authenticate():
+        return [apply_result(None, ["login failed"])] * len(specs)
+    with ThreadPoolExecutor(max_workers=FANOUT_WORKERS) as executor:
+        return list(executor.map(lambda spec: apply_spec(client, spec), specs))
+
+
+def run_async(url: str, specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def _run() -> List[Dict[str, Any]]:
+        async with AsyncSupersetClient(
+            url, "admin", "admin", concurrency=FANOUT_WORKERS * CHART_WORKERS, token_cache=None
+        ) as client:
+            if not await client.authenticate():
+                return [apply_result(None, ["login failed"])] * len(specs)
+            return list(
+                await asyncio.gather(*(apply_spec_async(client, spec) for spec in specs))
+            )
+
+    return asyncio.run(_run())
+
+
+@pytest.fixture(scope="module")
+def mock_server():
+    """One slow, optionally flaky mock server shared by every mode"""
+    with MockSuperset(
+        latency=LATENCY_MS / 1000.0,
+        jitter=JITTER_MS / 1000.0,
+        error_rate=ERROR_RATE,
+        seed=1,
+    ) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def tenant_specs():
+    spec = load_spec(DEFAULT_SPEC_PATH)
+    return [
+        tenant_spec(spec, {"name": f"tenant{i}", "database": f"tenant{i} db"})
+        for i in range(TENANTS)
+    ]
+
+
+@pytest.mark.parametrize(
+    "run", [run_sequential, run_concurrent, run_async], ids=["sequential", "concurrent", "async"]
+)
+def test_provisioning(benchmark, mock_server, tenant_specs, run):
+    databases = sorted({spec["database"] for spec in tenant_specs})
+
+    def setup():
+        # Every round provisions from an empty server
+        mock_server.reset(databases)
+        return (mock_server.url, tenant_specs), {}
+
+    benchmark.extra_info.update(tenants=TENANTS, latency_ms=LATENCY_MS, error_rate=ERROR_RATE)
+    results = benchmark.pedantic(run, setup=setup, rounds=ROUNDS)
+
+    benchmark.extra_info["requests"] = mock_server.requests
+    benchmark.extra_info["injected_errors"] = sum(mock_server.errors.values())
+    assert all(result["ok"] for result in results), [r["errors"] for r in results]
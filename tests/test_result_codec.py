@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from result_codec import ResultSerializer  # noqa: E402
+
+
+def flat_frame():
+    return pd.DataFrame(
+        {
+            "event_id": np.arange(200, dtype="int64"),
+            "score": np.linspace(0, 1, 200),
+            "event_type": ["login", "logout", None, "view"] * 50,
+            "is_admin": [True, False] * 100,
+            "created_at": pd.date_range("2024-01-01", periods=200, freq="min"),
+        }
+    )
+
+
+def nested_frame():
+    return pd.DataFrame(
+        {
+            "event_id": [1, 2, 3],
+            "tags": [["a", "b"], [], None],
+            "payload": [{"user": 1}, {"page": "home"}, None],
+            "vector": [np.array([1.0, 2.0]), np.array([3.0]), None],
+        }
+    )
+
+
+def round_trip(frame, **kwargs):
+    serializer = ResultSerializer("zlib", min_bytes=0, **kwargs)
+    stored = serializer.dumps(frame)
+    return stored, serializer.loads(stored)
+
+
+@pytest.mark.parametrize("frame", [flat_frame(), nested_frame()], ids=["flat", "nested"])
+@pytest.mark.parametrize("columnar", [True, False])
+def test_round_trip_equals_input(frame, columnar):
+    _, decoded = round_trip(frame, columnar=columnar)
+    pd.testing.assert_frame_equal(decoded, frame)
+    for column in ("tags", "payload", "vector"):
+        if column in frame:
+            assert [type(v) for v in decoded[column]] == [type(v) for v in frame[column]]
+
+
+def test_flat_frame_written_as_arrow():
+    # Left uncompressed, so the pickled reducer name can be found
+    serializer = ResultSerializer("zlib", min_bytes=1 << 30)
+    assert b"_dataframe_from_arrow" in serializer.dumps(flat_frame())
+
+
+def test_nested_frame_pickled():
+    serializer = ResultSerializer("zlib", min_bytes=1 << 30)
+    assert b"_dataframe_from_arrow" not in serializer.dumps(nested_frame())
+
+
+def test_integers_stay_plain():
+    serializer = ResultSerializer("zlib", min_bytes=0)
+    assert serializer.dumps(42) == b"42"
+    assert serializer.loads(b"42") == 42
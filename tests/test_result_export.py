@@ -0,0 +1,112 @@
+import pytest
+
+pytest.importorskip("flask_appbuilder")
+pytest.importorskip("sqlparse")
+
+from flask import Flask, g  # noqa: E402
+
+import result_export  # noqa: E402
+from result_export import is_plain_select, iter_chunks, limit_rows, user_limits  # noqa: E402
+
+LIMITS = {
+    "default": {"rows": 1000, "bytes": 1 << 20, "export_rows": 5000},
+    "Gamma": {"rows": 100},
+    "Analyst": {"rows": 50000, "bytes": 1 << 30},
+}
+
+
+class Role:
+    def __init__(self, name):
+        self.name = name
+
+
+class User:
+    def __init__(self, *roles):
+        self.roles = [Role(name) for name in roles]
+
+
+class Database:
+    def apply_limit_to_sql(self, sql, limit):
+        return "%s LIMIT %d" % (sql, limit)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["RESULT_LIMITS"] = LIMITS
+    return app
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM events",
+        "select event_type, count(*) from events group by 1 order by 2 desc;",
+        "-- comment\nSELECT 1",
+        "WITH recent AS (SELECT * FROM events) SELECT * FROM recent",
+        "with a as (select 1), b as (select 2) select * from a, b",
+    ],
+)
+def test_selects_are_plain(sql):
+    assert is_plain_select(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "INSERT INTO t SELECT * FROM events",
+        "SELECT * INTO t FROM events",
+        "UPDATE t SET x = 1",
+        "SELECT 1; SELECT 2",
+        "WITH stale AS (DELETE FROM t WHERE x > 1) INSERT INTO t SELECT 1",
+        "WITH a AS (SELECT 1) INSERT INTO t SELECT * FROM a",
+        "WITH a AS (UPDATE t SET x = 1 RETURNING *) SELECT * FROM a",
+        "CREATE TABLE t AS SELECT 1",
+        "",
+    ],
+)
+def test_writes_are_not_plain(sql):
+    assert not is_plain_select(sql)
+
+
+def test_unlisted_roles_get_default(app):
+    with app.app_context():
+        assert user_limits(User("Admin")) == LIMITS["default"]
+        assert user_limits(User()) == LIMITS["default"]
+
+
+def test_highest_listed_limit_wins(app):
+    with app.app_context():
+        limits = user_limits(User("Gamma", "Analyst"))
+    assert limits == {"rows": 50000, "bytes": 1 << 30, "export_rows": 5000}
+
+
+def test_limit_rows_only_on_result_requests(app):
+    sql = "WITH a AS (SELECT 1) SELECT * FROM a"
+    with app.test_request_context("/api/v1/chart/data"):
+        g.user = User("Gamma")
+        assert limit_rows(sql, database=Database()) == sql + " LIMIT 100"
+        refresh = "WITH stale AS (DELETE FROM t) INSERT INTO t SELECT 1"
+        assert limit_rows(refresh, database=Database()) == refresh
+    with app.test_request_context("/api/v1/dataset/1/refresh"):
+        g.user = User("Gamma")
+        assert limit_rows(sql, database=Database()) == sql
+
+
+class ListRedis:
+    """The LRANGE subset of redis.Redis over a list"""
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = 0
+
+    def lrange(self, key, start, end):
+        self.calls += 1
+        return self.items[start:end + 1]
+
+
+@pytest.mark.parametrize("count", [0, 1, 63, 64, 65, 200])
+def test_iter_chunks_reads_in_batches(count):
+    redis = ListRedis([b"%d" % i for i in range(count)])
+    assert list(iter_chunks(redis, "key")) == redis.items
+    assert redis.calls == count // result_export.DOWNLOAD_BATCH_CHUNKS + 1
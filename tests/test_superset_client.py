@@ -0,0 +1,153 @@
+import json
+import os
+import stat
+import threading
+
+from create_superset_dashboard import SupersetClient, TokenManager
+from mock_superset import make_token
+
+LOGIN = "POST /api/v1/security/login"
+REFRESH = "POST /api/v1/security/refresh"
+
+
+def client(server, **kwargs):
+    """An authenticated sync client for ``server``"""
+    kwargs.setdefault("token_cache", None)
+    c = SupersetClient(server.url, "admin", "admin", **kwargs)
+    assert c.authenticate()
+    return c
+
+
+def test_token_cache_is_private_and_atomic(tmp_path):
+    cache = tmp_path / "tokens" / "tokens.json"
+    tokens = TokenManager(str(cache), "admin@http://superset")
+    tokens.update(make_token("admin", 900), make_token("admin", 3600, "refresh"))
+
+    assert stat.S_IMODE(os.stat(cache).st_mode) == 0o600
+    # Only the cache and its lock file; no temp file is left behind
+    assert sorted(os.listdir(cache.parent)) == ["tokens.json", "tokens.json.lock"]
+
+    other = TokenManager(str(cache), "admin@http://superset")
+    assert other.load()
+    assert other.access_token == tokens.access_token
+    assert other.refresh_token == tokens.refresh_token
+
+
+def test_token_cache_concurrent_writers(tmp_path):
+    cache = str(tmp_path / "tokens.json")
+    managers = [TokenManager(cache, f"user{i}@http://superset") for i in range(8)]
+
+    def write(tokens, i):
+        for n in range(20):
+            tokens.update(make_token(f"user{i}", 900 + n))
+
+    threads = [threading.Thread(target=write, args=(m, i)) for i, m in enumerate(managers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every writer kept its own entry, and the file is still valid JSON
+    with open(cache, encoding="utf-8") as f:
+        entries = json.load(f)
+    assert set(entries) == {m.key for m in managers}
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".tmp")] == []
+
+
+def test_token_cache_disabled_by_default(superset, tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    c = SupersetClient(superset.url, "admin", "admin")
+    assert c.tokens.cache_path is None
+    assert c.authenticate()
+    assert os.listdir(tmp_path) == []
+
+
+def test_token_cache_reused(superset, tmp_path):
+    cache = str(tmp_path / "tokens.json")
+    client(superset, token_cache=cache)
+    c = client(superset, token_cache=cache)
+
+    assert c.get_database_by_name("examples")
+    assert superset.calls[LOGIN] == 1
+
+
+def test_expired_cached_token_refreshed(superset, tmp_path):
+    cache = str(tmp_path / "tokens.json")
+    TokenManager(cache, f"admin@{superset.url}").update(
+        make_token("admin", -10), make_token("admin", 3600, "refresh")
+    )
+
+    c = client(superset, token_cache=cache)
+    assert c.get_database_by_name("examples")
+    assert superset.calls[REFRESH] == 1
+    assert LOGIN not in superset.calls
+
+
+def test_token_refreshed_once_under_concurrent_use(superset):
+    c = client(superset)
+    stale = make_token("admin", -10)
+    c._set_token(stale)
+    c.tokens.access_token = stale
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(c.get_database_by_name("examples")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(results) and len(results) == 8
+    # The first thread renews; the rest reuse its token
+    assert superset.calls[REFRESH] == 1
+    assert superset.calls[LOGIN] == 1
+
+
+def test_retry_on_503_and_429(superset):
+    superset.inject(503, count=2, method="GET", path="/api/v1/databases")
+    superset.inject(429, method="POST", path="/api/v1/charts")
+    c = client(superset)
+
+    db = c.get_database_by_name("examples")
+    assert db and c.create_chart(db["id"], "Events", "table", {})
+    assert superset.errors == {"GET /api/v1/databases": 2, "POST /api/v1/charts": 1}
+    assert superset.calls["POST /api/v1/charts"] == 2
+
+
+def test_retry_after_honoured(superset, monkeypatch):
+    superset.retry_after = 2
+    superset.inject(429, method="GET", path="/api/v1/databases")
+    sleeps = []
+    monkeypatch.setattr("create_superset_dashboard.time.sleep", sleeps.append)
+    c = client(superset)
+
+    assert c.get_database_by_name("examples")
+    assert sleeps[0] == 2.0
+    # 429 pauses the shared rate limiter as well, so the retry waits on it
+    assert c.rate_limiter.paused_until > 0
+
+
+def test_502_not_retried_for_post(superset):
+    superset.inject(502, method="POST", path="/api/v1/charts")
+    c = client(superset)
+
+    assert c.create_chart(1, "Events", "table", {}) is None
+    assert superset.calls["POST /api/v1/charts"] == 1
+
+
+def test_502_retried_for_get(superset):
+    superset.inject(502, method="GET", path="/api/v1/databases")
+    c = client(superset)
+
+    assert c.get_database_by_name("examples")
+    assert superset.calls["GET /api/v1/databases"] == 2
+
+
+def test_retries_give_up(superset):
+    superset.inject(503, count=10, method="GET", path="/api/v1/databases")
+    c = client(superset, max_retries=2)
+
+    assert c.get_database_by_name("examples") is None
+    assert superset.calls["GET /api/v1/databases"] == 3
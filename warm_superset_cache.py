@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Warm Superset's chart data cache
+
+Lists published dashboards, collects their charts and runs each chart's
+data request with bounded parallelism, so DATA_CACHE_CONFIG is populated
+before the first users open a dashboard after a redeploy.
+
+Prerequisites:
+- pip install requests python-dotenv
+
+Usage:
+python warm_superset_cache.py                    # every published dashboard
+python warm_superset_cache.py --dashboards 12 15 --workers 4
+python warm_superset_cache.py --force            # re-run queries, refreshing the cache
+
+The same job runs on a schedule through the warm_dashboards Celery task
+(see celery_tasks.py and CeleryConfig in superset_config.py).
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from create_superset_dashboard import (
+    SUPERSET_PASSWORD,
+    SUPERSET_URL,
+    SUPERSET_USERNAME,
+    SupersetClient,
+)
+
+WARMUP_WORKERS = int(os.getenv("SUPERSET_WARMUP_WORKERS", "4"))
+
+
+def list_published_dashboards(client: SupersetClient) -> List[Dict[str, Any]]:
+    """Get the id and title of every published dashboard"""
+    return list(
+        client.iter_resources(
+            "dashboards",
+            filters=[{"col": "published", "opr": "eq", "value": True}],
+            columns=["id", "dashboard_title"],
+        )
+    )
+
+
+def warm_dashboards(
+    client: SupersetClient,
+    dashboard_ids: Optional[List[int]] = None,
+    max_workers: int = WARMUP_WORKERS,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Run the data request of every chart on the given dashboards
+
+    Defaults to all published dashboards. Charts shared by several
+    dashboards are only queried once. Returns a summary of the run.
+    """
+    started = time.monotonic()
+    if dashboard_ids is None:
+        dashboard_ids = [d.get("id") for d in list_published_dashboards(client)]
+
+    # Fetch chart lists concurrently too; it is one request per dashboard
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        chart_lists = list(executor.map(client.get_dashboard_charts, dashboard_ids))
+
+    chart_ids: List[int] = []
+    for charts in chart_lists:
+        for chart in charts or []:
+            if chart.get("id") not in chart_ids:
+                chart_ids.append(chart.get("id"))
+
+    def _warm(chart_id: int) -> float:
+        chart_started = time.monotonic()
+        if client.get_chart_data(chart_id, force=force) is None:
+            return -1.0
+        return time.monotonic() - chart_started
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        timings = list(executor.map(_warm, chart_ids))
+
+    failed = [chart_id for chart_id, t in zip(chart_ids, timings) if t < 0]
+    slowest = sorted(
+        ((t, chart_id) for chart_id, t in zip(chart_ids, timings) if t >= 0),
+        reverse=True,
+    )[:5]
+    summary = {
+        "dashboards": len(dashboard_ids),
+        "charts": len(chart_ids),
+        "warmed": len(chart_ids) - len(failed),
+        "failed": failed,
+        "slowest": [
+            {"chart_id": chart_id, "seconds": round(t, 3)} for t, chart_id in slowest
+        ],
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    print(
+        f"✓ Warmed {summary['warmed']}/{summary['charts']} charts on "
+        f"{summary['dashboards']} dashboards in {summary['seconds']}s"
+    )
+    if failed:
+        print(f"✗ Failed charts: {failed}")
+    return summary
+
+
+def main():
+    """Warm the cache for published dashboards"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--dashboards", type=int, nargs="+", help="Dashboard IDs (default: all published)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=WARMUP_WORKERS, help="Concurrent chart queries"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Bypass the cache and re-run queries"
+    )
+    args = parser.parse_args()
+
+    client = SupersetClient(
+        SUPERSET_URL, SUPERSET_USERNAME, SUPERSET_PASSWORD, pool_size=args.workers
+    )
+    if not client.authenticate():
+        print("Failed to authenticate. Exiting.")
+        return
+
+    warm_dashboards(
+        client,
+        dashboard_ids=args.dashboards,
+        max_workers=args.workers,
+        force=args.force,
+    )
+
+
+if __name__ == "__main__":
+    main()